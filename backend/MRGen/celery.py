@@ -17,7 +17,11 @@ app = Celery('MRGen')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django app configs.
+app.autodiscover_tasks(['reporter'], related_name='tasks_join')
 app.autodiscover_tasks(['reporter'], related_name='tasks_watchman')
+app.autodiscover_tasks(['reporter'], related_name='tasks_repairshopr')
+app.autodiscover_tasks(['reporter'], related_name='tasks_reports')
+app.autodiscover_tasks(['reporter'], related_name='tasks_results')
 
 
 @app.task(bind=True)
@@ -143,9 +143,137 @@ REST_FRAMEWORK = {
     ),
 }
 
+# REDIS
+REDIS_URL = 'redis://' + os.getenv('REDIS_HOSTNAME', 'localhost') + ':6379'
+# the tests use this Redis database instead, so they never touch the keys of a running deployment, see MRGen.test_runner
+REDIS_TEST_URL = REDIS_URL + '/' + os.getenv('REDIS_TEST_DB', '15')
+TEST_RUNNER = 'MRGen.test_runner.TestRunner'
+
 # CELERY
-CELERY_BROKER_URL = 'redis://' + os.getenv('REDIS_HOSTNAME', 'localhost') + ':6379'
+CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'purge-claim-checks': {
+        'task': 'reporter.tasks_watchman.purge_claim_checks',
+        'schedule': 3600,
+    },
+    'compact-task-results': {
+        'task': 'reporter.tasks_results.compact_task_results',
+        'schedule': 3600,
+    },
+    'expire-report-jobs': {
+        'task': 'reporter.tasks_reports.expire_report_jobs',
+        'schedule': 300,
+    },
+}
+# expired results are deleted in batches by compact_task_results instead of the celery backend_cleanup task
+CELERY_RESULT_EXPIRES = None
+
+# CLAIM CHECK
+# payloads larger than the threshold in bytes are passed between tasks through either the 'redis' or 'filesystem' store
+CLAIM_CHECK_STORE = os.getenv('CLAIM_CHECK_STORE', 'redis')
+CLAIM_CHECK_DIR = os.getenv('CLAIM_CHECK_DIR', os.path.join(BASE_DIR, 'claim_checks'))
+CLAIM_CHECK_TTL = int(os.getenv('CLAIM_CHECK_TTL', '86400'))
+CLAIM_CHECK_THRESHOLD = int(os.getenv('CLAIM_CHECK_THRESHOLD', '65536'))
+
+# WATCHMAN
+WATCHMAN_POOL_SIZE = int(os.getenv('WATCHMAN_POOL_SIZE', '10'))
+WATCHMAN_CONNECT_TIMEOUT = float(os.getenv('WATCHMAN_CONNECT_TIMEOUT', '5'))
+WATCHMAN_READ_TIMEOUT = float(os.getenv('WATCHMAN_READ_TIMEOUT', '60'))
+WATCHMAN_CONCURRENCY = int(os.getenv('WATCHMAN_CONCURRENCY', '8'))
+# requests per second shared by all workers, the rate adapts between the min and max, 0 disables rate limiting
+WATCHMAN_RATE_LIMIT = float(os.getenv('WATCHMAN_RATE_LIMIT', '5'))
+WATCHMAN_RATE_LIMIT_MIN = float(os.getenv('WATCHMAN_RATE_LIMIT_MIN', '0.5'))
+WATCHMAN_RATE_LIMIT_MAX = float(os.getenv('WATCHMAN_RATE_LIMIT_MAX', '20'))
+WATCHMAN_RATE_LIMIT_BURST = int(os.getenv('WATCHMAN_RATE_LIMIT_BURST', '10'))
+WATCHMAN_MAX_RETRIES = int(os.getenv('WATCHMAN_MAX_RETRIES', '5'))
+WATCHMAN_BACKOFF_BASE = float(os.getenv('WATCHMAN_BACKOFF_BASE', '1'))
+WATCHMAN_BACKOFF_MAX = float(os.getenv('WATCHMAN_BACKOFF_MAX', '60'))
+# the raw '/computers' pages of every sync are archived to this directory for replay, empty disables archiving
+WATCHMAN_SNAPSHOT_DIR = os.getenv('WATCHMAN_SNAPSHOT_DIR', '')
+# a sync that starts while another sync of the same group is running is either 'skip'ped or 'coalesce'd into one sync
+# that runs after it, the lease of a group expires after the TTL in seconds if its sync never finishes
+WATCHMAN_SYNC_OVERLAP = os.getenv('WATCHMAN_SYNC_OVERLAP', 'coalesce')
+WATCHMAN_SYNC_LEASE_TTL = int(os.getenv('WATCHMAN_SYNC_LEASE_TTL', '3600'))
+# the pages of a sync that did not finish are kept for this many seconds so the next sync only fetches the missing pages
+WATCHMAN_SYNC_CHECKPOINT_TTL = int(os.getenv('WATCHMAN_SYNC_CHECKPOINT_TTL', '21600'))
+# the number of pages of a group that are queued or running at once, the pages of every group are sent in turn so
+# large groups cannot starve small ones, 0 sends every page at once
+WATCHMAN_MAX_IN_FLIGHT_PAGES = int(os.getenv('WATCHMAN_MAX_IN_FLIGHT_PAGES', '4'))
+# the computers of a large sync are ingested by up to this many tasks in parallel, each with at least this many
+# computers, 1 ingests every sync in a single task
+WATCHMAN_INGEST_SHARDS = int(os.getenv('WATCHMAN_INGEST_SHARDS', '1'))
+WATCHMAN_INGEST_SHARD_MIN_SIZE = int(os.getenv('WATCHMAN_INGEST_SHARD_MIN_SIZE', '2000'))
+# the shared secret that signs the requests of the Watchman webhook, the webhook is disabled while it is empty
+WATCHMAN_WEBHOOK_SECRET = os.getenv('WATCHMAN_WEBHOOK_SECRET', '')
+# webhook events are applied in batches of up to this size, this many seconds after the first event of a batch arrives
+WATCHMAN_WEBHOOK_BATCH_SIZE = int(os.getenv('WATCHMAN_WEBHOOK_BATCH_SIZE', '1000'))
+WATCHMAN_WEBHOOK_BATCH_DELAY = int(os.getenv('WATCHMAN_WEBHOOK_BATCH_DELAY', '5'))
+
+# REPAIRSHOPR
+REPAIRSHOPR_POOL_SIZE = int(os.getenv('REPAIRSHOPR_POOL_SIZE', '10'))
+REPAIRSHOPR_CONNECT_TIMEOUT = float(os.getenv('REPAIRSHOPR_CONNECT_TIMEOUT', '5'))
+REPAIRSHOPR_READ_TIMEOUT = float(os.getenv('REPAIRSHOPR_READ_TIMEOUT', '60'))
+REPAIRSHOPR_CONCURRENCY = int(os.getenv('REPAIRSHOPR_CONCURRENCY', '4'))
+# requests per second shared by all workers, RepairShopr allows 180 requests per minute, 0 disables rate limiting
+REPAIRSHOPR_RATE_LIMIT = float(os.getenv('REPAIRSHOPR_RATE_LIMIT', '2'))
+REPAIRSHOPR_RATE_LIMIT_MIN = float(os.getenv('REPAIRSHOPR_RATE_LIMIT_MIN', '0.5'))
+REPAIRSHOPR_RATE_LIMIT_MAX = float(os.getenv('REPAIRSHOPR_RATE_LIMIT_MAX', '3'))
+REPAIRSHOPR_RATE_LIMIT_BURST = int(os.getenv('REPAIRSHOPR_RATE_LIMIT_BURST', '5'))
+REPAIRSHOPR_MAX_RETRIES = int(os.getenv('REPAIRSHOPR_MAX_RETRIES', '5'))
+REPAIRSHOPR_BACKOFF_BASE = float(os.getenv('REPAIRSHOPR_BACKOFF_BASE', '1'))
+REPAIRSHOPR_BACKOFF_MAX = float(os.getenv('REPAIRSHOPR_BACKOFF_MAX', '60'))
+# tickets updated up to this many seconds before the latest saved ticket are fetched again by every sync
+REPAIRSHOPR_CURSOR_OVERLAP = int(os.getenv('REPAIRSHOPR_CURSOR_OVERLAP', '3600'))
+
+# TASK JOINS
+# either 'counter' to join the pages of a sync or the chunks of a report with a Redis counter or 'chord' to join them
+# with a Celery chord, which polls the result backend every second until the last task is done, the results of a
+# counter join are kept for the TTL in seconds
+PAGE_JOIN = os.getenv('PAGE_JOIN', 'counter')
+PAGE_JOIN_TTL = int(os.getenv('PAGE_JOIN_TTL', '86400'))
+
+# REPORTS
+# the sub reports of a report are counted this many months at a time and the progress of its job is saved after every
+# chunk, 0 counts every month at once
+REPORT_CHUNK_MONTHS = int(os.getenv('REPORT_CHUNK_MONTHS', '12'))
+# reports with at least this many chunks count every chunk in its own task across the workers, 0 counts the chunks of
+# every report one after another in a single task
+REPORT_FAN_OUT_MIN_CHUNKS = int(os.getenv('REPORT_FAN_OUT_MIN_CHUNKS', '0'))
+# jobs that are not done this many seconds after they were created are marked failed
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', '3600'))
+
+# TASK RESULTS
+# results are kept for this many seconds and deleted in batches of this many rows
+RESULT_RETENTION = int(os.getenv('RESULT_RETENTION', '604800'))
+RESULT_COMPACTION_BATCH_SIZE = int(os.getenv('RESULT_COMPACTION_BATCH_SIZE', '1000'))
+# the results of these tasks are never read so they are not stored, the pages of a sync and the chunks of a report are
+# only read back from the result backend when they are joined by a chord
+RESULT_IGNORED_TASKS = [
+    'reporter.tasks_watchman.get_group',
+    'reporter.tasks_watchman.determine_computer_request_num',
+    'reporter.tasks_watchman.combine_computer_results',
+    'reporter.tasks_join.page_done',
+    'reporter.tasks_join.page_failed',
+    'reporter.tasks_watchman.finish_computers_combine',
+    'reporter.tasks_watchman.release_sync',
+    'reporter.tasks_watchman.sync_failed',
+    'reporter.tasks_watchman.apply_webhook_events',
+    'reporter.tasks_watchman.purge_claim_checks',
+    'reporter.tasks_results.compact_task_results',
+    'reporter.tasks_reports.build_report',
+    'reporter.tasks_reports.finish_report',
+    'reporter.tasks_reports.report_failed',
+    'reporter.tasks_reports.expire_report_jobs',
+]
+if PAGE_JOIN != 'chord':
+    RESULT_IGNORED_TASKS += [
+        'reporter.tasks_watchman.get_computers',
+        'reporter.tasks_watchman.ingest_computers',
+        'reporter.tasks_watchman.ingest_shard',
+        'reporter.tasks_reports.count_chunk',
+    ]
+CELERY_TASK_ANNOTATIONS = {task: {'ignore_result': True} for task in RESULT_IGNORED_TASKS}
@@ -0,0 +1,23 @@
+"""
+Test runner that keeps the tests away from the Redis database of a running deployment. The tests delete the keys of
+the fair queue, the webhook queue, the sync leases and the metrics by their production names, so they run against the
+REDIS_TEST_URL database instead of the REDIS_URL database.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if settings.REDIS_TEST_URL == settings.REDIS_URL:
+            raise ImproperlyConfigured('REDIS_TEST_URL must not be the same as REDIS_URL.')
+        self.redis_settings = override_settings(REDIS_URL=settings.REDIS_TEST_URL)
+        self.redis_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.redis_settings.disable()
+        super().teardown_test_environment(**kwargs)
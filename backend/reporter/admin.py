@@ -5,4 +5,9 @@ admin.site.register(models.Customer)
 admin.site.register(models.ServiceSchedule)
 admin.site.register(models.WatchmanComputer)
 admin.site.register(models.WatchmanWarning)
+admin.site.register(models.RepairShoprTicket)
 admin.site.register(models.Report)
+admin.site.register(models.ReportPlatform)
+admin.site.register(models.ReportJob)
+admin.site.register(models.ReportChunk)
+admin.site.register(models.SyncRun)
@@ -5,11 +5,42 @@
 API base URLs for use in requests.
 """
 
+import os
+
 # watchman URLs
-watchman = {
-    'base': 'https://outofajam.monitoringclient.com/v2.5/{}'
-}
-watchman['group'] = watchman['base'].format('groups/{}')
-watchman['groups'] = watchman['base'].format('groups')
-watchman['computer'] = watchman['base'].format('computers/{}')
-watchman['computers'] = watchman['base'].format('computers')
+watchman = {}
+
+
+def set_watchman_base(base):
+    """
+    Points the Watchman URLs at a different base URL, such as a local stand-in server.
+
+    :param base: The base URL with a '{}' placeholder for the endpoint path.
+    :return: None
+    """
+    watchman['base'] = base
+    watchman['group'] = watchman['base'].format('groups/{}')
+    watchman['groups'] = watchman['base'].format('groups')
+    watchman['computer'] = watchman['base'].format('computers/{}')
+    watchman['computers'] = watchman['base'].format('computers')
+
+
+set_watchman_base(os.getenv('WATCHMAN_API_URL', 'https://outofajam.monitoringclient.com/v2.5/{}'))
+
+
+# repairshopr URLs
+repairshopr = {}
+
+
+def set_repairshopr_base(base):
+    """
+    Points the RepairShopr URLs at a different base URL, such as a local stand-in server.
+
+    :param base: The base URL with a '{}' placeholder for the endpoint path.
+    :return: None
+    """
+    repairshopr['base'] = base
+    repairshopr['tickets'] = repairshopr['base'].format('tickets')
+
+
+set_repairshopr_base(os.getenv('REPAIRSHOPR_API_URL', 'https://outofajam.repairshopr.com/api/v1/{}'))
@@ -0,0 +1,145 @@
+"""
+Claim check storage for large task payloads. Instead of passing megabytes of JSON through the broker and the result
+backend, a task stores the payload once in a compressed blob store and passes a short reference to the next task.
+Blobs expire on their own after the CLAIM_CHECK_TTL setting.
+"""
+
+import json
+import os
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+
+from reporter.redis_connection import get_redis
+
+
+class RedisBlobStore:
+    def __init__(self, ttl):
+        """
+        :param ttl: The number of seconds a blob is kept for.
+        """
+        self.ttl = ttl
+
+    def put(self, key, data):
+        get_redis().setex(f'mrgen:blob:{key}', self.ttl, data)
+
+    def get(self, key):
+        return get_redis().get(f'mrgen:blob:{key}')
+
+    def delete(self, key):
+        get_redis().delete(f'mrgen:blob:{key}')
+
+    def purge_expired(self):
+        # redis expires the blobs itself
+        return 0
+
+
+class FileSystemBlobStore:
+    def __init__(self, directory, ttl):
+        """
+        :param directory: The directory the blobs are written to.
+        :param ttl: The number of seconds a blob is kept for.
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first so readers never see a partial blob
+        temp_path = self.path(f'.{key}.tmp')
+        with open(temp_path, 'wb') as blob_file:
+            blob_file.write(data)
+        os.replace(temp_path, self.path(key))
+
+    def get(self, key):
+        try:
+            if time.time() - os.path.getmtime(self.path(key)) > self.ttl:
+                return None
+            with open(self.path(key), 'rb') as blob_file:
+                return blob_file.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self):
+        """
+        Deletes every blob that is older than the TTL.
+
+        :return: Returns the number of blobs deleted.
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        purged = 0
+        expires = time.time() - self.ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < expires:
+                    self.delete(entry.name)
+                    purged += 1
+        return purged
+
+
+def get_store():
+    """
+    Creates the blob store selected by the CLAIM_CHECK_STORE setting.
+
+    :return: Returns either a RedisBlobStore or a FileSystemBlobStore object.
+    """
+    if settings.CLAIM_CHECK_STORE == 'filesystem':
+        return FileSystemBlobStore(settings.CLAIM_CHECK_DIR, settings.CLAIM_CHECK_TTL)
+    return RedisBlobStore(settings.CLAIM_CHECK_TTL)
+
+
+def store(payload):
+    """
+    Stores a JSON serializable payload if it is larger than the CLAIM_CHECK_THRESHOLD setting.
+
+    :param payload: The payload to store.
+    :return: Returns a claim check dictionary referencing the blob, or the payload itself if it is small.
+    """
+    data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    if len(data) < settings.CLAIM_CHECK_THRESHOLD:
+        return payload
+    key = uuid.uuid4().hex
+    get_store().put(key, zlib.compress(data))
+    return {'claim_check': key}
+
+
+def is_claim_check(value):
+    return isinstance(value, dict) and set(value) == {'claim_check'}
+
+
+def load(value):
+    """
+    Retrieves the payload referenced by a claim check. Values that are not claim checks are returned as is.
+
+    :param value: A claim check dictionary from store() or a payload.
+    :return: Returns the payload.
+    """
+    if not is_claim_check(value):
+        return value
+    data = get_store().get(value['claim_check'])
+    if data is None:
+        raise KeyError(f'claim check {value["claim_check"]} has expired or does not exist')
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def discard(value):
+    """
+    Deletes the blob referenced by a claim check before it expires. Values that are not claim checks are ignored.
+
+    :param value: A claim check dictionary from store() or a payload.
+    :return: None
+    """
+    if is_claim_check(value):
+        get_store().delete(value['claim_check'])
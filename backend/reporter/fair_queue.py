@@ -0,0 +1,154 @@
+"""
+Round-robin dispatcher that interleaves the page tasks of every Watchman group on the shared Celery queue. Instead of
+sending every page of a sync at once, the pages of each group wait in their own Redis list and are sent one group at a
+time, with at most WATCHMAN_MAX_IN_FLIGHT_PAGES pages of a group queued or running. A group with thousands of
+computers can then only hold a few slots of the Celery queue, so the pages of small groups never wait behind it.
+"""
+
+import json
+
+from celery import signature
+from django.conf import settings
+
+from reporter.redis_connection import get_redis
+
+RING_KEY = 'mrgen:fair:ring'
+ACTIVE_KEY = 'mrgen:fair:active'
+
+# appends the pages of a group and adds the group to the ring if it is not in it already
+PUSH_SCRIPT = """
+for i = 3, #ARGV do
+    redis.call('RPUSH', KEYS[3], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[3], tonumber(ARGV[2]))
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+"""
+
+# takes one page from every group in turn until every group is empty or at its limit of in-flight pages, groups that
+# are empty leave the ring
+TAKE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local maximum = tonumber(ARGV[3])
+local taken = {}
+local remaining = redis.call('LLEN', KEYS[1])
+local idle = 0
+while #taken < maximum * 2 and remaining > 0 and idle < remaining do
+    local group = redis.call('LPOP', KEYS[1])
+    local pages = 'mrgen:fair:' .. group .. ':pages'
+    local in_flight = 'mrgen:fair:' .. group .. ':in_flight'
+    if redis.call('LLEN', pages) == 0 then
+        redis.call('SREM', KEYS[2], group)
+        remaining = remaining - 1
+    else
+        redis.call('RPUSH', KEYS[1], group)
+        if tonumber(redis.call('GET', in_flight) or '0') >= limit then
+            idle = idle + 1
+        else
+            redis.call('INCR', in_flight)
+            redis.call('EXPIRE', in_flight, ttl)
+            table.insert(taken, group)
+            table.insert(taken, redis.call('LPOP', pages))
+            idle = 0
+        end
+    end
+end
+return taken
+"""
+
+# frees the slot of a page that has finished
+RELEASE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+def keys(group):
+    return [f'mrgen:fair:{group}:pages', f'mrgen:fair:{group}:in_flight']
+
+
+def enabled():
+    """
+    :return: Returns True if pages are dispatched through the fair queue, see the WATCHMAN_MAX_IN_FLIGHT_PAGES setting.
+    """
+    return settings.WATCHMAN_MAX_IN_FLIGHT_PAGES > 0
+
+
+def push(group, signatures):
+    """
+    Queues the page tasks of a group without sending them, see dispatch().
+
+    :param group: The Watchman group ID the pages belong to.
+    :param signatures: A list of task signatures with their links already set.
+    :return: None
+    """
+    if not signatures:
+        return
+    script = get_redis().register_script(PUSH_SCRIPT)
+    script(keys=[RING_KEY, ACTIVE_KEY, keys(group)[0]],
+           args=[group, settings.WATCHMAN_SYNC_LEASE_TTL] + [json.dumps(dict(sig)) for sig in signatures])
+
+
+def take(maximum=1000):
+    """
+    Takes the pages that can be sent now in round-robin order and counts them as in flight.
+
+    :param maximum: The maximum number of pages to take at once.
+    :return: Returns a list of (group ID, signature dictionary) tuples.
+    """
+    script = get_redis().register_script(TAKE_SCRIPT)
+    taken = script(keys=[RING_KEY, ACTIVE_KEY],
+                   args=[settings.WATCHMAN_MAX_IN_FLIGHT_PAGES, settings.WATCHMAN_SYNC_LEASE_TTL, maximum])
+    return [(taken[i].decode('utf-8'), json.loads(taken[i + 1])) for i in range(0, len(taken), 2)]
+
+
+def dispatch():
+    """
+    Sends every page that fits within the limits of its group.
+
+    :return: Returns the number of pages sent.
+    """
+    taken = take()
+    for _, page_signature in taken:
+        signature(page_signature).apply_async()
+    return len(taken)
+
+
+def release(group):
+    """
+    Frees the slot of a finished page of a group and sends the pages that can now be sent.
+
+    :param group: The Watchman group ID the page belonged to.
+    :return: None
+    """
+    get_redis().register_script(RELEASE_SCRIPT)(keys=[keys(group)[1]])
+    dispatch()
+
+
+def discard(group):
+    """
+    Drops the queued pages of a group whose sync has failed, then frees the slot of the failed page.
+
+    :param group: The Watchman group ID.
+    :return: None
+    """
+    get_redis().delete(keys(group)[0])
+    release(group)
+
+
+def in_flight(group):
+    """
+    :return: Returns the number of pages of a group that have been sent and not finished.
+    """
+    return int(get_redis().get(keys(group)[1]) or 0)
+
+
+def pending(group):
+    """
+    :return: Returns the number of pages of a group waiting to be sent.
+    """
+    return get_redis().llen(keys(group)[0])
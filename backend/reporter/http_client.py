@@ -0,0 +1,176 @@
+"""
+Pooled HTTP client shared by the Watchman and RepairShopr API clients. Every worker process keeps a single keep-alive
+session for each API so that consecutive requests reuse their connections instead of paying for a new TCP and TLS
+handshake. Requests are throttled by a token bucket shared by all workers and retried with exponential backoff when
+the API is rate limiting or unavailable. Every API is configured by the settings that start with its prefix, for
+example WATCHMAN_POOL_SIZE and WATCHMAN_MAX_RETRIES.
+"""
+
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from rest_framework import status
+
+from reporter import sync_runs
+
+# response status codes that are retried
+RETRY_STATUS_CODES = (
+    status.HTTP_429_TOO_MANY_REQUESTS,
+    status.HTTP_500_INTERNAL_SERVER_ERROR,
+    status.HTTP_502_BAD_GATEWAY,
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    status.HTTP_504_GATEWAY_TIMEOUT,
+)
+
+
+def retry_after(req):
+    """
+    Parses the Retry-After header of a response, which is either a number of seconds or an HTTP date.
+
+    :param req: The response.
+    :return: Returns the number of seconds to wait, or None if the header is missing or invalid.
+    """
+    value = req.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class PooledClient:
+    """
+    A pooled HTTP client for one API.
+    """
+
+    def __init__(self, settings_prefix, bucket):
+        """
+        :param settings_prefix: The prefix of the settings of the API, for example 'WATCHMAN'.
+        :param bucket: A function that creates the token bucket of the API, or returns None if rate limiting is
+        disabled, see ratelimit.
+        """
+        self.settings_prefix = settings_prefix
+        self.bucket = bucket
+        # the session of the current process and the process ID it was created in
+        self._session = None
+        self._session_pid = None
+
+    def setting(self, name):
+        """
+        :return: Returns the value of a setting of the API, for example setting('POOL_SIZE').
+        """
+        return getattr(settings, f'{self.settings_prefix}_{name}')
+
+    def create_session(self):
+        """
+        Creates a new session with a connection pool sized by the POOL_SIZE setting of the API.
+
+        :return: Returns a requests.Session object.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.setting('POOL_SIZE'), pool_maxsize=self.setting('POOL_SIZE'))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        return session
+
+    def get_session(self):
+        """
+        Retrieves the session of the current process. Sessions are never shared across a fork since the pooled
+        sockets would be shared by both processes.
+
+        :return: Returns a requests.Session object.
+        """
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = self.create_session()
+            self._session_pid = os.getpid()
+        return self._session
+
+    def backoff(self, attempt):
+        """
+        Calculates the delay before a retry with exponential backoff and full jitter.
+
+        :param attempt: The number of the retry, starting at 0.
+        :return: Returns the number of seconds to wait.
+        """
+        return random.uniform(0, min(self.setting('BACKOFF_MAX'), self.setting('BACKOFF_BASE') * 2 ** attempt))
+
+    def get(self, url, query_params=None):
+        """
+        Makes a GET request to the API with the pooled session. Rate limited and failed requests are retried up to
+        MAX_RETRIES times, waiting for the Retry-After header when the API sends one.
+
+        :param url: The URL to request.
+        :param query_params: A dictionary of query parameters.
+        :return: Returns the JSON decoded response body.
+        """
+        bucket = self.bucket()
+        max_retries = self.setting('MAX_RETRIES')
+        attempt = 0
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                req = self.get_session().get(url,
+                                             params=query_params,
+                                             timeout=(self.setting('CONNECT_TIMEOUT'), self.setting('READ_TIMEOUT')))
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= max_retries:
+                    raise
+                req = None
+            # return results or error
+            if req is not None and req.status_code == status.HTTP_200_OK:
+                # count the bytes sent over the wire, which are compressed if the response was
+                sync_runs.add('bytes_downloaded', int(req.headers.get('Content-Length', len(req.content))))
+                return req.json()
+            if req is not None and (req.status_code not in RETRY_STATUS_CODES or attempt >= max_retries):
+                raise Exception(f'request returned status code {req.status_code}')
+            # wait before retrying, slowing every worker down if the API is rate limiting
+            delay = retry_after(req) if req is not None else None
+            if delay is None:
+                delay = self.backoff(attempt)
+            if bucket is not None and req is not None and req.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                bucket.penalize(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def get_many(self, url, query_params_list, concurrency=None):
+        """
+        Makes concurrent GET requests to the API from a single task. The requests are scheduled on an asyncio event
+        loop and limited by a semaphore, each one running the pooled session in a worker thread.
+
+        :param url: The URL to request.
+        :param query_params_list: A list of query parameter dictionaries, one for each request.
+        :param concurrency: The maximum number of requests in flight, defaults to the CONCURRENCY setting of the API.
+        :return: Returns a list of JSON decoded response bodies in the same order as the query parameters.
+        """
+        concurrency = concurrency or self.setting('CONCURRENCY')
+
+        async def fetch_all(executor):
+            loop = asyncio.get_event_loop()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch(query_params):
+                async with semaphore:
+                    return await loop.run_in_executor(executor, self.get, url, query_params)
+
+            return await asyncio.gather(*(fetch(query_params) for query_params in query_params_list))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return asyncio.run(fetch_all(executor))
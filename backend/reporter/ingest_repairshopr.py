@@ -0,0 +1,115 @@
+"""
+Bulk ingestion helpers used by the RepairShopr tasks to persist the results of the RepairShopr '/tickets' endpoint.
+Syncs are incremental, every sync only fetches the tickets updated since the latest ticket already saved.
+"""
+
+import datetime as dt
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reporter import models
+from reporter.ingest_watchman import BATCH_SIZE
+
+# the fields written when a ticket changes
+TICKET_FIELDS = ('number', 'subject', 'status', 'date_created', 'date_updated', 'date_resolved')
+
+# the ticket statuses that count as resolved
+RESOLVED_STATUSES = ('Resolved',)
+
+
+def cursor(customer_id):
+    """
+    Calculates the point a sync of a customer's tickets starts from. The cursor is moved back by the
+    REPAIRSHOPR_CURSOR_OVERLAP setting so tickets updated while the previous sync was paging are fetched again.
+
+    :param customer_id: The RepairShopr customer ID.
+    :return: Returns an aware datetime, or None if no ticket of the customer has been saved yet.
+    """
+    latest = models.RepairShoprTicket.objects.filter(
+        repairshopr_id=customer_id
+    ).aggregate(latest=Max('date_updated'))['latest']
+    if latest is None:
+        return None
+    return latest - dt.timedelta(seconds=settings.REPAIRSHOPR_CURSOR_OVERLAP)
+
+
+def parse_timestamp(value):
+    """
+    Parses an ISO 8601 timestamp from the RepairShopr API.
+
+    :return: Returns an aware datetime, or None if the value is empty.
+    """
+    if not value:
+        return None
+    timestamp = parse_datetime(value)
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, timezone.utc)
+    return timestamp
+
+
+def ticket_values(ticket, date_resolved=None):
+    """
+    Converts a ticket from the RepairShopr '/tickets' endpoint to model field values.
+
+    :param ticket: A JSON formatted ticket dictionary.
+    :param date_resolved: The resolved date of the saved ticket, kept while the ticket stays resolved.
+    :return: Returns a dictionary of field values.
+    """
+    date_updated = parse_timestamp(ticket['updated_at'])
+    if ticket['status'] not in RESOLVED_STATUSES:
+        # reopened tickets are no longer resolved
+        date_resolved = None
+    elif date_resolved is None:
+        resolved_at = parse_timestamp(ticket.get('resolved_at')) or date_updated
+        date_resolved = resolved_at.date()
+    return {
+        'number': str(ticket['number']),
+        'subject': ticket.get('subject') or '',
+        'status': ticket['status'],
+        'date_created': parse_timestamp(ticket['created_at']).date(),
+        'date_updated': date_updated,
+        'date_resolved': date_resolved,
+    }
+
+
+def upsert_tickets(customer_id, json):
+    """
+    Inserts new tickets and updates changed tickets of a customer. The saved rows of the tickets in the results are
+    loaded with one query and compared in memory so that only new and changed rows are written.
+
+    :param customer_id: The RepairShopr customer ID.
+    :param json: A list of tickets from the RepairShopr '/tickets' endpoint.
+    :return: Returns a dictionary with the number of tickets inserted, updated and left unchanged.
+    """
+    # index the results by ticket ID, later duplicates win
+    tickets = {str(ticket['id']): ticket for ticket in json}
+    existing = {ticket_object.ticket_id: ticket_object
+                for ticket_object in models.RepairShoprTicket.objects.filter(ticket_id__in=tickets.keys()).order_by()}
+    new_objects = []
+    changed_objects = []
+    for ticket_id, ticket in tickets.items():
+        ticket_object = existing.get(ticket_id)
+        if ticket_object is None:
+            new_objects.append(models.RepairShoprTicket(repairshopr_id_id=customer_id,
+                                                        ticket_id=ticket_id,
+                                                        **ticket_values(ticket)))
+            continue
+        values = ticket_values(ticket, ticket_object.date_resolved)
+        if any(getattr(ticket_object, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(ticket_object, field, value)
+            changed_objects.append(ticket_object)
+    # write the changes
+    if new_objects or changed_objects:
+        with transaction.atomic():
+            models.RepairShoprTicket.objects.bulk_create(new_objects, batch_size=BATCH_SIZE)
+            models.RepairShoprTicket.objects.bulk_update(changed_objects, TICKET_FIELDS, batch_size=BATCH_SIZE)
+    return {
+        'inserted': len(new_objects),
+        'updated': len(changed_objects),
+        'unchanged': len(tickets) - len(new_objects) - len(changed_objects),
+    }
@@ -0,0 +1,373 @@
+"""
+Bulk ingestion helpers used by the Watchman tasks to persist the results of the Watchman '/computers' endpoint.
+"""
+
+import datetime as dt
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from reporter import models, sync_runs, watchman_records
+from reporter.watchman_records import COMPUTER_FIELDS
+
+# the number of rows written by a single bulk query
+BATCH_SIZE = 500
+
+
+def batches(items, size=BATCH_SIZE):
+    """
+    Generator function that splits a list of items into lists of at most the given size.
+    """
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def check_customers(group_ids):
+    """
+    Checks that a customer exists for every Watchman group ID with a single query.
+
+    :param group_ids: A set of Watchman group IDs.
+    :return: None
+    """
+    found = set(models.Customer.objects.filter(
+        watchman_group_id__in=group_ids
+    ).order_by().values_list('watchman_group_id', flat=True))
+    missing = set(group_ids) - found
+    if missing:
+        raise models.Customer.DoesNotExist(f'no customer exists for Watchman group {", ".join(sorted(missing))}')
+
+
+def upsert_computers(json, page=False, today=None):
+    """
+    Inserts new computers and updates changed computers from the results of the Watchman '/computers' endpoint. The
+    existing computers of every group in the results are loaded with one query and compared in memory so that only
+    new and changed rows are written with batched bulk queries inside a single transaction.
+
+    :param json: A list of computers from the Watchman '/computers' endpoint, see watchman_records.load().
+    :param page: Set when the results are a single page so only the existing rows of its computers are loaded.
+    :param today: The date the results were reported on, defaults to today. Set when replaying archived results.
+    :return: Returns a dictionary with the number of computers inserted, updated and left unchanged.
+    """
+    today = today or dt.date.today()
+    # index the results by computer ID, later duplicates win
+    computers = {computer.uid: computer for computer in watchman_records.load(json)}
+    group_ids = {computer.group for computer in computers.values()}
+    check_customers(group_ids)
+    # load every existing computer of the groups or page at once
+    queryset = models.WatchmanComputer.objects.filter(watchman_group_id__in=group_ids)
+    if page:
+        queryset = queryset.filter(computer_id__in=computers.keys())
+    existing = {computer_object.computer_id: computer_object for computer_object in queryset.order_by()}
+    # sort the computers into new, changed and unchanged rows
+    new_objects = []
+    changed_objects = []
+    stale_ids = []
+    unchanged = 0
+    for computer_id, computer in computers.items():
+        computer_object = existing.get(computer_id)
+        # computers that have not changed since their last sync are not compared field by field
+        if computer_object is not None and computer_object.fingerprint == computer.fingerprint():
+            values = None
+        else:
+            values = computer.values()
+        if computer_object is None:
+            new_objects.append(models.WatchmanComputer(watchman_group_id_id=computer.group,
+                                                       computer_id=computer_id,
+                                                       **values))
+        elif values is not None and any(getattr(computer_object, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(computer_object, field, value)
+            computer_object.date_last_reported = today
+            changed_objects.append(computer_object)
+        else:
+            unchanged += 1
+            # unchanged computers still need their last reported date moved forward
+            if computer_object.date_last_reported != today:
+                stale_ids.append(computer_object.pk)
+    # write the changes
+    if new_objects or changed_objects or stale_ids:
+        with sync_runs.timer('write'), transaction.atomic():
+            models.WatchmanComputer.objects.bulk_create(new_objects, batch_size=BATCH_SIZE)
+            # inserted rows are always dated today, move them to the reported date
+            if today != dt.date.today():
+                for batch in batches(computer_object.computer_id for computer_object in new_objects):
+                    models.WatchmanComputer.objects.filter(computer_id__in=batch).update(date_reported=today,
+                                                                                         date_last_reported=today)
+            models.WatchmanComputer.objects.bulk_update(changed_objects,
+                                                        COMPUTER_FIELDS + ('date_last_reported',),
+                                                        batch_size=BATCH_SIZE)
+            for batch in batches(stale_ids):
+                models.WatchmanComputer.objects.filter(pk__in=batch).update(date_last_reported=today)
+    return {
+        'inserted': len(new_objects),
+        'updated': len(changed_objects),
+        'unchanged': unchanged,
+    }
+
+
+def reconcile_warnings(json, page=False, today=None):
+    """
+    Reconciles the plugin results from the Watchman '/computers' endpoint with the open warnings in the database. Every
+    open warning of the groups in the results is loaded into a dictionary keyed by computer and warning ID, then the
+    warnings to create, resolve and mark as checked are computed as sets and written in batches. Computers whose
+    fingerprint matches the last sync are skipped and the fingerprints of the others are saved once they have been
+    reconciled.
+
+    :param json: A list of computers from the Watchman '/computers' endpoint, see watchman_records.load().
+    :param page: Set when the results are a single page so only the open warnings of its computers are loaded.
+    :param today: The date the results were reported on, defaults to today. Set when replaying archived results.
+    :return: Returns a dictionary with the number of warnings created, resolved and checked along with the number of
+    computers skipped.
+    """
+    today = today or dt.date.today()
+    computers = watchman_records.load(json)
+    group_ids = {computer.group for computer in computers}
+    check_customers(group_ids)
+    # skip the computers that have not changed since the last sync
+    fingerprints = models.WatchmanComputer.objects.filter(watchman_group_id__in=group_ids)
+    if page:
+        fingerprints = fingerprints.filter(computer_id__in={computer.uid for computer in computers})
+    fingerprints = {
+        computer_id: (pk, fingerprint)
+        for pk, computer_id, fingerprint in fingerprints.order_by().values_list('pk', 'computer_id', 'fingerprint')
+    }
+    changed = {}
+    for computer in computers:
+        pk, fingerprint = fingerprints.get(computer.uid, (None, None))
+        new_fingerprint = computer.fingerprint()
+        if new_fingerprint != fingerprint:
+            changed[computer.uid] = (pk, new_fingerprint, computer)
+    skipped = len({computer.uid for computer in computers}) - len(changed)
+    if not changed:
+        return {'created': 0, 'resolved': 0, 'checked': 0, 'skipped': skipped}
+    # load every open warning of the changed computers at once, or of the whole groups if there are many
+    queryset = models.WatchmanWarning.objects.filter(watchman_group_id__in=group_ids, date_resolved=None)
+    if page or len(changed) <= BATCH_SIZE:
+        queryset = queryset.filter(computer_id__in=changed.keys())
+    open_warnings = {
+        (computer_id, warning_id): pk
+        for pk, computer_id, warning_id in queryset.order_by().values_list('pk', 'computer_id', 'warning_id')
+    }
+    # sort the plugin results into warnings to create, resolve and check
+    created = {}
+    resolved = set()
+    checked = set()
+    for _, _, computer in changed.values():
+        for plugin in computer.plugins:
+            key = (computer.uid, plugin.uid)
+            pk = open_warnings.get(key)
+            if pk is not None:
+                # status is OK and a warning does exist
+                if plugin.status == 'OK':
+                    resolved.add(pk)
+                checked.add(pk)
+            elif plugin.status == 'WARNING' and key not in created:
+                created[key] = models.WatchmanWarning(watchman_group_id_id=computer.group,
+                                                      computer_id_id=computer.uid,
+                                                      warning_id=plugin.uid,
+                                                      name=plugin.name,
+                                                      details=plugin.details)
+    # resolved warnings are updated separately from warnings that are only checked
+    checked -= resolved
+    # write the changes
+    with sync_runs.timer('write'), transaction.atomic():
+        models.WatchmanWarning.objects.bulk_create(created.values(), batch_size=BATCH_SIZE)
+        if created and today != dt.date.today():
+            backdate_warnings(created.keys(), today)
+        for batch in batches(resolved):
+            models.WatchmanWarning.objects.filter(pk__in=batch).update(date_resolved=today, date_last_checked=today)
+        for batch in batches(checked):
+            models.WatchmanWarning.objects.filter(pk__in=batch).update(date_last_checked=today)
+        models.WatchmanComputer.objects.bulk_update(
+            [models.WatchmanComputer(pk=pk, fingerprint=fingerprint)
+             for pk, fingerprint, _ in changed.values() if pk is not None],
+            ['fingerprint'],
+            batch_size=BATCH_SIZE
+        )
+    return {
+        'created': len(created),
+        'resolved': len(resolved),
+        'checked': len(checked),
+        'skipped': skipped,
+    }
+
+
+def apply_plugin_events(events, today=None):
+    """
+    Applies plugin status changes pushed by the Watchman webhook with the same semantics as reconcile_warnings(). A
+    warning is created for a plugin that changed to a warning status, the open warning of a plugin that changed back to
+    OK is resolved and any other open warning is marked as checked. Only the latest event of every plugin is applied.
+    The fingerprints of the affected computers are cleared so the next sync reconciles them in full.
+
+    :param events: A list of event dictionaries, each with the 'computer' ID and the 'plugin' result that changed.
+    :param today: The date the events were reported on, defaults to today.
+    :return: Returns a dictionary with the number of warnings created, resolved and checked along with the number of
+    events skipped because their computer has not been synced yet.
+    """
+    today = today or dt.date.today()
+    # the latest event of every plugin wins
+    latest = {}
+    for event in events:
+        latest[(event['computer'], event['plugin']['uid'])] = watchman_records.PluginRecord.from_json(event['plugin'])
+    # events of computers that have not been synced yet are left to the next sync
+    group_ids = computer_group_ids(computer_id for computer_id, _ in latest)
+    skipped = sum(1 for computer_id, _ in latest if computer_id not in group_ids)
+    open_warnings = {
+        (computer_id, warning_id): pk
+        for pk, computer_id, warning_id in models.WatchmanWarning.objects.filter(
+            computer_id__in=group_ids.keys(),
+            date_resolved=None
+        ).order_by().values_list('pk', 'computer_id', 'warning_id')
+    }
+    # sort the plugin results into warnings to create, resolve and check
+    created = []
+    resolved = set()
+    checked = set()
+    for key, plugin in latest.items():
+        computer_id = key[0]
+        if computer_id not in group_ids:
+            continue
+        pk = open_warnings.get(key)
+        if pk is not None:
+            if plugin.status == 'OK':
+                resolved.add(pk)
+            else:
+                checked.add(pk)
+        elif plugin.status == 'WARNING':
+            created.append(models.WatchmanWarning(watchman_group_id_id=group_ids[computer_id],
+                                                  computer_id_id=computer_id,
+                                                  warning_id=plugin.uid,
+                                                  name=plugin.name,
+                                                  details=plugin.details))
+    # write the changes
+    with transaction.atomic():
+        models.WatchmanWarning.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        for batch in batches(resolved):
+            models.WatchmanWarning.objects.filter(pk__in=batch).update(date_resolved=today, date_last_checked=today)
+        for batch in batches(checked):
+            models.WatchmanWarning.objects.filter(pk__in=batch).update(date_last_checked=today)
+        for batch in batches(group_ids.keys()):
+            models.WatchmanComputer.objects.filter(computer_id__in=batch).update(fingerprint='')
+    return {
+        'created': len(created),
+        'resolved': len(resolved),
+        'checked': len(checked),
+        'skipped': skipped,
+    }
+
+
+def computer_group_ids(computer_ids):
+    """
+    Looks up the Watchman groups of computers with a single query.
+
+    :param computer_ids: An iterable of Watchman computer IDs.
+    :return: Returns a dictionary of Watchman group IDs keyed by computer ID, computers that have not been synced yet
+    are left out.
+    """
+    return dict(models.WatchmanComputer.objects.filter(
+        computer_id__in=set(computer_ids)
+    ).order_by().values_list('computer_id', 'watchman_group_id'))
+
+
+def backdate_warnings(keys, today):
+    """
+    Moves the dates of newly created warnings to the date they were reported on. Created warnings are always dated
+    today, so this is only needed when replaying archived results.
+
+    :param keys: An iterable of (computer ID, warning ID) pairs of the open warnings that were created.
+    :param today: The date the warnings were reported on.
+    :return: None
+    """
+    keys = set(keys)
+    for computer_ids in batches({computer_id for computer_id, _ in keys}):
+        created = [
+            pk
+            for pk, computer_id, warning_id in models.WatchmanWarning.objects.filter(
+                computer_id__in=computer_ids,
+                date_resolved=None,
+                date_reported=dt.date.today()
+            ).order_by().values_list('pk', 'computer_id', 'warning_id')
+            if (computer_id, warning_id) in keys
+        ]
+        for batch in batches(created):
+            models.WatchmanWarning.objects.filter(pk__in=batch).update(date_reported=today, date_last_checked=today)
+
+
+def open_warning_keys(json):
+    """
+    Lists the warnings from the Watchman '/computers' endpoint results that are open after reconciliation.
+
+    :param json: A list of computers from the Watchman '/computers' endpoint, see watchman_records.load().
+    :return: Returns a list of [computer ID, warning ID] pairs for every plugin without an OK status.
+    """
+    return [
+        [computer.uid, plugin.uid]
+        for computer in watchman_records.load(json)
+        for plugin in computer.plugins
+        if plugin.status != 'OK'
+    ]
+
+
+def resolve_unseen_warnings(group_id, seen, today=None):
+    """
+    Resolves the open warnings of a Watchman group that were not reported as still failing by any page of a sync.
+
+    :param group_id: The Watchman group ID that was synced.
+    :param seen: An iterable of (computer ID, warning ID) pairs for the warnings that are still open.
+    :param today: The date the sync was fetched on, defaults to today.
+    :return: Returns the number of warnings resolved.
+    """
+    today = today or dt.date.today()
+    seen = {tuple(key) for key in seen}
+    unseen = [
+        pk
+        for pk, computer_id, warning_id in models.WatchmanWarning.objects.filter(
+            watchman_group_id=group_id,
+            date_resolved=None
+        ).order_by().values_list('pk', 'computer_id', 'warning_id')
+        if (computer_id, warning_id) not in seen
+    ]
+    with sync_runs.timer('write'), transaction.atomic():
+        for batch in batches(unseen):
+            models.WatchmanWarning.objects.filter(pk__in=batch).update(date_resolved=today, date_last_checked=today)
+    return len(unseen)
+
+
+def shard_of(computer_id, shards):
+    """
+    Assigns a computer to a shard by a stable hash of its ID, so every sync sends a computer to the same shard.
+
+    :param computer_id: The Watchman computer ID.
+    :param shards: The number of shards.
+    :return: Returns the shard number, from 0 to shards - 1.
+    """
+    return zlib.crc32(computer_id.encode('utf-8')) % shards
+
+
+def shard_count(computers):
+    """
+    Calculates the number of shards the computers of a sync are ingested in, at most WATCHMAN_INGEST_SHARDS with at
+    least WATCHMAN_INGEST_SHARD_MIN_SIZE computers in each.
+
+    :param computers: The number of computers.
+    :return: Returns the number of shards, 1 if the computers are not worth splitting.
+    """
+    return max(1, min(settings.WATCHMAN_INGEST_SHARDS, computers // settings.WATCHMAN_INGEST_SHARD_MIN_SIZE))
+
+
+def ingest_page(json):
+    """
+    Saves the computers and warnings of a single page from the Watchman '/computers' endpoint.
+
+    :param json: A list of computers from one page of the Watchman '/computers' endpoint, see watchman_records.load().
+    :return: Returns a dictionary with the computer and warning counts of the page along with the keys of the
+    warnings that are still open.
+    """
+    json = watchman_records.load(json)
+    return {
+        'computers': upsert_computers(json, page=True),
+        'warnings': reconcile_warnings(json, page=True),
+        'open': open_warning_keys(json),
+    }
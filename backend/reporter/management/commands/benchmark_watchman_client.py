@@ -0,0 +1,53 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from reporter import watchman_client, watchman_stub
+
+
+class Command(BaseCommand):
+    help = 'Measures Watchman computer pages per second with and without connection pooling against a local stub.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=50, help='The number of pages to request.')
+        parser.add_argument('--per-page', type=int, default=100, help='The number of computers per page.')
+        parser.add_argument('--plugins', type=int, default=40, help='The number of plugin results per computer.')
+        parser.add_argument('--handshake-ms', type=float, default=30,
+                            help='The simulated handshake time of a new connection in milliseconds.')
+
+    def handle(self, *args, **options):
+        # start the stub server with a single group large enough for every page
+        group_id = 'g_benchmark'
+        computers = [watchman_stub.generate_computer(group_id, number, options['plugins'])
+                     for number in range(options['pages'] * options['per_page'])]
+        server = watchman_stub.WatchmanStubServer({group_id: computers},
+                                                  handshake_delay=options['handshake_ms'] / 1000)
+        url = server.start().format('computers')
+        # build the query parameters for every page
+        pages = [{'group_id': group_id, 'page': page, 'per_page': options['per_page'], 'expand[]': 'plugin_results'}
+                 for page in range(1, options['pages'] + 1)]
+        try:
+            # a new connection for every page
+            elapsed = self.time_pages(lambda query_params: requests.get(url, query_params).json(), pages)
+            self.report('without pooling', len(pages), elapsed)
+            # the pooled keep-alive session
+            session = watchman_client.get_session()
+            elapsed = self.time_pages(lambda query_params: session.get(url, params=query_params).json(), pages)
+            self.report('with pooling', len(pages), elapsed)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @staticmethod
+    def time_pages(fetch, pages):
+        """
+        Times how long it takes to fetch every page.
+        """
+        start = time.perf_counter()
+        for query_params in pages:
+            fetch(query_params)
+        return time.perf_counter() - start
+
+    def report(self, label, pages, elapsed):
+        self.stdout.write(f'{label}: {pages} pages in {elapsed:.2f}s ({pages / elapsed:.1f} pages/s)')
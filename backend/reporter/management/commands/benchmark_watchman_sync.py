@@ -0,0 +1,178 @@
+import os
+import resource
+import threading
+import time
+
+from celery import current_app
+from celery.signals import task_postrun, task_prerun
+from django.db import connection
+from django.test import override_settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reporter import api_urls, models, tasks_watchman, watchman_stub
+
+
+class Command(BaseCommand):
+    help = 'Runs the Watchman sync pipeline against a local stand-in server and reports the cost of every stage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=2, help='The number of Watchman groups.')
+        parser.add_argument('--computers', type=int, default=500, help='The number of computers in each group.')
+        parser.add_argument('--plugins', type=int, default=40, help='The number of plugin results per computer.')
+        parser.add_argument('--runs', type=int, default=2, help='The number of syncs of every group.')
+        parser.add_argument('--churn', type=float, default=0.05,
+                            help='The fraction of computers that change between runs.')
+        parser.add_argument('--fetch-mode', choices=tasks_watchman.FETCH_MODES, default='combine',
+                            help='The fetch mode to run the pipeline with.')
+        parser.add_argument('--seed', type=int, default=0, help='The seed of the generated changes.')
+        parser.add_argument('--use-configured-database', action='store_true',
+                            help='Write the benchmark data to the configured database instead of a throwaway test '
+                                 'database. The data is removed afterwards.')
+
+    def handle(self, *args, **options):
+        groups = watchman_stub.generate_groups(options['groups'], options['computers'], options['plugins'])
+        if options['use_configured_database']:
+            if models.Customer.objects.filter(watchman_group_id__in=groups).exists():
+                raise CommandError('Customers with the benchmark group IDs already exist.')
+            self.benchmark(groups, options)
+            return
+        # run against a test database that is destroyed afterwards, never the configured database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.benchmark(groups, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, groups, options):
+        """
+        Syncs every group the given number of times against a local stand-in server.
+        """
+        # start the stand-in server and point the Watchman URLs at it
+        server = watchman_stub.WatchmanStubServer(groups)
+        original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(server.start())
+        # create a customer for every group
+        customers = [models.Customer.objects.create(name=f'benchmark {group_id}', watchman_group_id=group_id)
+                     for group_id in groups]
+        # the tasks run in this process, without rate limiting
+        current_app.conf.task_always_eager = True
+        try:
+            with override_settings(WATCHMAN_RATE_LIMIT=0):
+                for run in range(1, options['runs'] + 1):
+                    if run > 1:
+                        changed = watchman_stub.churn(groups, options['churn'], options['seed'] + run)
+                        self.stdout.write(f'changed {changed} computers')
+                    self.stdout.write(f'run {run}')
+                    for group_id in groups:
+                        self.sync(group_id, options['fetch_mode'])
+        finally:
+            # remove the benchmark data and stop the server
+            current_app.conf.task_always_eager = False
+            for customer in customers:
+                customer.delete()
+            api_urls.set_watchman_base(original_base)
+            server.shutdown()
+            server.server_close()
+
+    def sync(self, group_id, fetch_mode):
+        """
+        Runs update_client() for one group with its tasks executed eagerly in this process, so every sync goes through
+        the same task chain, page join, lease, claim checks and SyncRun as a sync on the workers. Reports the cost of
+        every task followed by the stage times and counts recorded in the SyncRun of the sync.
+        """
+        self.stdout.write(f'  {group_id} ({fetch_mode})')
+        with TaskProfiler() as profiler:
+            if tasks_watchman.update_client.apply((group_id,), {'fetch_mode': fetch_mode}).get() is None:
+                raise CommandError(f'Another sync of {group_id} is running.')
+        for name, stats in profiler.tasks.items():
+            self.stdout.write(f'    {name:<30} {stats["calls"]:5} calls {stats["seconds"]:8.3f}s '
+                              f'{stats["queries"]:6} queries {stats["peak"] / 2 ** 20:8.1f} MB peak RSS')
+        sync_run = models.SyncRun.objects.filter(customer__watchman_group_id=group_id).first()
+        rows = (sync_run.computers_inserted + sync_run.computers_updated + sync_run.warnings_created +
+                sync_run.warnings_resolved + sync_run.warnings_checked)
+        self.stdout.write(f'    sync {sync_run.status} in {sync_run.duration_seconds:.3f}s: '
+                          f'{sync_run.fetch_seconds:.3f}s fetch, {sync_run.parse_seconds:.3f}s parse, '
+                          f'{sync_run.write_seconds:.3f}s write, {sync_run.page_count} pages, '
+                          f'{sync_run.bytes_downloaded} bytes, {rows} rows written')
+
+
+class TaskProfiler:
+    """
+    Measures the tasks that run while the context is active through the Celery task signals. The time and queries of
+    a task that runs another task eagerly are only counted towards the inner task, just like the nested timers of
+    sync_runs. The resident set size of the process is sampled from a background thread and its peak is recorded for
+    the innermost running task, since the peak reported by getrusage() covers the whole life of the process.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        # the stats of every task keyed by task name, in the order the tasks first ran
+        self.tasks = {}
+        # the name and start time of the running tasks, innermost last
+        self._running = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._queries = connection.execute_wrapper(self.count_query)
+
+    def __enter__(self):
+        task_prerun.connect(self.task_started)
+        task_postrun.connect(self.task_finished)
+        self._queries.__enter__()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._queries.__exit__(*exc_info)
+        task_prerun.disconnect(self.task_started)
+        task_postrun.disconnect(self.task_finished)
+
+    def stats(self, name):
+        return self.tasks.setdefault(name, {'calls': 0, 'seconds': 0.0, 'queries': 0, 'peak': 0})
+
+    def task_started(self, sender=None, **kwargs):
+        now = time.perf_counter()
+        # pause the enclosing task
+        if self._running:
+            self.stats(self._running[-1][0])['seconds'] += now - self._running[-1][1]
+        name = sender.name.rsplit('.', 1)[-1]
+        self.stats(name)['calls'] += 1
+        self._running.append([name, now])
+        self.sample()
+
+    def task_finished(self, sender=None, **kwargs):
+        now = time.perf_counter()
+        name, started = self._running.pop()
+        self.stats(name)['seconds'] += now - started
+        # resume the enclosing task
+        if self._running:
+            self._running[-1][1] = now
+
+    def count_query(self, execute, sql, params, many, context):
+        if self._running:
+            self.stats(self._running[-1][0])['queries'] += 1
+        return execute(sql, params, many, context)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        running = self._running[-1:]
+        if running:
+            stats = self.stats(running[0][0])
+            stats['peak'] = max(stats['peak'], current_rss())
+
+
+def current_rss():
+    """
+    :return: Returns the current resident set size of the process in bytes, read from /proc where it is available or
+    else the peak so far from getrusage().
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,85 @@
+import gzip
+import json
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reporter import watchman_stub, webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Posts recorded or generated Watchman webhook events to the webhook endpoint for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='The URL of the webhook endpoint, for example '
+                                        'http://localhost:8000/api/webhook/watchman')
+        parser.add_argument('--file', help='A file of recorded events with one JSON event per line, may be gzipped.')
+        parser.add_argument('--generate', type=int, default=0,
+                            help='The number of events to generate for the computers of the stub groups instead.')
+        parser.add_argument('--groups', type=int, default=1, help='The number of stub groups to generate events for.')
+        parser.add_argument('--computers', type=int, default=100,
+                            help='The number of computers in each stub group to generate events for.')
+        parser.add_argument('--plugins', type=int, default=40, help='The number of plugins of each computer.')
+        parser.add_argument('--batch-size', type=int, default=1, help='The number of events posted by every request.')
+        parser.add_argument('--concurrency', type=int, default=4, help='The number of requests in flight.')
+        parser.add_argument('--repeat', type=int, default=1, help='The number of times every event is posted.')
+        parser.add_argument('--secret', help='The webhook secret, defaults to the WATCHMAN_WEBHOOK_SECRET setting.')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            events = self.read_events(options['file'])
+        elif options['generate']:
+            events = self.generate_events(options)
+        else:
+            raise CommandError('either --file or --generate is required')
+        events = events * options['repeat']
+        secret = options['secret'] if options['secret'] is not None else settings.WATCHMAN_WEBHOOK_SECRET
+        bodies = [json.dumps(events[i:i + options['batch_size']]).encode('utf-8')
+                  for i in range(0, len(events), options['batch_size'])]
+        session = requests.Session()
+
+        def post(body):
+            headers = {'Content-Type': 'application/json', 'X-Watchman-Signature': webhook_events.sign(body, secret)}
+            return session.post(options['url'], data=body, headers=headers).status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            status_codes = Counter(executor.map(post, bodies))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{len(events)} events in {len(bodies)} requests in {elapsed:.2f}s '
+                          f'({len(events) / elapsed:.1f} events/s, {len(bodies) / elapsed:.1f} requests/s)')
+        for status_code, count in sorted(status_codes.items()):
+            self.stdout.write(f'  {status_code}: {count} requests')
+
+    @staticmethod
+    def read_events(path):
+        """
+        Reads recorded events, one JSON event or list of events per line.
+        """
+        opener = gzip.open if path.endswith('.gz') else open
+        events = []
+        with opener(path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    event = json.loads(line)
+                    events.extend(event if isinstance(event, list) else [event])
+        return events
+
+    @staticmethod
+    def generate_events(options):
+        """
+        Generates random plugin status changes for the computers of the stub groups, see watchman_stub.
+        """
+        generator = random.Random(0)
+        return [
+            watchman_stub.generate_event(f'g_stub{generator.randrange(options["groups"])}',
+                                         generator.randrange(options['computers']),
+                                         generator.randrange(options['plugins']),
+                                         generator.choice(('ok', 'warning')))
+            for _ in range(options['generate'])
+        ]
@@ -0,0 +1,80 @@
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand, CommandError
+
+from reporter import ingest_watchman, models, snapshots, tasks_watchman, watchman_records
+
+
+class Command(BaseCommand):
+    help = ('Re-ingests archived Watchman snapshots through parse_computers and parse_warnings in chronological order '
+            'and resolves the warnings every snapshot no longer reports.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='The snapshot directory, defaults to the WATCHMAN_SNAPSHOT_DIR setting.')
+        parser.add_argument('--group', action='append', dest='groups',
+                            help='A Watchman group ID to replay, may be repeated. Defaults to every group.')
+        parser.add_argument('--since', help='Only replay syncs from this date on, formatted as YYYY-MM-DD.')
+        parser.add_argument('--until', help='Only replay syncs before this date, formatted as YYYY-MM-DD.')
+        parser.add_argument('--create-customers', action='store_true',
+                            help='Create a customer for every group that does not have one.')
+
+    def handle(self, *args, **options):
+        syncs = snapshots.list_syncs(options['dir'], options['groups'])
+        since = tasks_watchman.parse_date(options['since'])
+        until = tasks_watchman.parse_date(options['until'])
+        syncs = [
+            (sync_id, group_id, sync_directory) for sync_id, group_id, sync_directory in syncs
+            if (since is None or snapshots.sync_date(sync_id) >= since) and
+               (until is None or snapshots.sync_date(sync_id) < until)
+        ]
+        if not syncs:
+            raise CommandError('no snapshots found')
+        if options['create_customers']:
+            self.create_customers({group_id for _, group_id, _ in syncs})
+        for sync_id, group_id, sync_directory in syncs:
+            self.stdout.write(f'{group_id} {sync_id}')
+            self.replay(sync_id, group_id, sync_directory)
+
+    def create_customers(self, group_ids):
+        """
+        Creates a customer named after the group ID for every group without a customer.
+        """
+        existing = set(models.Customer.objects.filter(
+            watchman_group_id__in=group_ids
+        ).values_list('watchman_group_id', flat=True))
+        for group_id in sorted(group_ids - existing):
+            models.Customer.objects.create(name=group_id, watchman_group_id=group_id)
+            self.stdout.write(f'created customer {group_id}')
+
+    def replay(self, sync_id, group_id, sync_directory):
+        """
+        Parses a single archived sync as if it had just been fetched on the day it was archived, then resolves the
+        open warnings of the group that the sync no longer reports just like the last task of a live sync does.
+        """
+        date = snapshots.sync_date(sync_id).isoformat()
+        start = time.perf_counter()
+        records = watchman_records.load(snapshots.read_sync(sync_directory))
+        self.report('read', start, None, f'{len(records)} computers')
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = tasks_watchman.parse_computers(records, date)
+        self.report('parse_computers', start, queries, result)
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = tasks_watchman.parse_warnings(records, date)
+        self.report('parse_warnings', start, queries, result)
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = ingest_watchman.resolve_unseen_warnings(group_id, ingest_watchman.open_warning_keys(records),
+                                                             snapshots.sync_date(sync_id))
+        self.report('resolve_unseen', start, queries, f'{result} resolved')
+
+    def report(self, name, start, queries, result):
+        """
+        Reports the wall time and the number of queries of a single step.
+        """
+        elapsed = time.perf_counter() - start
+        query_count = len(queries) if queries is not None else 0
+        self.stdout.write(f'  {name:<16} {elapsed:8.3f}s {query_count:6} queries  {result}')
@@ -0,0 +1,25 @@
+"""
+Counters shared by every worker through Redis.
+"""
+
+from reporter.redis_connection import get_redis
+
+METRICS_KEY = 'mrgen:metrics'
+
+
+def increment(name, amount=1):
+    """
+    Increments a counter.
+
+    :param name: The name of the counter, for example 'watchman_sync.skipped'.
+    :param amount: The amount to add.
+    :return: Returns the new value of the counter.
+    """
+    return get_redis().hincrby(METRICS_KEY, name, amount)
+
+
+def get_metrics():
+    """
+    :return: Returns a dictionary of every counter value keyed by name.
+    """
+    return {name.decode('utf-8'): int(value) for name, value in get_redis().hgetall(METRICS_KEY).items()}
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceschedule',
+            name='fetch_mode',
+            field=models.CharField(default='combine', max_length=25),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0002_serviceschedule_fetch_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchmancomputer',
+            name='fingerprint',
+            field=models.CharField(default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.3 on 2026-10-18 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0003_watchmancomputer_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sync_id', models.CharField(max_length=30, unique=True)),
+                ('fetch_mode', models.CharField(max_length=25)),
+                ('status', models.CharField(default='running', max_length=25)),
+                ('date_started', models.DateTimeField(auto_now_add=True)),
+                ('date_finished', models.DateTimeField(null=True)),
+                ('duration_seconds', models.FloatField(null=True)),
+                ('fetch_seconds', models.FloatField(default=0)),
+                ('parse_seconds', models.FloatField(default=0)),
+                ('write_seconds', models.FloatField(default=0)),
+                ('page_count', models.IntegerField(default=0)),
+                ('bytes_downloaded', models.BigIntegerField(default=0)),
+                ('computers_inserted', models.IntegerField(default=0)),
+                ('computers_updated', models.IntegerField(default=0)),
+                ('computers_unchanged', models.IntegerField(default=0)),
+                ('warnings_created', models.IntegerField(default=0)),
+                ('warnings_resolved', models.IntegerField(default=0)),
+                ('warnings_checked', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reporter.Customer')),
+            ],
+            options={
+                'ordering': ['-date_started'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.3 on 2026-10-18 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0004_syncrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepairShoprTicket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_id', models.CharField(max_length=100, unique=True)),
+                ('number', models.CharField(max_length=100)),
+                ('subject', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=100)),
+                ('date_created', models.DateField()),
+                ('date_updated', models.DateTimeField()),
+                ('date_resolved', models.DateField(null=True)),
+                ('repairshopr_id', models.ForeignKey(db_column='repairshopr_id', on_delete=django.db.models.deletion.CASCADE, to='reporter.Customer', to_field='repairshopr_id')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
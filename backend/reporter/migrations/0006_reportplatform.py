@@ -0,0 +1,27 @@
+# Generated by Django 2.2.3 on 2026-10-18 15:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0005_repairshoprticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportPlatform',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('os_type', models.CharField(max_length=7)),
+                ('num_computers', models.IntegerField(default=0)),
+                ('report', models.ForeignKey(db_column='report_id', on_delete=django.db.models.deletion.CASCADE, to='reporter.Report')),
+            ],
+            options={
+                'ordering': ['os_type'],
+                'unique_together': {('report', 'os_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.3 on 2026-10-18 16:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0006_reportplatform'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('status', models.CharField(default='pending', max_length=25)),
+                ('sub_reports_total', models.IntegerField(default=0)),
+                ('sub_reports_done', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_finished', models.DateTimeField(null=True)),
+                ('report', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job', to='reporter.Report')),
+            ],
+            options={
+                'ordering': ['-date_created'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.3 on 2026-10-18 16:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0007_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='date_started',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='duration_seconds',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='fan_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ReportChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('num_sub_reports', models.IntegerField(default=0)),
+                ('worker', models.CharField(default='', max_length=100)),
+                ('date_started', models.DateTimeField()),
+                ('duration_seconds', models.FloatField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='reporter.ReportJob')),
+            ],
+            options={
+                'ordering': ['index'],
+                'unique_together': {('job', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def backfill_platforms(apps, schema_editor):
+    """
+    Creates the platform rows of the reports generated before ReportPlatform existed from their legacy count columns.
+    """
+    Report = apps.get_model('reporter', 'Report')
+    ReportPlatform = apps.get_model('reporter', 'ReportPlatform')
+    platforms = []
+    for report in Report.objects.filter(reportplatform__isnull=True).iterator():
+        for os_type, num_computers in (('mac', report.num_mac_os),
+                                       ('windows', report.num_windows_os),
+                                       ('linux', report.num_linux_os)):
+            if num_computers:
+                platforms.append(ReportPlatform(report=report, os_type=os_type, num_computers=num_computers))
+    ReportPlatform.objects.bulk_create(platforms, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0008_reportchunk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_platforms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporter', '0009_backfill_reportplatform'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='syncrun',
+            name='sync_id',
+            field=models.CharField(max_length=40, unique=True),
+        ),
+    ]
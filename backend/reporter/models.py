@@ -21,6 +21,7 @@ class ServiceSchedule(models.Model):
                                          db_column='periodic_task_id',
                                          on_delete=models.CASCADE)
     task_type = models.CharField(max_length=25)
+    fetch_mode = models.CharField(max_length=25, default='combine')
 
     class Meta:
         ordering = ['id']
@@ -45,6 +46,7 @@ class WatchmanComputer(Computer):
     computer_id = models.CharField(max_length=100, unique=True)
     date_reported = models.DateField(auto_now_add=True)
     date_last_reported = models.DateField(auto_now_add=True)
+    fingerprint = models.CharField(max_length=40, default='')
 
     class Meta:
         ordering = ['id']
@@ -70,6 +72,47 @@ class WatchmanWarning(models.Model):
         ordering = ['id']
 
 
+class RepairShoprTicket(models.Model):
+    repairshopr_id = models.ForeignKey(Customer,
+                                       to_field='repairshopr_id',
+                                       db_column='repairshopr_id',
+                                       on_delete=models.CASCADE)
+    ticket_id = models.CharField(max_length=100, unique=True)
+    number = models.CharField(max_length=100)
+    subject = models.CharField(max_length=255)
+    status = models.CharField(max_length=100)
+    date_created = models.DateField()
+    date_updated = models.DateTimeField()
+    date_resolved = models.DateField(null=True)
+
+    class Meta:
+        ordering = ['id']
+
+
+class SyncRun(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    sync_id = models.CharField(max_length=40, unique=True)
+    fetch_mode = models.CharField(max_length=25)
+    status = models.CharField(max_length=25, default='running')
+    date_started = models.DateTimeField(auto_now_add=True)
+    date_finished = models.DateTimeField(null=True)
+    duration_seconds = models.FloatField(null=True)
+    fetch_seconds = models.FloatField(default=0)
+    parse_seconds = models.FloatField(default=0)
+    write_seconds = models.FloatField(default=0)
+    page_count = models.IntegerField(default=0)
+    bytes_downloaded = models.BigIntegerField(default=0)
+    computers_inserted = models.IntegerField(default=0)
+    computers_updated = models.IntegerField(default=0)
+    computers_unchanged = models.IntegerField(default=0)
+    warnings_created = models.IntegerField(default=0)
+    warnings_resolved = models.IntegerField(default=0)
+    warnings_checked = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date_started']
+
+
 class Report(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -83,6 +126,46 @@ class Report(models.Model):
     class Meta:
         ordering = ['-start_date']
 
+class ReportJob(models.Model):
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    report = models.OneToOneField(Report, null=True, related_name='job', on_delete=models.SET_NULL)
+    status = models.CharField(max_length=25, default='pending')
+    sub_reports_total = models.IntegerField(default=0)
+    sub_reports_done = models.IntegerField(default=0)
+    fan_out = models.BooleanField(default=False)
+    error = models.TextField(default='', blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_started = models.DateTimeField(null=True)
+    date_finished = models.DateTimeField(null=True)
+    duration_seconds = models.FloatField(null=True)
+
+    class Meta:
+        ordering = ['-date_created']
+
+
+class ReportChunk(models.Model):
+    job = models.ForeignKey(ReportJob, related_name='chunks', on_delete=models.CASCADE)
+    index = models.IntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    num_sub_reports = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, default='')
+    date_started = models.DateTimeField()
+    duration_seconds = models.FloatField()
+
+    class Meta:
+        ordering = ['index']
+        unique_together = ('job', 'index')
+
+class ReportPlatform(models.Model):
+    report = models.ForeignKey(Report, db_column='report_id', on_delete=models.CASCADE)
+    os_type = models.CharField(max_length=7)
+    num_computers = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['os_type']
+        unique_together = ('report', 'os_type')
+
 class SubReport(models.Model):
     report = models.ForeignKey(Report, db_column='report_id', on_delete=models.CASCADE)
     start_date = models.DateField()
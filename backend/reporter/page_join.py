@@ -0,0 +1,110 @@
+"""
+Joins the results of parallel page tasks with an atomic Redis counter. A chord on the 'django-db' result backend
+polls the database with a chord_unlock task until every header task has finished, instead the task that completes
+the last page hands every result to the callback right away.
+"""
+
+import json
+
+from django.conf import settings
+
+from reporter.redis_connection import get_redis
+
+# saves the result of one page and counts it, returns every result once the last page has completed, pages of a join
+# that was abandoned or has expired are dropped
+COMPLETE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+if redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[2]) == 0 then
+    return false
+end
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[3]))
+if redis.call('DECR', KEYS[1]) ~= 0 then
+    return false
+end
+local results = redis.call('HGETALL', KEYS[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+return results
+"""
+
+# counts the pages of a join that have not completed yet, returns every result if none are missing or else the pages
+# that have completed, pages of an earlier run that complete later are then counted towards the new counter
+START_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+local missing = tonumber(ARGV[1]) - redis.call('HLEN', KEYS[2])
+if missing <= 0 then
+    local results = redis.call('HGETALL', KEYS[2])
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return {1, results}
+end
+redis.call('SETEX', KEYS[1], ttl, missing)
+redis.call('EXPIRE', KEYS[2], ttl)
+return {0, redis.call('HKEYS', KEYS[2])}
+"""
+
+
+def keys(join_id):
+    return [f'mrgen:join:{join_id}:remaining', f'mrgen:join:{join_id}:results']
+
+
+def start(join_id, total):
+    """
+    Starts counting the pages of a join. A join that is started again keeps the results of the pages that have
+    already completed, so only the missing pages have to be counted. The missing pages are found and counted in a
+    single script, so pages of an earlier run that are still running can complete at any time.
+
+    :param join_id: A unique ID for the join.
+    :param total: The number of pages of the join.
+    :return: Returns a tuple of the set of page numbers that have completed and, if no page is missing, the list of
+    every result in page order, otherwise None.
+    """
+    script = get_redis().register_script(START_SCRIPT)
+    finished, values = script(keys=keys(join_id), args=[total, settings.PAGE_JOIN_TTL])
+    if not finished:
+        return {int(page) for page in values}, None
+    results = pairs(values)
+    return set(results), [results[page] for page in sorted(results)]
+
+
+def complete(join_id, page, result):
+    """
+    Records the result of a page. Pages that complete more than once, for example after a redelivered task, are only
+    counted once. Pages of a join that was abandoned or has expired are not recorded.
+
+    :param join_id: The ID the join was started with.
+    :param page: The page number.
+    :param result: The JSON serializable result of the page.
+    :return: Returns a list of every result in page order if this was the last page, otherwise None.
+    """
+    script = get_redis().register_script(COMPLETE_SCRIPT)
+    results = script(keys=keys(join_id), args=[page, json.dumps(result), settings.PAGE_JOIN_TTL])
+    if not results:
+        return None
+    pages = pairs(results)
+    return [pages[page] for page in sorted(pages)]
+
+
+def pairs(values):
+    """
+    :return: Returns a dictionary of results keyed by page number from the flat list of page and result pairs that
+    HGETALL returns.
+    """
+    return {int(values[i]): json.loads(values[i + 1]) for i in range(0, len(values), 2)}
+
+
+def completed(join_id):
+    """
+    :return: Returns the set of page numbers that have completed.
+    """
+    return {int(page) for page in get_redis().hkeys(keys(join_id)[1])}
+
+
+def abandon(join_id):
+    """
+    Stops a join so its callback never runs, used when a page fails.
+
+    :param join_id: The ID the join was started with.
+    :return: None
+    """
+    get_redis().delete(*keys(join_id))
@@ -0,0 +1,121 @@
+"""
+Adaptive token bucket shared by every worker through Redis. Each granted request raises the rate a little and every
+rate limited response cuts it in half, so throughput settles just under the limits of the remote API.
+"""
+
+import time
+
+from django.conf import settings
+
+from reporter.redis_connection import get_redis
+
+# takes a token from the bucket, returns the number of seconds to wait before trying again
+ACQUIRE_SCRIPT = """
+redis.replicate_commands()
+local rate_min, rate_max = tonumber(ARGV[2]), tonumber(ARGV[3])
+local capacity = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate', 'blocked_until')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+local rate = tonumber(state[3]) or tonumber(ARGV[1])
+local blocked_until = tonumber(state[4]) or 0
+if now < blocked_until then
+    return tostring(blocked_until - now)
+end
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    rate = math.min(rate_max, rate + (rate_max - rate_min) / 1000)
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now), 'rate', tostring(rate))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# halves the rate and blocks the bucket for the given number of seconds
+PENALIZE_SCRIPT = """
+redis.replicate_commands()
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[1])
+rate = math.max(tonumber(ARGV[2]), rate / 2)
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local blocked_until = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+blocked_until = math.max(blocked_until, now + tonumber(ARGV[3]))
+redis.call('HMSET', KEYS[1], 'rate', tostring(rate), 'blocked_until', tostring(blocked_until))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(rate)
+"""
+
+
+class TokenBucket:
+    def __init__(self, name, rate, rate_min, rate_max, capacity):
+        """
+        :param name: The name of the bucket, buckets with the same name share their tokens.
+        :param rate: The initial number of tokens added per second.
+        :param rate_min: The lowest rate the bucket can be penalized to.
+        :param rate_max: The highest rate the bucket can grow to.
+        :param capacity: The maximum number of tokens the bucket holds, the largest possible burst of requests.
+        """
+        self.key = f'mrgen:ratelimit:{name}'
+        self.rate = rate
+        self.rate_min = rate_min
+        self.rate_max = rate_max
+        self.capacity = capacity
+
+    def acquire(self):
+        """
+        Blocks until a token is available.
+
+        :return: None
+        """
+        script = get_redis().register_script(ACQUIRE_SCRIPT)
+        while True:
+            wait = float(script(keys=[self.key], args=[self.rate, self.rate_min, self.rate_max, self.capacity]))
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def penalize(self, retry_after=0):
+        """
+        Halves the rate of the bucket after a rate limited response.
+
+        :param retry_after: The number of seconds no tokens are handed out for.
+        :return: Returns the new rate.
+        """
+        script = get_redis().register_script(PENALIZE_SCRIPT)
+        return float(script(keys=[self.key], args=[self.rate, self.rate_min, retry_after]))
+
+
+def watchman_bucket():
+    """
+    Creates the token bucket of the Watchman API from the WATCHMAN_RATE_LIMIT settings.
+
+    :return: Returns a TokenBucket object, or None if rate limiting is disabled.
+    """
+    if not settings.WATCHMAN_RATE_LIMIT:
+        return None
+    return TokenBucket('watchman',
+                       settings.WATCHMAN_RATE_LIMIT,
+                       settings.WATCHMAN_RATE_LIMIT_MIN,
+                       settings.WATCHMAN_RATE_LIMIT_MAX,
+                       settings.WATCHMAN_RATE_LIMIT_BURST)
+
+
+def repairshopr_bucket():
+    """
+    Creates the token bucket of the RepairShopr API from the REPAIRSHOPR_RATE_LIMIT settings.
+
+    :return: Returns a TokenBucket object, or None if rate limiting is disabled.
+    """
+    if not settings.REPAIRSHOPR_RATE_LIMIT:
+        return None
+    return TokenBucket('repairshopr',
+                       settings.REPAIRSHOPR_RATE_LIMIT,
+                       settings.REPAIRSHOPR_RATE_LIMIT_MIN,
+                       settings.REPAIRSHOPR_RATE_LIMIT_MAX,
+                       settings.REPAIRSHOPR_RATE_LIMIT_BURST)
@@ -0,0 +1,24 @@
+"""
+Shared Redis connection used for coordination between the Celery workers.
+"""
+
+import redis
+from django.conf import settings
+
+_redis = None
+_redis_url = None
+
+
+def get_redis():
+    """
+    Retrieves the Redis client of the current process. The client's connection pool is safe to share between threads
+    and reconnects on its own after a fork. A new client is created if the REDIS_URL setting has changed, for example
+    when the tests point it at their own database.
+
+    :return: Returns a redis.Redis object connected to the REDIS_URL setting.
+    """
+    global _redis, _redis_url  # pylint: disable=global-statement
+    if _redis is None or _redis_url != settings.REDIS_URL:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+        _redis_url = settings.REDIS_URL
+    return _redis
@@ -0,0 +1,15 @@
+"""
+Pooled HTTP client for the RepairShopr API, see http_client. It has its own token bucket since RepairShopr enforces a
+separate and much lower rate limit, and is configured by the REPAIRSHOPR_ settings.
+"""
+
+from reporter import ratelimit
+from reporter.http_client import PooledClient
+
+client = PooledClient('REPAIRSHOPR', ratelimit.repairshopr_bucket)
+
+create_session = client.create_session
+get_session = client.get_session
+backoff = client.backoff
+get = client.get
+get_many = client.get_many
@@ -0,0 +1,83 @@
+"""
+A local stand-in for the RepairShopr API. It serves generated tickets from the '/tickets' endpoint, with paging and
+the 'customer_id' and 'since_updated_at' filters, and is used by the tests.
+"""
+
+from urllib.parse import parse_qs, urlparse
+
+from django.utils.dateparse import parse_datetime
+
+from reporter.watchman_stub import WatchmanStubHandler, WatchmanStubServer
+
+# the number of tickets on every page, fixed by RepairShopr
+PER_PAGE = 25
+
+
+def generate_ticket(customer_id, number, created_at, status='New'):
+    """
+    Generates a ticket dictionary in the format returned by the RepairShopr '/tickets' endpoint.
+
+    :param customer_id: The RepairShopr customer ID of the ticket.
+    :param number: The number of the ticket, also used as its ID.
+    :param created_at: An aware datetime the ticket was created and last updated at.
+    :param status: The status of the ticket.
+    :return: Returns a JSON formatted ticket dictionary.
+    """
+    return {
+        'id': number,
+        'number': number,
+        'subject': f'ticket {number}',
+        'status': status,
+        'customer_id': int(customer_id),
+        'created_at': created_at.isoformat(),
+        'updated_at': created_at.isoformat(),
+    }
+
+
+def update_ticket(ticket, updated_at, status):
+    """
+    Changes the status of a generated ticket in place.
+    """
+    ticket['status'] = status
+    ticket['updated_at'] = updated_at.isoformat()
+
+
+class RepairShoprStubHandler(WatchmanStubHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        # respond with a queued failure
+        if self.server.failures:
+            status_code, headers = self.server.failures.pop(0)
+            return self.send_json({'error': 'failure'}, status_code, headers)
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, query))
+        if not url.path.endswith('/tickets'):
+            return self.send_json({'error': 'not found'}, 404)
+        tickets = [ticket for ticket in self.server.tickets if str(ticket['customer_id']) == query.get('customer_id')]
+        if 'since_updated_at' in query:
+            since = parse_datetime(query['since_updated_at'])
+            tickets = [ticket for ticket in tickets if parse_datetime(ticket['updated_at']) >= since]
+        page = int(query.get('page', 1))
+        return self.send_json({
+            'tickets': tickets[(page - 1) * PER_PAGE:page * PER_PAGE],
+            'meta': {
+                'total_pages': max(1, -(-len(tickets) // PER_PAGE)),
+                'page': page,
+            },
+        })
+
+
+class RepairShoprStubServer(WatchmanStubServer):
+    def __init__(self, tickets, address=('127.0.0.1', 0), handshake_delay=0):
+        """
+        :param tickets: A list of ticket dictionaries, see generate_ticket().
+        :param address: The address to listen on, a random port is used by default.
+        :param handshake_delay: The number of seconds every new connection is delayed by.
+        """
+        super().__init__({}, address, handshake_delay)
+        self.RequestHandlerClass = RepairShoprStubHandler
+        self.tickets = tickets
+
+    @property
+    def base_url(self):
+        return 'http://{}:{}/api/v1/{{}}'.format(*self.server_address)
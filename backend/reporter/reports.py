@@ -0,0 +1,265 @@
+"""
+Statistics of the reports built by tasks_reports.build_report(). The computers of every platform are counted with one
+grouped query. The warnings of a customer are read once for every chunk of sub reports and every sub report of the
+chunk is counted by sweeping over the sorted warning dates, instead of running count queries for every month of the
+report. Chunks cover independent periods, so they can be counted by separate tasks.
+"""
+
+import calendar
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from reporter import models
+from reporter.ingest_watchman import BATCH_SIZE
+
+
+def create_report(customer, start_date, end_date):
+    """
+    Creates an empty report and the job that builds it, see tasks_reports.build_report().
+
+    :param customer: The Customer the report is for.
+    :param start_date: The start date of the report.
+    :param end_date: The end date of the report.
+    :return: Returns the new ReportJob object.
+    """
+    with transaction.atomic():
+        report = models.Report.objects.create(customer=customer, start_date=start_date, end_date=end_date)
+        return models.ReportJob.objects.create(report=report,
+                                               sub_reports_total=len(list(report_dates(start_date, end_date))))
+
+
+def save_report(report, periods, counts):
+    """
+    Writes the counted sub reports of a report along with its platforms and the snapshot of its computers in a single
+    transaction, so a build that fails never leaves a partial report behind.
+
+    :param report: The Report to build.
+    :param periods: A list of (start, end) date tuples in chronological order, see report_dates().
+    :param counts: A list of dictionaries with the SubReport count fields of every period, see sub_report_counts().
+    :return: Returns the Report object.
+    """
+    customer = report.customer
+    with transaction.atomic():
+        # count the computers of every platform at once
+        num_platforms = platform_counts(customer, report.start_date, report.end_date)
+        report.num_mac_os = num_platforms.get('mac', 0)
+        report.num_windows_os = num_platforms.get('windows', 0)
+        report.num_linux_os = num_platforms.get('linux', 0)
+        report.save(update_fields=['num_mac_os', 'num_windows_os', 'num_linux_os'])
+        models.ReportPlatform.objects.bulk_create([
+            models.ReportPlatform(report=report, os_type=os_type, num_computers=num_computers)
+            for os_type, num_computers in num_platforms.items()
+        ])
+        # create all sub reports
+        models.SubReport.objects.bulk_create([
+            models.SubReport(report=report, start_date=start, end_date=end, **period_counts)
+            for (start, end), period_counts in zip(periods, counts)
+        ])
+        # create the computer reports
+        snapshot_computers(report, customer, report.start_date)
+    return report
+
+
+def chunks(periods, size):
+    """
+    Splits the periods of a report into consecutive chunks.
+
+    :param periods: A list of (start, end) date tuples, see report_dates().
+    :param size: The maximum number of periods of a chunk, 0 keeps every period in a single chunk.
+    :return: Returns a list of lists of periods.
+    """
+    size = size or len(periods) or 1
+    return [periods[index:index + size] for index in range(0, len(periods), size)]
+
+
+def snapshot_computers(report, customer, start_date):
+    """
+    Copies every computer of a customer that reported since the start of a report into a ComputerReport. The
+    computers are streamed from the database and written in batches, so memory stays flat for any number of
+    computers.
+
+    :param report: The Report the computers belong to.
+    :param customer: The Customer the report is for.
+    :param start_date: The start date of the report.
+    :return: Returns the number of computers copied.
+    """
+    fields = ('name', 'os_type', 'os_version', 'ram_gb', 'hdd_capacity_gb', 'hdd_usage_gb')
+    computers = models.WatchmanComputer.objects.filter(
+        watchman_group_id=customer,
+        date_last_reported__gte=start_date
+    ).order_by().only(*fields)
+    batch = []
+    count = 0
+    for computer in computers.iterator(chunk_size=BATCH_SIZE):
+        batch.append(models.ComputerReport(report=report,
+                                           computer=computer,
+                                           **{field: getattr(computer, field) for field in fields}))
+        if len(batch) >= BATCH_SIZE:
+            models.ComputerReport.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    models.ComputerReport.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def platform_counts(customer, start_date, end_date):
+    """
+    Counts the computers of every platform that reported during a report period with a single grouped query.
+
+    :param customer: The Customer the report is for.
+    :param start_date: The start date of the report.
+    :param end_date: The end date of the report.
+    :return: Returns a dictionary of computer counts keyed by os_type.
+    """
+    return dict(models.WatchmanComputer.objects.filter(
+        watchman_group_id=customer,
+        date_reported__lt=end_date,
+        date_last_reported__gt=start_date
+    ).order_by().values('os_type').annotate(count=Count('id')).values_list('os_type', 'count'))
+
+
+class DateSweep:
+    """
+    Counts the dates of a sorted list that fall before a bound. Bounds must never decrease, so the whole list is swept
+    once no matter how many bounds are counted.
+    """
+
+    def __init__(self, dates):
+        self.dates = sorted(dates)
+        self.index = 0
+
+    def count_before(self, bound):
+        """
+        :return: Returns the number of dates before the bound.
+        """
+        while self.index < len(self.dates) and self.dates[self.index] < bound:
+            self.index += 1
+        return self.index
+
+    def count_through(self, bound):
+        """
+        :return: Returns the number of dates before or on the bound.
+        """
+        while self.index < len(self.dates) and self.dates[self.index] <= bound:
+            self.index += 1
+        return self.index
+
+
+def sub_report_counts(customer, periods):
+    """
+    Counts the warnings and tickets of every sub report of a report, with one query for each.
+
+    :param customer: The Customer the report is for.
+    :param periods: A list of (start, end) date tuples in chronological order, see report_dates().
+    :return: Returns a list of dictionaries with the SubReport count fields of every period.
+    """
+    return [dict(warnings, **tickets)
+            for warnings, tickets in zip(warning_counts(customer, periods), ticket_counts(customer, periods))]
+
+
+def warning_counts(customer, periods):
+    """
+    Counts the warnings of every sub report of a report with a single query.
+
+    :param customer: The Customer the report is for.
+    :param periods: A list of (start, end) date tuples in chronological order, see report_dates().
+    :return: Returns a list of dictionaries with the num_warnings_unresolved_start, num_warnings_unresolved_end,
+    num_warnings_created and num_warnings_resolved of every period.
+    """
+    if not periods:
+        return []
+    start_date, end_date = periods[0][0], periods[-1][1]
+    # warnings that were resolved before the report starts do not count towards any period
+    warnings = list(models.WatchmanWarning.objects.filter(
+        Q(date_reported__lte=end_date) | Q(date_resolved__lte=end_date),
+        watchman_group_id=customer
+    ).exclude(
+        date_reported__lt=start_date,
+        date_resolved__lt=start_date
+    ).order_by().values_list('date_reported', 'date_resolved'))
+    reported = DateSweep(date_reported for date_reported, _ in warnings)
+    resolved = DateSweep(date_resolved for _, date_resolved in warnings if date_resolved is not None)
+    # a warning is closed once it has been both reported and resolved
+    closed = DateSweep(max(date_reported, date_resolved) for date_reported, date_resolved in warnings
+                       if date_resolved is not None)
+    counts = []
+    for start, end in periods:
+        reported_before = reported.count_before(start)
+        unresolved_start = reported_before - closed.count_before(start)
+        resolved_before = resolved.count_before(start)
+        reported_through = reported.count_through(end)
+        counts.append({
+            'num_warnings_unresolved_start': unresolved_start,
+            'num_warnings_unresolved_end': reported_through - closed.count_through(end),
+            'num_warnings_created': reported_through - reported_before,
+            'num_warnings_resolved': resolved.count_through(end) - resolved_before,
+        })
+    return counts
+
+
+def ticket_counts(customer, periods):
+    """
+    Counts the RepairShopr tickets of every sub report of a report with a single query.
+
+    :param customer: The Customer the report is for.
+    :param periods: A list of (start, end) date tuples in chronological order, see report_dates().
+    :return: Returns a list of dictionaries with the num_tickets_created and num_tickets_resolved of every period.
+    """
+    if not periods:
+        return []
+    start_date, end_date = periods[0][0], periods[-1][1]
+    tickets = list(models.RepairShoprTicket.objects.filter(
+        Q(date_created__range=(start_date, end_date)) | Q(date_resolved__range=(start_date, end_date)),
+        repairshopr_id=customer
+    ).order_by().values_list('date_created', 'date_resolved'))
+    created = DateSweep(date_created for date_created, _ in tickets)
+    resolved = DateSweep(date_resolved for _, date_resolved in tickets if date_resolved is not None)
+    counts = []
+    for start, end in periods:
+        created_before = created.count_before(start)
+        resolved_before = resolved.count_before(start)
+        counts.append({
+            'num_tickets_created': created.count_through(end) - created_before,
+            'num_tickets_resolved': resolved.count_through(end) - resolved_before,
+        })
+    return counts
+
+
+def days_in_month(year, month):
+    """
+    A helper function that takes in month and year numbers and returns the number of day in the month.
+    """
+    return calendar.monthrange(year, month)[1]
+
+def report_dates(start_date, end_date):
+    """
+    Generator function to create a range of report dates given a start and end date.
+    """
+    # iterate over every year within date range
+    for year in range(start_date.year, end_date.year + 1):
+        # find the month range for the year
+        month_range = range(1, 13)
+        # start and end year cases
+        if year == start_date.year:
+            month_range = range(start_date.month, 13)
+        elif year == end_date.year:
+            month_range = range(1, end_date.month + 1)
+        # single year case
+        if start_date.year == end_date.year:
+            month_range = range(start_date.month, end_date.month + 1)
+        # iterate over every month in the year
+        for month in month_range:
+            # find the day range for the year
+            day_range = (1, days_in_month(year, month))
+            # start and end month cases
+            if year == start_date.year and month == start_date.month:
+                day_range = (start_date.day, days_in_month(year, month))
+            elif year == end_date.year and month == end_date.month:
+                day_range = (1, end_date.day)
+            # single month case
+            if start_date.year == end_date.year and start_date.month == end_date.month:
+                day_range = (start_date.day, end_date.day)
+            # create the sub reports
+            yield (date(year, month, day_range[0]), date(year, month, day_range[1]))
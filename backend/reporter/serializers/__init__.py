@@ -1,3 +1,6 @@
 from .serializer_customer import *
 from .serializer_report import *
+from .serializer_report_job import *
 from .serializer_schedule import *
+from .serializer_sync_run import *
+from .serializer_webhook import *
@@ -0,0 +1,38 @@
+from rest_framework import serializers
+
+from reporter import models
+
+
+class ReportChunkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.ReportChunk
+        fields = (
+            'index',
+            'start_date',
+            'end_date',
+            'num_sub_reports',
+            'worker',
+            'date_started',
+            'duration_seconds'
+        )
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    chunks = ReportChunkSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.ReportJob
+        fields = (
+            'job_id',
+            'report',
+            'status',
+            'sub_reports_total',
+            'sub_reports_done',
+            'fan_out',
+            'error',
+            'date_created',
+            'date_started',
+            'date_finished',
+            'duration_seconds',
+            'chunks'
+        )
@@ -4,7 +4,7 @@ import re
 from django_celery_beat.models import CrontabSchedule, PeriodicTask
 from rest_framework import serializers
 
-from reporter import models
+from reporter import models, tasks_watchman
 
 
 class PeriodicTaskField(serializers.Field):
@@ -33,13 +33,16 @@ class PeriodicTaskField(serializers.Field):
         if data['task_type'] == 'watchman':
             task_type = 'reporter.tasks_watchman.update_client'
             task_args = [customer.watchman_group_id]
+            task_kwargs = {'fetch_mode': data.get('fetch_mode', 'combine')}
         elif data['task_type'] == 'repairshopr':
             task_type = 'reporter.tasks_repairshopr.update_client'
             task_args = [customer.repairshopr_id]
+            task_kwargs = {}
         else:
             raise serializers.ValidationError({'task_type': 'This field must be either "watchman" or "repairshopr"'})
         # json format the task args
         task_args = json.dumps(task_args)
+        task_kwargs = json.dumps(task_kwargs)
         # check that the customer has the appropriate service id for the specified task type
         if data['task_type'] == 'watchman' and customer.watchman_group_id is None:
             raise serializers.ValidationError({'task_type': 'The specified customer does not have a Watchman ID defined'})
@@ -63,13 +66,15 @@ class PeriodicTaskField(serializers.Field):
         task = PeriodicTask(crontab=cron,
                             name=task_name,
                             task=task_type,
-                            args=task_args)
+                            args=task_args,
+                            kwargs=task_kwargs)
         return task
 
 
 class ScheduleSerializer(serializers.ModelSerializer):
     periodic_task = PeriodicTaskField()
     task_type = serializers.ChoiceField(('watchman', 'repairshopr'))
+    fetch_mode = serializers.ChoiceField(tasks_watchman.FETCH_MODES, default='combine')
 
     class Meta:
         model = models.ServiceSchedule
@@ -77,7 +82,8 @@ class ScheduleSerializer(serializers.ModelSerializer):
             'pk',
             'periodic_task',
             'customer',
-            'task_type'
+            'task_type',
+            'fetch_mode'
         )
 
     def create(self, validated_data):
@@ -0,0 +1,29 @@
+from rest_framework import serializers
+
+from reporter import models
+
+
+class SyncRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.SyncRun
+        fields = (
+            'pk',
+            'customer',
+            'sync_id',
+            'fetch_mode',
+            'status',
+            'date_started',
+            'date_finished',
+            'duration_seconds',
+            'fetch_seconds',
+            'parse_seconds',
+            'write_seconds',
+            'page_count',
+            'bytes_downloaded',
+            'computers_inserted',
+            'computers_updated',
+            'computers_unchanged',
+            'warnings_created',
+            'warnings_resolved',
+            'warnings_checked'
+        )
@@ -0,0 +1,13 @@
+from rest_framework import serializers
+
+
+class WatchmanPluginSerializer(serializers.Serializer):
+    uid = serializers.CharField(max_length=100)
+    status = serializers.CharField(max_length=25)
+    name = serializers.CharField(max_length=100, default='')
+    details = serializers.CharField(allow_blank=True, default='')
+
+
+class WatchmanEventSerializer(serializers.Serializer):
+    computer = serializers.CharField(max_length=100)
+    plugin = WatchmanPluginSerializer()
@@ -0,0 +1,94 @@
+"""
+Archive of the raw Watchman '/computers' pages of every sync. Each page is written as a gzip compressed NDJSON file,
+one computer per line, to '<WATCHMAN_SNAPSHOT_DIR>/<group ID>/<sync ID>/<page>.ndjson.gz'. Sync IDs are UTC timestamps
+followed by a random suffix, so sorting them orders the syncs chronologically while syncs of different groups that
+start at the same time still get different IDs.
+"""
+
+import datetime as dt
+import gzip
+import json
+import os
+import uuid
+
+from django.conf import settings
+
+SYNC_ID_FORMAT = '%Y%m%dT%H%M%S%fZ'
+
+
+def new_sync_id():
+    """
+    :return: Returns a unique sync ID for the current time.
+    """
+    return f'{dt.datetime.utcnow().strftime(SYNC_ID_FORMAT)}-{uuid.uuid4().hex[:8]}'
+
+
+def sync_date(sync_id):
+    """
+    :return: Returns the date a sync ID was created on, with or without its random suffix.
+    """
+    return dt.datetime.strptime(sync_id.split('-', 1)[0], SYNC_ID_FORMAT).date()
+
+
+def archive_page(group_id, sync_id, page, json_results, directory=None):
+    """
+    Writes a single page of raw Watchman '/computers' results to the archive. Nothing is written if the
+    WATCHMAN_SNAPSHOT_DIR setting is empty.
+
+    :param group_id: The group ID the page belongs to.
+    :param sync_id: The ID of the sync the page was fetched by.
+    :param page: The page number.
+    :param json_results: A list of JSON formatted computer dictionaries.
+    :param directory: The archive directory, defaults to the WATCHMAN_SNAPSHOT_DIR setting.
+    :return: Returns the path of the written file, or None if archiving is disabled.
+    """
+    directory = directory or settings.WATCHMAN_SNAPSHOT_DIR
+    if not directory or sync_id is None:
+        return None
+    sync_directory = os.path.join(directory, group_id, sync_id)
+    os.makedirs(sync_directory, exist_ok=True)
+    path = os.path.join(sync_directory, f'{page:05d}.ndjson.gz')
+    # write to a temporary file first so a replay never reads a partial page
+    with gzip.open(f'{path}.tmp', 'wt', encoding='utf-8') as snapshot_file:
+        for computer in json_results:
+            snapshot_file.write(json.dumps(computer, separators=(',', ':')))
+            snapshot_file.write('\n')
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+def list_syncs(directory=None, group_ids=None):
+    """
+    Lists the archived syncs in chronological order.
+
+    :param directory: The archive directory, defaults to the WATCHMAN_SNAPSHOT_DIR setting.
+    :param group_ids: An optional list of group IDs to limit the syncs to.
+    :return: Returns a list of (sync ID, group ID, sync directory) tuples.
+    """
+    directory = directory or settings.WATCHMAN_SNAPSHOT_DIR
+    syncs = []
+    if not directory or not os.path.isdir(directory):
+        return syncs
+    for group_id in sorted(os.listdir(directory)):
+        if group_ids and group_id not in group_ids:
+            continue
+        group_directory = os.path.join(directory, group_id)
+        for sync_id in os.listdir(group_directory):
+            syncs.append((sync_id, group_id, os.path.join(group_directory, sync_id)))
+    return sorted(syncs)
+
+
+def read_sync(sync_directory):
+    """
+    Generator function that reads every computer of an archived sync, page by page.
+
+    :param sync_directory: The directory of the sync from list_syncs().
+    :return: Yields JSON formatted computer dictionaries.
+    """
+    for name in sorted(os.listdir(sync_directory)):
+        if not name.endswith('.ndjson.gz'):
+            continue
+        with gzip.open(os.path.join(sync_directory, name), 'rt', encoding='utf-8') as snapshot_file:
+            for line in snapshot_file:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,54 @@
+"""
+Checkpoints of the Watchman syncs that join their pages with page_join. The checkpoint of a group records the join
+of its running sync, whose results hash already holds every completed page. A sync that fails or whose worker dies
+leaves its checkpoint behind, and the next sync of the group resumes it by only fetching the pages that are missing.
+"""
+
+import json
+
+from django.conf import settings
+
+from reporter import page_join
+from reporter.redis_connection import get_redis
+
+
+def key(group_id):
+    return f'mrgen:sync:{group_id}:checkpoint'
+
+
+def save(group_id, checkpoint):
+    """
+    Saves the checkpoint of a sync. Checkpoints expire after the WATCHMAN_SYNC_CHECKPOINT_TTL setting so that a
+    resumed sync never mixes pages that were fetched too far apart.
+
+    :param group_id: The Watchman group ID.
+    :param checkpoint: A dictionary with the sync_id, lease, join_id, request_num, per_page and fetch_mode of the sync.
+    :return: None
+    """
+    get_redis().setex(key(group_id), settings.WATCHMAN_SYNC_CHECKPOINT_TTL, json.dumps(checkpoint))
+
+
+def load(group_id):
+    """
+    :return: Returns the checkpoint dictionary of the unfinished sync of a group, or None if there is none.
+    """
+    checkpoint = get_redis().get(key(group_id))
+    return json.loads(checkpoint) if checkpoint is not None else None
+
+
+def clear(group_id):
+    """
+    Deletes the checkpoint of a group once its sync has finished.
+    """
+    get_redis().delete(key(group_id))
+
+
+def progress(group_id):
+    """
+    :return: Returns a tuple of the number of completed pages and the total number of pages of the unfinished sync of a
+    group, or None if there is none.
+    """
+    checkpoint = load(group_id)
+    if checkpoint is None:
+        return None
+    return len(page_join.completed(checkpoint['join_id'])), checkpoint['request_num']
@@ -0,0 +1,88 @@
+"""
+Leases that stop two syncs of the same Watchman group from running at once. A sync holds the lease of its group from
+the moment it starts until its last task finishes. The lease is a Redis key holding a token that is new for every
+attempt of a sync, so a resumed sync never shares its lease with the attempt it resumes. The key is set with a TTL so
+that it expires on its own if a worker dies mid sync. Syncs that start while the lease is held can leave a
+pending request behind, which the running sync starts once it releases the lease, so any number of overlapping syncs
+coalesce into a single follow up sync.
+"""
+
+import json
+
+from django.conf import settings
+
+from reporter.redis_connection import get_redis
+
+# stores the pending request only while the lease is held
+COALESCE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[1], 'PX', redis.call('PTTL', KEYS[1]))
+return 1
+"""
+
+# deletes the lease only if it is still held with the token, returns the pending request along with it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {0}
+end
+local pending = redis.call('GET', KEYS[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+if pending then
+    return {1, pending}
+end
+return {1}
+"""
+
+
+def keys(group_id):
+    return [f'mrgen:sync:{group_id}:lease', f'mrgen:sync:{group_id}:pending']
+
+
+def acquire(group_id, token):
+    """
+    Takes the lease of a group if no other sync holds it.
+
+    :param group_id: The Watchman group ID.
+    :param token: The token of the sync attempt taking the lease.
+    :return: Returns True if the lease was taken.
+    """
+    return bool(get_redis().set(keys(group_id)[0], token, nx=True, px=settings.WATCHMAN_SYNC_LEASE_TTL * 1000))
+
+
+def coalesce(group_id, request):
+    """
+    Leaves a request to sync the group again once the sync holding the lease is done. Later requests replace
+    earlier ones.
+
+    :param group_id: The Watchman group ID.
+    :param request: A JSON serializable dictionary of update_client() keyword arguments.
+    :return: Returns False if the lease is no longer held, in which case the lease should be taken instead.
+    """
+    script = get_redis().register_script(COALESCE_SCRIPT)
+    return bool(script(keys=keys(group_id), args=[json.dumps(request)]))
+
+
+def release(group_id, token):
+    """
+    Releases the lease of a group. A lease that has expired or was taken with another token is left alone.
+
+    :param group_id: The Watchman group ID.
+    :param token: The token the lease was taken with.
+    :return: Returns a tuple of whether the lease was released and the pending request dictionary, or None if there
+    is no pending request.
+    """
+    script = get_redis().register_script(RELEASE_SCRIPT)
+    result = script(keys=keys(group_id), args=[token])
+    if not result[0]:
+        return False, None
+    return True, json.loads(result[1]) if len(result) > 1 else None
+
+
+def holder(group_id):
+    """
+    :return: Returns the token of the sync holding the lease of a group, or None if no sync holds it.
+    """
+    token = get_redis().get(keys(group_id)[0])
+    return token.decode('utf-8') if token is not None else None
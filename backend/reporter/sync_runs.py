@@ -0,0 +1,126 @@
+"""
+Records the history of the Watchman syncs in SyncRun rows. The tasks of a sync collect the time they spend fetching,
+parsing and writing along with the bytes they download, then add them to the SyncRun of the sync with a single update
+query. The time spent in nested timers is only counted towards the innermost timer.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.utils import timezone
+
+from reporter import models
+
+# the stats of the task running in this process, tasks run one at a time in every worker process
+_stats = None
+_timers = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def collect():
+    """
+    Collects the stats of the timers and counters used while the context is active.
+
+    :return: Yields a dictionary of stats keyed by name.
+    """
+    global _stats, _timers  # pylint: disable=global-statement
+    previous = _stats, _timers
+    _stats, _timers = {}, []
+    try:
+        yield _stats
+    finally:
+        _stats, _timers = previous
+
+
+def add(name, amount):
+    """
+    Adds to a counter of the stats being collected, if any. Safe to call from other threads.
+    """
+    if _stats is None:
+        return
+    with _lock:
+        _stats[name] = _stats.get(name, 0) + amount
+
+
+@contextmanager
+def timer(stage):
+    """
+    Times a stage, either 'fetch', 'parse' or 'write', of the stats being collected, if any.
+    """
+    if _stats is None:
+        yield
+        return
+    now = time.perf_counter()
+    # pause the enclosing timer
+    if _timers:
+        add(f'{_timers[-1][0]}_seconds', now - _timers[-1][1])
+    _timers.append([stage, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        add(f'{stage}_seconds', now - _timers.pop()[1])
+        # resume the enclosing timer
+        if _timers:
+            _timers[-1][1] = now
+
+
+def start(group_id, sync_id, fetch_mode):
+    """
+    Creates the SyncRun of a new sync, or marks the SyncRun of a resumed sync as running again.
+
+    :param group_id: The Watchman group ID.
+    :param sync_id: The ID of the sync.
+    :param fetch_mode: The fetch mode of the sync.
+    :return: None
+    """
+    customer = models.Customer.objects.filter(watchman_group_id=group_id).first()
+    if customer is None:
+        return
+    models.SyncRun.objects.update_or_create(sync_id=sync_id, defaults={
+        'customer': customer,
+        'fetch_mode': fetch_mode,
+        'status': 'running',
+        'date_finished': None,
+    })
+
+
+def record(sync_id, stats=None, pages=0, computers=None, warnings=None):
+    """
+    Adds the stats and counts of a task to the SyncRun of its sync.
+
+    :param sync_id: The ID of the sync, nothing is recorded if it is None.
+    :param stats: A dictionary of stats from collect().
+    :param pages: The number of pages the task fetched.
+    :param computers: A dictionary of computer counts from ingest_watchman.upsert_computers().
+    :param warnings: A dictionary of warning counts from ingest_watchman.reconcile_warnings().
+    :return: None
+    """
+    if sync_id is None:
+        return
+    values = dict(stats or {}, page_count=pages)
+    for name in ('inserted', 'updated', 'unchanged'):
+        values[f'computers_{name}'] = (computers or {}).get(name, 0)
+    for name in ('created', 'resolved', 'checked'):
+        values[f'warnings_{name}'] = (warnings or {}).get(name, 0)
+    updates = {field: F(field) + value for field, value in values.items() if value}
+    if updates:
+        models.SyncRun.objects.filter(sync_id=sync_id).update(**updates)
+
+
+def finish(sync_id, status):
+    """
+    Marks the SyncRun of a sync as finished.
+
+    :param sync_id: The ID of the sync.
+    :param status: Either 'completed' or 'failed'.
+    :return: None
+    """
+    for sync_run in models.SyncRun.objects.filter(sync_id=sync_id):
+        sync_run.status = status
+        sync_run.date_finished = timezone.now()
+        sync_run.duration_seconds = (sync_run.date_finished - sync_run.date_started).total_seconds()
+        sync_run.save(update_fields=['status', 'date_finished', 'duration_seconds'])
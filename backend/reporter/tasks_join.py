@@ -0,0 +1,101 @@
+"""
+Joins the results of tasks that run in parallel, like the pages of a Watchman sync or the chunks of a report, and
+calls a callback with every result once the last task has finished, see page_join.
+"""
+
+import uuid
+
+from celery import shared_task, signature
+from celery.task import chord
+from django.conf import settings
+
+from reporter import fair_queue, page_join
+
+
+def join_pages(header, callback, errback=None, join_id=None, fair_group=None):
+    """
+    Runs the page tasks in parallel and calls the callback with the list of their results once every page has
+    finished. With the PAGE_JOIN setting set to 'counter' each page is counted with page_join as it completes,
+    so the callback runs as soon as the last page is done. With 'chord' a Celery chord is used, which polls the result
+    backend until every page is done.
+
+    :param header: A list of task signatures, one for each page.
+    :param callback: The task signature to call with the list of page results.
+    :param errback: An optional task signature to call instead of the callback if a page or the callback fails.
+    :param join_id: An optional ID for the join. The results of a join that fails are kept until it expires, a join
+    that is started again with the same ID only runs the pages that have not completed yet.
+    :param fair_group: An optional Watchman group ID the pages belong to. With the 'counter' join the pages are then
+    sent in turn with the pages of other groups, see fair_queue.
+    :return: Returns the AsyncResult of the chord, or the ID of the join.
+    """
+    if errback is not None:
+        callback.on_error(errback)
+    if settings.PAGE_JOIN == 'chord':
+        return chord(header)(callback)
+    keep = join_id is not None
+    join_id = join_id or uuid.uuid4().hex
+    if not header:
+        callback.delay([])
+        return join_id
+    completed, results = page_join.start(join_id, len(header))
+    # every page of a resumed join already completed
+    if results is not None:
+        callback.delay(results)
+        return join_id
+    fair_group = fair_group if fair_queue.enabled() else None
+    pages = []
+    for page, page_signature in enumerate(header, start=1):
+        if page in completed:
+            continue
+        page_signature.link(page_done.s(join_id, page, callback, fair_group))
+        page_signature.link_error(page_failed.si(join_id, errback, keep, fair_group))
+        pages.append(page_signature)
+    if fair_group is None:
+        for page_signature in pages:
+            page_signature.apply_async()
+        return join_id
+    fair_queue.push(fair_group, pages)
+    fair_queue.dispatch()
+    return join_id
+
+
+@shared_task
+def page_done(result, join_id, page, callback, fair_group=None):
+    """
+    Linked to every page task started by join_pages(). Counts the page and calls the callback if it was the last one.
+
+    :param result: The result of the page task.
+    :param join_id: The ID of the join.
+    :param page: The page number.
+    :param callback: The task signature to call with the list of page results.
+    :param fair_group: The group ID the page was sent through the fair queue for, if any.
+    :return: Returns True if the callback was called.
+    """
+    if fair_group is not None:
+        fair_queue.release(fair_group)
+    results = page_join.complete(join_id, page, result)
+    if results is None:
+        return False
+    signature(callback).delay(results)
+    return True
+
+
+@shared_task
+def page_failed(join_id, errback=None, keep=False, fair_group=None):
+    """
+    Linked to the errors of every page task started by join_pages(). The callback never runs with missing pages, just
+    like a chord with a failed header task.
+
+    :param join_id: The ID of the join.
+    :param errback: The errback signature passed to join_pages(), if any.
+    :param keep: Set to keep the results of the completed pages for a resumed join instead of abandoning the join.
+    :param fair_group: The group ID the page was sent through the fair queue for, if any. Its pages that have not been
+    sent yet are dropped since the join can no longer complete.
+    :return: None
+    """
+    if fair_group is not None:
+        fair_queue.discard(fair_group)
+    if not keep:
+        page_join.abandon(join_id)
+    if errback is not None:
+        signature(errback).delay()
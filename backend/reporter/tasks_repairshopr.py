@@ -0,0 +1,48 @@
+import os
+
+from celery import shared_task
+
+from reporter import api_urls, ingest_repairshopr, repairshopr_client
+
+
+@shared_task
+def update_client(customer_id, api_key=str()):
+    """
+    Syncs the tickets of a specific RepairShopr customer. This is the main task to start the update process for
+    RepairShopr information. Only the tickets updated since the previous sync are requested, see
+    ingest_repairshopr.cursor(). The first page tells how many pages there are, the remaining pages are then fetched
+    concurrently and every ticket is saved with bulk queries.
+
+    :param customer_id: The RepairShopr customer ID to request tickets for.
+    :param api_key: An optional API key to use if no REPAIRSHOPR_API_KEY environment variable is set.
+    :return: Returns a dictionary with the number of pages fetched and tickets inserted, updated and left unchanged.
+    """
+    since = ingest_repairshopr.cursor(customer_id)
+    url = api_urls.repairshopr['tickets']
+    # the first page holds the number of pages
+    first = repairshopr_client.get(url, tickets_query_params(1, customer_id, since, api_key))
+    total_pages = first.get('meta', {}).get('total_pages') or 1
+    pages = [first] + repairshopr_client.get_many(url, [tickets_query_params(page, customer_id, since, api_key)
+                                                        for page in range(2, total_pages + 1)])
+    tickets = [ticket for page in pages for ticket in page['tickets']]
+    return dict(ingest_repairshopr.upsert_tickets(customer_id, tickets), pages=total_pages)
+
+
+def tickets_query_params(page, customer_id, since=None, api_key=str()):
+    """
+    Constructs the query parameters of a RepairShopr '/tickets' request.
+
+    :param page: The page number for pagination.
+    :param customer_id: The RepairShopr customer ID.
+    :param since: An optional datetime, only tickets updated after it are requested.
+    :param api_key: An optional API key to use if no REPAIRSHOPR_API_KEY environment variable is set.
+    :return: Returns a dictionary of query parameters.
+    """
+    query_params = {
+        'api_key': os.getenv('REPAIRSHOPR_API_KEY', api_key),
+        'customer_id': customer_id,
+        'page': page,
+    }
+    if since is not None:
+        query_params['since_updated_at'] = since.isoformat()
+    return query_params
@@ -0,0 +1,152 @@
+import datetime as dt
+import os
+import socket
+import time
+from datetime import date
+
+from celery import shared_task
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from reporter import models, reports
+from reporter.tasks_join import join_pages
+
+
+@shared_task
+def build_report(job_id):
+    """
+    Builds the report of a job created by reports.create_report(), so long reports are built by a worker instead of
+    the API request. The periods of the report are split into chunks of REPORT_CHUNK_MONTHS periods. Reports with at
+    least REPORT_FAN_OUT_MIN_CHUNKS chunks count every chunk in its own task across the workers and finish_report() is
+    called once every chunk is done, other reports count their chunks one after another in this task. Either way the
+    time spent on every chunk is saved in a ReportChunk so both paths can be compared.
+
+    :param job_id: The job ID of the ReportJob.
+    :return: Returns a dictionary with the report ID and the number of sub reports, or the number of chunks if they
+    were sent to other tasks, or None if the job was already started by another task.
+    """
+    # only the first task to start a pending job builds its report
+    if not models.ReportJob.objects.filter(job_id=job_id, status='pending').update(status='running',
+                                                                                   date_started=timezone.now()):
+        return None
+    # any error marks the job failed, jobs whose worker is lost are failed by expire_report_jobs()
+    try:
+        job = models.ReportJob.objects.select_related('report').get(job_id=job_id)
+        chunks = [(chunk[0][0].isoformat(), chunk[-1][1].isoformat())
+                  for chunk in reports.chunks(list(reports.report_dates(job.report.start_date, job.report.end_date)),
+                                              settings.REPORT_CHUNK_MONTHS)]
+        if settings.REPORT_FAN_OUT_MIN_CHUNKS and len(chunks) >= settings.REPORT_FAN_OUT_MIN_CHUNKS:
+            models.ReportJob.objects.filter(pk=job.pk).update(fan_out=True)
+            # the results of the chunks are joined in chunk order
+            join_pages([count_chunk.si(job_id, index, start, end) for index, (start, end) in enumerate(chunks)],
+                       finish_report.s(job_id),
+                       report_failed.si(job_id))
+            return {'report': job.report_id, 'chunks': len(chunks)}
+        return finish_report([count_chunk(job_id, index, start, end) for index, (start, end) in enumerate(chunks)],
+                             job_id)
+    except Exception as e:
+        report_failed(job_id, f'{type(e).__name__}: {e}')
+        raise
+
+
+@shared_task
+def count_chunk(job_id, index, start, end):
+    """
+    Counts the sub reports of one chunk of a report, records how long it took and adds them to the progress of the
+    job.
+
+    :param job_id: The job ID of the ReportJob.
+    :param index: The index of the chunk in the report.
+    :param start: The start date of the first period of the chunk in ISO format.
+    :param end: The end date of the last period of the chunk in ISO format.
+    :return: Returns a list of dictionaries with the SubReport count fields of every period of the chunk, see
+    reports.sub_report_counts().
+    """
+    job = models.ReportJob.objects.select_related('report__customer').get(job_id=job_id)
+    # the chunks that are still queued when another chunk fails are skipped
+    if job.status != 'running':
+        return []
+    periods = list(reports.report_dates(date.fromisoformat(start), date.fromisoformat(end)))
+    date_started = timezone.now()
+    started = time.perf_counter()
+    try:
+        counts = reports.sub_report_counts(job.report.customer, periods)
+    except Exception as e:
+        report_failed(job_id, f'{type(e).__name__}: {e}')
+        raise
+    _, created = models.ReportChunk.objects.update_or_create(job=job, index=index, defaults={
+        'start_date': periods[0][0],
+        'end_date': periods[-1][1],
+        'num_sub_reports': len(counts),
+        'worker': f'{socket.gethostname()}:{os.getpid()}',
+        'date_started': date_started,
+        'duration_seconds': time.perf_counter() - started,
+    })
+    # a chunk that runs again after a redelivery is only counted once
+    if created:
+        models.ReportJob.objects.filter(pk=job.pk).update(sub_reports_done=F('sub_reports_done') + len(counts))
+    return counts
+
+
+@shared_task
+def finish_report(results, job_id):
+    """
+    Writes the sub reports counted by every chunk of a report in order along with its platforms and the snapshot of
+    its computers, then marks the job done.
+
+    :param results: List of count_chunk() results in chunk order.
+    :param job_id: The job ID of the ReportJob.
+    :return: Returns a dictionary with the report ID and the number of sub reports, or None if the job has failed.
+    """
+    job = models.ReportJob.objects.select_related('report__customer').get(job_id=job_id)
+    if job.status != 'running':
+        return None
+    periods = list(reports.report_dates(job.report.start_date, job.report.end_date))
+    counts = [period_counts for result in results for period_counts in result]
+    try:
+        reports.save_report(job.report, periods, counts)
+    except Exception as e:
+        report_failed(job_id, f'{type(e).__name__}: {e}')
+        raise
+    date_finished = timezone.now()
+    duration = (date_finished - job.date_started).total_seconds()
+    models.ReportJob.objects.filter(pk=job.pk).update(status='done', sub_reports_done=len(counts),
+                                                      date_finished=date_finished, duration_seconds=duration)
+    return {'report': job.report_id, 'sub_reports': len(counts)}
+
+
+@shared_task
+def report_failed(job_id, error=''):
+    """
+    Marks an unfinished job failed and deletes its report. Called by the tasks of a job that fail, as the errback of
+    the chunks of a job that was fanned out and for jobs that are past their deadline, see expire_report_jobs().
+
+    :param job_id: The job ID of the ReportJob.
+    :param error: A description of the error.
+    :return: None
+    """
+    # only the first failure of a job is recorded
+    if models.ReportJob.objects.filter(job_id=job_id, status__in=('pending', 'running')).update(
+            status='failed', error=error, date_finished=timezone.now()):
+        models.Report.objects.filter(job__job_id=job_id).delete()
+
+
+@shared_task
+def expire_report_jobs(timeout=None):
+    """
+    Marks the jobs that were created more than REPORT_JOB_TIMEOUT seconds ago and are still not done failed, so a job
+    whose task was lost along with its worker does not stay pending or running forever. Scheduled by
+    CELERY_BEAT_SCHEDULE.
+
+    :param timeout: The number of seconds a job may take, defaults to the REPORT_JOB_TIMEOUT setting.
+    :return: Returns the number of jobs marked failed.
+    """
+    timeout = timeout if timeout is not None else settings.REPORT_JOB_TIMEOUT
+    job_ids = list(models.ReportJob.objects.filter(
+        status__in=('pending', 'running'),
+        date_created__lt=timezone.now() - dt.timedelta(seconds=timeout)
+    ).values_list('job_id', flat=True))
+    for job_id in job_ids:
+        report_failed(job_id, f'The report was not built within {timeout} seconds.')
+    return len(job_ids)
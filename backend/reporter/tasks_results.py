@@ -0,0 +1,30 @@
+import datetime as dt
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+
+@shared_task
+def compact_task_results(retention=None, batch_size=None):
+    """
+    Deletes the task results that are older than the RESULT_RETENTION setting. The rows are deleted in small batches,
+    each in its own transaction, so the results table is never locked for long. Replaces the Celery backend_cleanup
+    task which deletes every expired result in a single transaction. Scheduled hourly by CELERY_BEAT_SCHEDULE.
+
+    :param retention: The number of seconds results are kept for, defaults to the RESULT_RETENTION setting.
+    :param batch_size: The number of rows deleted at once, defaults to the RESULT_COMPACTION_BATCH_SIZE setting.
+    :return: Returns the number of results deleted.
+    """
+    retention = retention if retention is not None else settings.RESULT_RETENTION
+    batch_size = batch_size or settings.RESULT_COMPACTION_BATCH_SIZE
+    expires = timezone.now() - dt.timedelta(seconds=retention)
+    deleted = 0
+    while True:
+        batch = list(TaskResult.objects.filter(
+            date_done__lt=expires
+        ).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += TaskResult.objects.filter(pk__in=batch).delete()[0]
@@ -4,20 +4,27 @@
 import datetime as dt
 import math
 import os
-import requests
+import uuid
 
 from celery import shared_task
-from celery.task import chord
-from rest_framework import status
+from django.conf import settings
 
-from reporter import api_urls, models
+from reporter import api_urls, claim_check, ingest_watchman, metrics, snapshots, sync_checkpoint, sync_lease, \
+    sync_runs, watchman_client, watchman_records, webhook_events
+from reporter.tasks_join import join_pages
+
+# the ways the pages of the Watchman '/computers' endpoint can be fetched and parsed
+FETCH_MODES = ('combine', 'stream', 'async')
 
 
 @shared_task
-def update_client(group_id, api_key=str()):
+def update_client(group_id, api_key=str(), fetch_mode='combine'):
     """
     Starts the Watchman update tasks for a specific Watchman group. This is the main task to start the update process
-    for Watchman information. Example:
+    for Watchman information. Only one sync of a group runs at a time, see sync_lease. Depending on the
+    WATCHMAN_SYNC_OVERLAP setting a sync that starts while another is running either exits immediately or is
+    coalesced into a single sync that runs once the other is done. A sync that did not finish is resumed from its
+    checkpoint, see sync_checkpoint. The history of every sync is recorded in a SyncRun, see sync_runs. Example:
 
         results = tasks.update_client(group_id)
         res = result_from_tuple(results.get())
@@ -25,14 +32,47 @@ def update_client(group_id, api_key=str()):
 
     :param group_id: The group ID to use in requesting a list of computers.
     :param api_key: An optional API key to use if no WATCHMAN_API_KEY environment variable is set.
+    :param fetch_mode: Either 'combine' to parse all pages once they have been fetched, 'stream' to parse every
+    page as soon as it arrives or 'async' to fetch every page concurrently from a single task.
     :return: Returns an AsyncResult object tuple containing another AsyncResult with the results of
-    queue_computers_requests(). Reference the above example to decode the results.
+    queue_computers_requests(), or None if another sync of the group is running. Reference the above example to
+    decode the results.
     """
     # get watchman group information about number of computers
     results_per_page = 100
+    # resume the unfinished sync of the group if there is one
+    checkpoint = sync_checkpoint.load(group_id)
+    if checkpoint is not None and checkpoint['fetch_mode'] != fetch_mode:
+        checkpoint = None
+    # every page of this sync is archived under the same sync ID, even when the sync is resumed
+    sync_id = checkpoint['sync_id'] if checkpoint is not None else snapshots.new_sync_id()
+    # every attempt holds the lease with its own token, so the failures of an earlier attempt cannot release it
+    lease = uuid.uuid4().hex
+    while not sync_lease.acquire(group_id, lease):
+        # another sync of the group is running
+        if settings.WATCHMAN_SYNC_OVERLAP != 'coalesce':
+            metrics.increment('watchman_sync.skipped')
+            return None
+        if sync_lease.coalesce(group_id, {'api_key': api_key, 'fetch_mode': fetch_mode}):
+            metrics.increment('watchman_sync.coalesced')
+            return None
+    sync_runs.start(group_id, sync_id, fetch_mode)
+    if checkpoint is not None:
+        metrics.increment('watchman_sync.resumed')
+        return queue_computers_requests.apply_async((checkpoint['request_num'],
+                                                     checkpoint['per_page'],
+                                                     group_id,
+                                                     api_key,
+                                                     fetch_mode,
+                                                     sync_id,
+                                                     checkpoint['join_id'],
+                                                     lease),
+                                                    link_error=sync_failed.si(group_id, sync_id, lease))
+    metrics.increment('watchman_sync.started')
     return (get_group.s(group_id, api_key) |
             determine_computer_request_num.s(results_per_page) |
-            queue_computers_requests.s(results_per_page, group_id, api_key))()
+            queue_computers_requests.s(results_per_page, group_id, api_key, fetch_mode, sync_id, lease=lease)
+            ).apply_async(link_error=sync_failed.si(group_id, sync_id, lease))
 
 
 @shared_task
@@ -51,11 +91,7 @@ def get_group(group_id, api_key=str()):
     }
     # make request
     url = api_urls.watchman['group'].format(group_id)
-    req = requests.get(url, query_params)
-    # return results or error
-    if req.status_code != status.HTTP_200_OK:
-        raise Exception(f'request returned status code {req.status_code}')
-    return req.json()
+    return watchman_client.get(url, query_params)
 
 
 @shared_task
@@ -71,27 +107,72 @@ def determine_computer_request_num(json, per_page):
 
 
 @shared_task
-def queue_computers_requests(request_num, per_page, group_id, api_key=str()):
+def queue_computers_requests(request_num, per_page, group_id, api_key=str(), fetch_mode='combine', sync_id=None,
+                             join_id=None, lease=None):
     """
-    Creates a Celery chord of requests and concatenates the results into one JSON formatted dictionary.
+    Requests every page in parallel, joined by join_pages(), and concatenates the results into one JSON formatted
+    dictionary. In the 'stream' fetch mode every page is instead parsed by its own task and the join only resolves the
+    warnings that were not seen on any page. In the 'async' fetch mode no join is needed, the pages are fetched
+    concurrently and parsed by this task.
 
     :param request_num: The number of requests to make to get all results from the Watchman '/computers' endpoint.
     :param per_page: The number of computers to include per page. Watchman limits this to 100.
     :param group_id: The group ID to use in requesting a list of computers.
     :param api_key: An optional API key to use if no WATCHMAN_API_KEY environment variable is set.
+    :param fetch_mode: One of FETCH_MODES, see update_client().
+    :param sync_id: The ID the pages are archived under, see snapshots.archive_page().
+    :param join_id: The ID of the join of a resumed sync, only its missing pages are requested.
+    :param lease: The token the sync holds the lease of the group with, see sync_lease.
     :return: Returns a JSON formatted dictionary containing the concatenated results from the multiple requests.
     """
+    # fetch every page from this task and parse the results in place
+    if fetch_mode == 'async':
+        json = fetch_computers_concurrently(request_num, per_page, group_id, api_key, sync_id)
+        results = {
+            'computers': parse_computers(json, sync_id=sync_id),
+            'warnings': parse_warnings(json, sync_id=sync_id),
+        }
+        release_sync(group_id, sync_id, lease)
+        return results
+    # record the join of the pages so that the sync can be resumed if it does not finish
+    if settings.PAGE_JOIN == 'counter' and sync_id is not None:
+        join_id = join_id or uuid.uuid4().hex
+        sync_checkpoint.save(group_id, {
+            'sync_id': sync_id,
+            'lease': lease,
+            'join_id': join_id,
+            'request_num': request_num,
+            'per_page': per_page,
+            'fetch_mode': fetch_mode,
+        })
+    # parse each page as it arrives and finish the sync once all pages are done
+    if fetch_mode == 'stream':
+        return join_pages([ingest_computers.s(page=page,
+                                              per_page=per_page,
+                                              group_id=group_id,
+                                              api_key=api_key,
+                                              sync_id=sync_id)
+                           for page in range(1, request_num + 1)],
+                          finish_computers_stream.s(group_id, sync_id, lease),
+                          sync_failed.si(group_id, sync_id, lease),
+                          join_id,
+                          group_id)
     # put the the multiple computer requests in a group
-    computers_chord = chord(get_computers.s(page=page,
-                                            per_page=per_page,
-                                            group_id=group_id,
-                                            api_key=api_key)
-                            for page in range(1, request_num + 1))
-    return computers_chord(combine_computer_results.subtask())
+    return join_pages([get_computers.s(page=page,
+                                       per_page=per_page,
+                                       group_id=group_id,
+                                       api_key=api_key,
+                                       use_claim_check=True,
+                                       sync_id=sync_id)
+                       for page in range(1, request_num + 1)],
+                      combine_computer_results.s(group_id=group_id, sync_id=sync_id, lease=lease),
+                      sync_failed.si(group_id, sync_id, lease),
+                      join_id,
+                      group_id)
 
 
 @shared_task
-def get_computers(page=None, per_page=None, group_id=None, api_key=str()):
+def get_computers(page=None, per_page=None, group_id=None, api_key=str(), use_claim_check=False, sync_id=None):
     """
     Queries the Watchman Monitoring '/computers' endpoint with a group ID to retrieve a list of all monitored
     computers along with any warnings that these computers currently have.
@@ -100,9 +181,30 @@ def get_computers(page=None, per_page=None, group_id=None, api_key=str()):
     :param per_page: The number of computers per page, max of 100.
     :param group_id: The group ID of computers to query.
     :param api_key: An optional API key to use if no WATCHMAN_API_KEY environment variable is set.
-    :return: Returns the request response.
+    :param use_claim_check: Set to store a large response in the claim check store and return a reference to it.
+    :param sync_id: The ID of the sync to archive the raw page under if the WATCHMAN_SNAPSHOT_DIR setting is set.
+    :return: Returns the request response projected into compact rows, see watchman_records.compact().
+    """
+    with sync_runs.collect() as stats:
+        # make request
+        url = api_urls.watchman['computers']
+        with sync_runs.timer('fetch'):
+            json = watchman_client.get(url, computers_query_params(page, per_page, group_id, api_key))
+        # archive the raw page before it is compacted
+        snapshots.archive_page(group_id, sync_id, page or 1, json)
+        # only keep the fields that are saved
+        with sync_runs.timer('parse'):
+            json = watchman_records.compact(json)
+    sync_runs.record(sync_id, stats, pages=1)
+    if use_claim_check:
+        return claim_check.store(json)
+    return json
+
+
+def computers_query_params(page=None, per_page=None, group_id=None, api_key=str()):
+    """
+    Constructs the query parameters of a Watchman '/computers' request. See get_computers() for the parameters.
     """
-    # construct query parameters
     query_params = {
         'api_key': os.getenv('WATCHMAN_API_KEY', api_key),
         'expand[]': 'plugin_results',
@@ -113,116 +215,307 @@ def get_computers(page=None, per_page=None, group_id=None, api_key=str()):
         query_params['per_page'] = per_page
     if group_id is not None:
         query_params['group_id'] = group_id
-    # make request
-    url = api_urls.watchman['computers']
-    req = requests.get(url, query_params)
-    # return results or error
-    if req.status_code != status.HTTP_200_OK:
-        raise Exception(f'request returned status code {req.status_code}')
-    return req.json()
+    return query_params
+
+
+def fetch_computers_concurrently(request_num, per_page, group_id, api_key=str(), sync_id=None):
+    """
+    Fetches every page of the Watchman '/computers' endpoint concurrently, limited by the WATCHMAN_CONCURRENCY
+    setting, and concatenates the results.
+
+    :param request_num: The number of pages to request.
+    :param per_page: The number of computers per page, max of 100.
+    :param group_id: The group ID of computers to query.
+    :param api_key: An optional API key to use if no WATCHMAN_API_KEY environment variable is set.
+    :param sync_id: The ID of the sync to archive the raw pages under if the WATCHMAN_SNAPSHOT_DIR setting is set.
+    :return: Returns a list of ComputerRecord objects from every page.
+    """
+    with sync_runs.collect() as stats:
+        url = api_urls.watchman['computers']
+        with sync_runs.timer('fetch'):
+            pages = watchman_client.get_many(url, [computers_query_params(page, per_page, group_id, api_key)
+                                                   for page in range(1, request_num + 1)])
+        for page, json in enumerate(pages, start=1):
+            snapshots.archive_page(group_id, sync_id, page, json)
+        with sync_runs.timer('parse'):
+            records = watchman_records.load(computer for page in pages for computer in page)
+    sync_runs.record(sync_id, stats, pages=request_num)
+    return records
 
 
 @shared_task
-def combine_computer_results(*results):
+def combine_computer_results(*results, group_id=None, sync_id=None, lease=None):
     """
     The callback task used in queue_computers_requests() to concatenate all the results from Watchman the
     '/computers' request.
 
-    :param results: List of JSON formatted dictionary results to concatenate.
-    :return: Returns a single JSON formatted dictionary of Watchman '/computers' endpoint results.
+    :param results: List of JSON formatted dictionary results or claim checks to concatenate.
+    :param group_id: The group ID that was synced.
+    :param sync_id: The ID of the sync.
+    :param lease: The token the sync holds the lease of the group with, it is released once the results are parsed.
+    :return: Returns a claim check for a single JSON formatted dictionary of Watchman '/computers' endpoint results.
     """
     # build the new results
     new_results = list()
     for r in results[0]:
-        new_results += r
-    # update the database with the results
-    (parse_computers.si(new_results) |
-     parse_warnings.si(new_results))()
+        new_results += claim_check.load(r)
+    shards = ingest_watchman.shard_count(len(new_results))
+    # store the combined results once and only pass the claim check to the parse tasks
+    new_results = claim_check.store(new_results)
+    for r in results[0]:
+        claim_check.discard(r)
+    # update the database with the results, split into shards that are ingested in parallel for large groups
+    if shards > 1:
+        join_pages([ingest_shard.s(new_results, shard, shards, sync_id) for shard in range(shards)],
+                   finish_computers_stream.s(group_id, sync_id, lease),
+                   sync_failed.si(group_id, sync_id, lease))
+    else:
+        (parse_computers.si(new_results, sync_id=sync_id) |
+         parse_warnings.si(new_results, sync_id=sync_id) |
+         finish_computers_combine.si(new_results, group_id, sync_id, lease)).apply_async(
+            link_error=sync_failed.si(group_id, sync_id, lease))
     # return the combined results
     return new_results
 
 
 @shared_task
-def parse_computers(json):
+def ingest_computers(page=None, per_page=None, group_id=None, api_key=str(), sync_id=None):
     """
-    Parses the results of queue_computers_requests to save new computers to the database.
+    Retrieves a single page from the Watchman '/computers' endpoint and immediately saves its computers and warnings
+    to the database. Used by the 'stream' fetch mode so that only one page is held in memory at a time.
 
-    :param json: A JSON formatted dictionary containing the concatenated results from the multiple requests.
-    :return: None
+    :param page: The page number for pagination.
+    :param per_page: The number of computers per page, max of 100.
+    :param group_id: The group ID of computers to query.
+    :param api_key: An optional API key to use if no WATCHMAN_API_KEY environment variable is set.
+    :param sync_id: The ID of the sync to archive the raw page under, see get_computers().
+    :return: Returns a dictionary with the computer and warning counts of the page along with the keys of the
+    warnings that are still open.
+    """
+    json = get_computers(page=page, per_page=per_page, group_id=group_id, api_key=api_key, sync_id=sync_id)
+    with sync_runs.collect() as stats, sync_runs.timer('parse'):
+        result = ingest_watchman.ingest_page(json)
+    sync_runs.record(sync_id, stats, computers=result['computers'], warnings=result['warnings'])
+    return result
+
+
+@shared_task
+def ingest_shard(json, shard, shards, sync_id=None):
+    """
+    Saves the computers and warnings of one shard of a sync, see ingest_watchman.shard_of(). Every shard owns a
+    disjoint set of computers along with their warnings, so the shards of a sync never write the same rows and can run
+    in parallel without locking.
+
+    :param json: A claim check for the combined results of the Watchman '/computers' endpoint.
+    :param shard: The number of this shard.
+    :param shards: The number of shards.
+    :param sync_id: The ID of the sync to record the counts to, see sync_runs.
+    :return: Returns a dictionary with the computer and warning counts of the shard along with the keys of the
+    warnings that are still open, see ingest_watchman.ingest_page().
+    """
+    with sync_runs.collect() as stats, sync_runs.timer('parse'):
+        computers = [computer for computer in watchman_records.load(claim_check.load(json))
+                     if ingest_watchman.shard_of(computer.uid, shards) == shard]
+        result = ingest_watchman.ingest_page(computers)
+    sync_runs.record(sync_id, stats, computers=result['computers'], warnings=result['warnings'])
+    return result
+
+
+@shared_task
+def finish_computers_stream(results, group_id, sync_id=None, lease=None):
+    """
+    The callback task used in queue_computers_requests() for the 'stream' fetch mode, and to merge the shards of a
+    sharded sync. Resolves the open warnings that were not reported by any page or shard and totals their counts.
+
+    :param results: List of ingest_computers() or ingest_shard() results.
+    :param group_id: The group ID that was synced.
+    :param sync_id: The ID of the sync to record the counts to, see sync_runs.
+    :param lease: The token the sync holds the lease of the group with, it is released once the sync is finished.
+    :return: Returns a dictionary with the total computer and warning counts of the sync.
+    """
+    totals = {'computers': {}, 'warnings': {}}
+    seen = []
+    for result in results:
+        for kind in totals:
+            for name, count in result[kind].items():
+                totals[kind][name] = totals[kind].get(name, 0) + count
+        seen += result['open']
+    with sync_runs.collect() as stats, sync_runs.timer('parse'):
+        resolved = ingest_watchman.resolve_unseen_warnings(group_id, seen)
+    sync_runs.record(sync_id, stats, warnings={'resolved': resolved})
+    totals['warnings']['resolved'] = totals['warnings'].get('resolved', 0) + resolved
+    release_sync(group_id, sync_id, lease)
+    return totals
+
+
+@shared_task
+def finish_computers_combine(json, group_id, sync_id=None, lease=None):
+    """
+    The last task of a 'combine' sync that is not sharded. Resolves the open warnings that the combined results no
+    longer report, just like finish_computers_stream() does for sharded syncs, so the warnings of computers that left
+    the group are resolved whatever the size of the group.
+
+    :param json: A claim check for the combined results of the Watchman '/computers' endpoint.
+    :param group_id: The group ID that was synced.
+    :param sync_id: The ID of the sync to record the counts to, see sync_runs.
+    :param lease: The token the sync holds the lease of the group with, it is released once the sync is finished.
+    :return: Returns the number of warnings resolved.
+    """
+    with sync_runs.collect() as stats, sync_runs.timer('parse'):
+        seen = ingest_watchman.open_warning_keys(claim_check.load(json))
+        resolved = ingest_watchman.resolve_unseen_warnings(group_id, seen)
+    sync_runs.record(sync_id, stats, warnings={'resolved': resolved})
+    release_sync(group_id, sync_id, lease)
+    return resolved
+
+
+@shared_task
+def release_sync(group_id, sync_id, lease):
+    """
+    Releases the lease of a finished sync and starts the sync that was coalesced into it, if any.
+
+    :param group_id: The group ID that was synced.
+    :param sync_id: The ID of the sync.
+    :param lease: The token the sync holds the lease of the group with.
+    :return: Returns True if the lease was still held by the sync.
+    """
+    return end_sync(group_id, sync_id, lease, 'completed')
+
+
+@shared_task
+def sync_failed(group_id, sync_id, lease):
+    """
+    Linked to the errors of every task of a sync. Releases the lease of the sync and starts the sync that was coalesced
+    into it, if any. A late failure of an earlier attempt of a resumed sync holds another lease token and is ignored.
+
+    :param group_id: The group ID that was synced.
+    :param sync_id: The ID of the sync.
+    :param lease: The token the sync holds the lease of the group with.
+    :return: Returns True if the lease was still held by the sync.
+    """
+    return end_sync(group_id, sync_id, lease, 'failed')
+
+
+def end_sync(group_id, sync_id, lease, sync_status):
+    """
+    Releases the lease of a sync, see release_sync(), and records how it ended. Only the first call for the lease
+    token of a sync is recorded.
+    """
+    if sync_id is None or lease is None:
+        return False
+    released, pending = sync_lease.release(group_id, lease)
+    if not released:
+        return False
+    metrics.increment(f'watchman_sync.{sync_status}')
+    sync_runs.finish(sync_id, sync_status)
+    # a finished sync leaves nothing to resume
+    if sync_status == 'completed':
+        sync_checkpoint.clear(group_id)
+    if pending is not None:
+        update_client.delay(group_id, **pending)
+    return True
+
+
+@shared_task
+def parse_computers(json, date=None, sync_id=None):
     """
-    # check every computer
-    for computer in json:
-        customer = models.Customer.objects.get(watchman_group_id=computer['group'])
-        computer_id = computer['uid']
-        ram_gb = round(int(computer['ram_installed_in_bytes']) / (1024 ** 3), 2)
-        hdd_capacity_gb = float(computer['boot_volume_capacity'][:-3])
-        hdd_usage_gb = float(computer['boot_volume_usage'][:-3])
-        # get computer object if it exists
-        try:
-            # could potentially throw DoesNotExist Exception
-            computer_object = models.WatchmanComputer.objects.get(watchman_group_id=customer, computer_id=computer_id)
-            # update existing computer object
-            computer_object.date_last_reported = dt.datetime.now()
-            computer_object.name = computer['computer_name']
-            computer_object.os_type = computer['platform']
-            computer_object.os_version = computer['os_version']
-            computer_object.ram_gb = ram_gb
-            computer_object.hdd_capacity_gb = hdd_capacity_gb
-            computer_object.hdd_usage_gb = hdd_usage_gb
-            computer_object.save()
-        except models.WatchmanComputer.DoesNotExist:
-            # add computer to the database
-            computer_object = models.WatchmanComputer(watchman_group_id=customer,
-                                                      computer_id=computer_id,
-                                                      name=computer['computer_name'],
-                                                      os_type=computer['platform'],
-                                                      os_version=computer['os_version'],
-                                                      ram_gb=ram_gb,
-                                                      hdd_capacity_gb=hdd_capacity_gb,
-                                                      hdd_usage_gb=hdd_usage_gb)
-            computer_object.save()
-
-
-@shared_task
-def parse_warnings(json):
+    Parses the results of queue_computers_requests to save new computers to the database and update existing
+    computers. All existing computers are loaded at once and the changes are written with batched bulk queries.
+
+    :param json: A JSON formatted dictionary containing the concatenated results from the multiple requests, or a
+    claim check for it.
+    :param date: The ISO formatted date the results were reported on, defaults to today.
+    :param sync_id: The ID of the sync to record the counts to, see sync_runs.
+    :return: Returns a dictionary with the number of computers inserted, updated and left unchanged.
+    """
+    with sync_runs.collect() as stats, sync_runs.timer('parse'):
+        result = ingest_watchman.upsert_computers(claim_check.load(json), today=parse_date(date))
+    sync_runs.record(sync_id, stats, computers=result)
+    return result
+
+
+@shared_task
+def parse_warnings(json, date=None, sync_id=None):
     """
     Parses the results of queue_computers_requests to save new warnings to the database and update existing
-    warnings.
+    warnings. All open warnings are loaded at once and the changes are written with batched bulk queries.
 
-    :param json: A JSON formatted dictionary containing the concatenated results from the multiple requests.
+    :param json: A JSON formatted dictionary containing the concatenated results from the multiple requests, or a
+    claim check for it.
+    :param date: The ISO formatted date the results were reported on, defaults to today.
+    :param sync_id: The ID of the sync to record the counts to, see sync_runs.
+    :return: Returns a dictionary with the number of warnings created, resolved and checked.
+    """
+    with sync_runs.collect() as stats, sync_runs.timer('parse'):
+        result = ingest_watchman.reconcile_warnings(claim_check.load(json), today=parse_date(date))
+    sync_runs.record(sync_id, stats, warnings=result)
+    return result
+
+
+def parse_date(date):
+    """
+    :return: Returns the date object of an ISO formatted date string, or None if no date is given.
+    """
+    if date is None:
+        return None
+    return dt.datetime.strptime(date, '%Y-%m-%d').date()
+
+
+@shared_task
+def purge_claim_checks():
+    """
+    Deletes the expired blobs of the claim check store. Scheduled hourly by CELERY_BEAT_SCHEDULE.
+
+    :return: Returns the number of blobs deleted.
+    """
+    return claim_check.get_store().purge_expired()
+
+
+def queue_webhook_events(events):
+    """
+    Queues plugin status changes pushed by the Watchman webhook and schedules a batch to apply them after the
+    WATCHMAN_WEBHOOK_BATCH_DELAY setting, unless one is already scheduled.
+
+    :param events: A list of event dictionaries, each with the 'computer' ID and the 'plugin' result that changed.
     :return: None
     """
-    # check every computer
-    for computer in json:
-        customer_object = models.Customer.objects.get(watchman_group_id=computer['group'])
-        computer_object = models.WatchmanComputer.objects.get(watchman_group_id=computer['group'],
-                                                              computer_id=computer['uid'])
-        # check every plugin's status
-        for plugin in computer['plugin_results']:
-            warning_id = plugin['uid']
-            warning_status = plugin['status'].upper()
-            # get warning object if it exists
-            try:
-                warning_object = models.WatchmanWarning.objects.get(watchman_group_id=customer_object,
-                                                                    computer_id=computer_object,
-                                                                    warning_id=warning_id,
-                                                                    date_resolved=None)
-            except models.WatchmanWarning.DoesNotExist:
-                warning_object = None
-
-            # status is OK and a warning does exist
-            if warning_status == 'OK' and warning_object is not None:
-                warning_object.date_resolved = dt.datetime.now()
-            # status is WARNING and no warning exists
-            elif warning_status == 'WARNING' and warning_object is None:
-                # create new warning
-                models.WatchmanWarning(watchman_group_id=customer_object,
-                                       computer_id=computer_object,
-                                       warning_id=warning_id,
-                                       name=plugin['name'],
-                                       details=plugin['details']).save()
-
-            # update last checked column
-            if warning_object is not None:
-                warning_object.date_last_checked = dt.datetime.now()
-                warning_object.save()
+    if webhook_events.push(events):
+        apply_webhook_events.apply_async(countdown=settings.WATCHMAN_WEBHOOK_BATCH_DELAY)
+
+
+@shared_task
+def apply_webhook_events():
+    """
+    Applies up to WATCHMAN_WEBHOOK_BATCH_SIZE queued webhook events with the same semantics as parse_warnings, see
+    ingest_watchman.apply_plugin_events(). The batch holds the sync lease of every group it writes to, so it never
+    creates the same warning as a sync of the group, see sync_lease. The events of groups that are being synced are
+    put back in the queue and tried again after WATCHMAN_WEBHOOK_BATCH_DELAY seconds. Another batch is scheduled right
+    away if other events are left in the queue.
+
+    :return: Returns a dictionary with the number of events applied and deferred along with the number of warnings
+    created, resolved and checked.
+    """
+    events = webhook_events.pop(settings.WATCHMAN_WEBHOOK_BATCH_SIZE)
+    group_ids = ingest_watchman.computer_group_ids(event['computer'] for event in events)
+    # take the lease of every group of the batch, events of computers that have not been synced are skipped anyway
+    lease = uuid.uuid4().hex
+    leased = {group_id for group_id in set(group_ids.values()) if sync_lease.acquire(group_id, lease)}
+    syncing = set(group_ids.values()) - leased
+    deferred = [event for event in events if group_ids.get(event['computer']) in syncing]
+    events = [event for event in events if group_ids.get(event['computer']) not in syncing]
+    try:
+        result = ingest_watchman.apply_plugin_events(events) if events else {}
+    finally:
+        for group_id in leased:
+            # start the syncs that were coalesced while the batch held the lease
+            _, pending = sync_lease.release(group_id, lease)
+            if pending is not None:
+                update_client.delay(group_id, **pending)
+    metrics.increment('watchman_webhook.applied', len(events))
+    webhook_events.requeue(deferred)
+    if webhook_events.pending() and webhook_events.schedule():
+        if deferred:
+            apply_webhook_events.apply_async(countdown=settings.WATCHMAN_WEBHOOK_BATCH_DELAY)
+        else:
+            apply_webhook_events.delay()
+    return dict(result, events=len(events), deferred=len(deferred))
@@ -2,6 +2,22 @@ from django import template
 
 register = template.Library()
 
+# the display names of the platforms reported by Watchman
+PLATFORM_NAMES = {
+    'mac': 'MacOS',
+    'windows': 'Windows',
+    'linux': 'Linux',
+}
+
+
+@register.filter
+def platform_name(os_type):
+    """
+    Formats the os_type of a platform for display.
+    """
+    return PLATFORM_NAMES.get(os_type, os_type.capitalize())
+
+
 @register.filter
 def count_unresolved_warnings(report):
     """
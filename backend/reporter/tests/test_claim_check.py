@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from reporter import claim_check, models, tasks_watchman
+from reporter.tests.test_tasks_watchman import watchman_computer
+
+
+class FileSystemClaimCheckTest(SimpleTestCase):
+    def setUp(self):
+        # store blobs in a temporary directory
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(CLAIM_CHECK_STORE='filesystem',
+                                                   CLAIM_CHECK_DIR=self.directory,
+                                                   CLAIM_CHECK_THRESHOLD=100)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+
+    def test_store(self):
+        """
+        Tests that a large payload is stored and can be loaded from its claim check.
+        """
+        payload = [{'uid': f'c_{i}'} for i in range(20)]
+        value = claim_check.store(payload)
+        self.assertTrue(claim_check.is_claim_check(value))
+        self.assertEqual(os.listdir(self.directory), [value['claim_check']])
+        self.assertEqual(claim_check.load(value), payload)
+
+    def test_store_small(self):
+        """
+        Tests that a small payload is passed as is.
+        """
+        payload = [{'uid': 'c_1'}]
+        self.assertEqual(claim_check.store(payload), payload)
+        self.assertEqual(claim_check.load(payload), payload)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_discard(self):
+        """
+        Tests that a discarded claim check can no longer be loaded.
+        """
+        value = claim_check.store([{'uid': f'c_{i}'} for i in range(20)])
+        claim_check.discard(value)
+        with self.assertRaises(KeyError):
+            claim_check.load(value)
+
+    def test_purge_expired(self):
+        """
+        Tests that only expired blobs are purged.
+        """
+        expired = claim_check.store([{'uid': f'c_{i}'} for i in range(20)])
+        current = claim_check.store([{'uid': f'c_{i}'} for i in range(30)])
+        path = os.path.join(self.directory, expired['claim_check'])
+        os.utime(path, (time.time() - 2 * 86400, time.time() - 2 * 86400))
+        self.assertEqual(tasks_watchman.purge_claim_checks(), 1)
+        with self.assertRaises(KeyError):
+            claim_check.load(expired)
+        self.assertEqual(len(claim_check.load(current)), 30)
+
+
+@override_settings(CLAIM_CHECK_STORE='filesystem', CLAIM_CHECK_THRESHOLD=0)
+class ParseClaimCheckTest(TestCase):
+    def setUp(self):
+        # add customer to database and store blobs in a temporary directory
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(CLAIM_CHECK_DIR=self.directory)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+
+    def test_parse(self):
+        """
+        Tests that the parse tasks accept a claim check in place of the results.
+        """
+        value = claim_check.store([watchman_computer('c_1', plugins=[('p_1', 'warning')])])
+        tasks_watchman.parse_computers(value)
+        tasks_watchman.parse_warnings(value)
+        self.assertTrue(models.WatchmanComputer.objects.filter(computer_id='c_1').exists())
+        self.assertTrue(models.WatchmanWarning.objects.filter(computer_id='c_1').exists())
@@ -0,0 +1,121 @@
+from celery import current_app, signature
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from reporter import api_urls, fair_queue, models, sync_checkpoint, sync_lease, tasks_watchman, watchman_stub
+from reporter.redis_connection import get_redis
+
+
+def clear_redis(*groups):
+    get_redis().delete(fair_queue.RING_KEY, fair_queue.ACTIVE_KEY,
+                       *(key for group in groups for key in fair_queue.keys(group)))
+
+
+def pages(group, count):
+    return [signature('reporter.tasks_watchman.get_computers', kwargs={'page': page, 'group_id': group})
+            for page in range(1, count + 1)]
+
+
+@override_settings(WATCHMAN_MAX_IN_FLIGHT_PAGES=3)
+class FairQueueTest(SimpleTestCase):
+    def setUp(self):
+        clear_redis('g_big', 'g_small')
+
+    def tearDown(self):
+        clear_redis('g_big', 'g_small')
+
+    @staticmethod
+    def taken():
+        return [(group, page['kwargs']['page']) for group, page in fair_queue.take()]
+
+    def test_round_robin(self):
+        """
+        Tests that the pages of every group are taken in turn and each group is limited to its in-flight pages.
+        """
+        fair_queue.push('g_big', pages('g_big', 10))
+        fair_queue.push('g_small', pages('g_small', 2))
+        self.assertEqual(self.taken(), [('g_big', 1), ('g_small', 1), ('g_big', 2), ('g_small', 2), ('g_big', 3)])
+        self.assertEqual(fair_queue.in_flight('g_big'), 3)
+        self.assertEqual(fair_queue.pending('g_big'), 7)
+        # nothing more can be taken until a page of the large group finishes
+        self.assertEqual(self.taken(), [])
+
+    def test_small_group_not_starved(self):
+        """
+        Tests that a group that starts after a large group has filled its slots is taken right away.
+        """
+        fair_queue.push('g_big', pages('g_big', 10))
+        self.assertEqual(len(self.taken()), 3)
+        fair_queue.push('g_small', pages('g_small', 1))
+        self.assertEqual(self.taken(), [('g_small', 1)])
+
+    def test_release(self):
+        """
+        Tests that a finished page frees a slot of its group.
+        """
+        fair_queue.push('g_big', pages('g_big', 10))
+        self.taken()
+        get_redis().register_script(fair_queue.RELEASE_SCRIPT)(keys=[fair_queue.keys('g_big')[1]])
+        self.assertEqual(self.taken(), [('g_big', 4)])
+
+    def test_empty_group_leaves_ring(self):
+        """
+        Tests that a group leaves the ring once all of its pages have been taken.
+        """
+        fair_queue.push('g_small', pages('g_small', 1))
+        self.taken()
+        self.assertEqual(self.taken(), [])
+        self.assertEqual(get_redis().llen(fair_queue.RING_KEY), 0)
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, WATCHMAN_MAX_RETRIES=0, WATCHMAN_BACKOFF_BASE=0,
+                   PAGE_JOIN='counter', WATCHMAN_MAX_IN_FLIGHT_PAGES=1, CLAIM_CHECK_THRESHOLD=10 ** 9)
+class FairSyncTest(TestCase):
+    def setUp(self):
+        # add customers to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        models.Customer.objects.create(name='customer 2', watchman_group_id='g_2222222')
+        # start the stub server with three pages of computers for the first group and one for the second
+        self.server = watchman_stub.WatchmanStubServer({
+            'g_1111111': [watchman_stub.generate_computer('g_1111111', number, 1) for number in range(250)],
+            'g_2222222': [watchman_stub.generate_computer('g_2222222', number, 1) for number in range(50)],
+        })
+        self.original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(self.server.start())
+        # run the tasks in this process
+        current_app.conf.task_always_eager = True
+        self.clear_redis()
+
+    def tearDown(self):
+        self.clear_redis()
+        current_app.conf.task_always_eager = False
+        api_urls.set_watchman_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def clear_redis():
+        clear_redis('g_1111111', 'g_2222222')
+        for group_id in ('g_1111111', 'g_2222222'):
+            get_redis().delete(sync_checkpoint.key(group_id), *sync_lease.keys(group_id))
+
+    def test_sync(self):
+        """
+        Tests that syncs complete with the pages sent through the fair queue and leave no pages in flight.
+        """
+        for fetch_mode in ('stream', 'combine'):
+            for group_id in ('g_1111111', 'g_2222222'):
+                tasks_watchman.update_client(group_id, fetch_mode=fetch_mode)
+                self.assertEqual(fair_queue.in_flight(group_id), 0)
+                self.assertEqual(fair_queue.pending(group_id), 0)
+        self.assertEqual(models.WatchmanComputer.objects.count(), 300)
+
+    def test_failed(self):
+        """
+        Tests that the pages of a failed sync that have not been sent are dropped.
+        """
+        self.server.failing_pages = {1}
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        self.assertEqual(fair_queue.pending('g_1111111'), 0)
+        self.assertEqual(fair_queue.in_flight('g_1111111'), 0)
+        requested = [int(query['page']) for path, query in self.server.requests if path.endswith('/computers')]
+        self.assertEqual(requested, [1])
@@ -0,0 +1,119 @@
+import json
+import uuid
+from unittest import mock
+
+from celery import current_app
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from reporter import api_urls, models, page_join, tasks_join, tasks_watchman, watchman_stub
+from reporter.redis_connection import get_redis
+
+
+class PageJoinTest(SimpleTestCase):
+    def setUp(self):
+        self.join_id = uuid.uuid4().hex
+
+    def tearDown(self):
+        page_join.abandon(self.join_id)
+
+    def test_complete(self):
+        """
+        Tests that the results are only returned once the last page completes, in page order.
+        """
+        page_join.start(self.join_id, 3)
+        self.assertIsNone(page_join.complete(self.join_id, 3, ['c']))
+        self.assertIsNone(page_join.complete(self.join_id, 1, ['a']))
+        self.assertEqual(page_join.complete(self.join_id, 2, ['b']), [['a'], ['b'], ['c']])
+
+    def test_complete_twice(self):
+        """
+        Tests that a page that completes twice is only counted once.
+        """
+        page_join.start(self.join_id, 2)
+        self.assertIsNone(page_join.complete(self.join_id, 1, ['a']))
+        self.assertIsNone(page_join.complete(self.join_id, 1, ['a']))
+        self.assertEqual(page_join.complete(self.join_id, 2, ['b']), [['a'], ['b']])
+
+    def test_abandon(self):
+        """
+        Tests that an abandoned join never returns its results.
+        """
+        page_join.start(self.join_id, 2)
+        page_join.complete(self.join_id, 1, ['a'])
+        page_join.abandon(self.join_id)
+        self.assertIsNone(page_join.complete(self.join_id, 2, ['b']))
+        # the page that completes late leaves nothing behind
+        self.assertEqual(get_redis().exists(*page_join.keys(self.join_id)), 0)
+
+    def test_resume(self):
+        """
+        Tests that a page of an earlier run that completes after the join is started again is counted.
+        """
+        page_join.start(self.join_id, 3)
+        page_join.complete(self.join_id, 1, ['a'])
+        self.assertEqual(page_join.start(self.join_id, 3), ({1}, None))
+        # the page was still running when the join was started again, then it is sent again
+        self.assertIsNone(page_join.complete(self.join_id, 2, ['b']))
+        self.assertIsNone(page_join.complete(self.join_id, 2, ['b']))
+        self.assertEqual(page_join.complete(self.join_id, 3, ['c']), [['a'], ['b'], ['c']])
+
+    def test_resume_completed(self):
+        """
+        Tests that a join whose pages have all completed returns every result when it is started again.
+        """
+        page_join.start(self.join_id, 2)
+        page_join.complete(self.join_id, 1, ['a'])
+        # the last page was saved without counting it
+        get_redis().hset(page_join.keys(self.join_id)[1], 2, json.dumps(['b']))
+        self.assertEqual(page_join.start(self.join_id, 2), ({1, 2}, [['a'], ['b']]))
+        self.assertFalse(get_redis().exists(*page_join.keys(self.join_id)))
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, PAGE_JOIN='counter', CLAIM_CHECK_THRESHOLD=10 ** 9)
+class JoinPagesTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        # start the stub server
+        computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(5)]
+        self.server = watchman_stub.WatchmanStubServer({'g_1111111': computers})
+        self.original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(self.server.start())
+        # run the tasks in this process
+        current_app.conf.task_always_eager = True
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+        api_urls.set_watchman_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_stream(self):
+        """
+        Tests that the pages of the 'stream' fetch mode are joined without a chord.
+        """
+        tasks_watchman.queue_computers_requests(3, 2, 'g_1111111', fetch_mode='stream')
+        self.assertEqual(models.WatchmanComputer.objects.count(), 5)
+
+    def test_combine(self):
+        """
+        Tests that the pages of the 'combine' fetch mode are joined without a chord.
+        """
+        tasks_watchman.queue_computers_requests(3, 2, 'g_1111111', fetch_mode='combine')
+        self.assertEqual(models.WatchmanComputer.objects.count(), 5)
+        self.assertTrue(models.WatchmanWarning.objects.exists())
+
+    def test_resume_completed(self):
+        """
+        Tests that a resumed join whose pages have all completed calls the callback right away without sending pages.
+        """
+        join_id = uuid.uuid4().hex
+        page_join.start(join_id, 2)
+        page_join.complete(join_id, 1, ['a'])
+        get_redis().hset(page_join.keys(join_id)[1], 2, json.dumps(['b']))
+        header = [mock.Mock(), mock.Mock()]
+        callback = mock.Mock()
+        tasks_join.join_pages(header, callback, join_id=join_id)
+        callback.delay.assert_called_once_with([['a'], ['b']])
+        for page_signature in header:
+            page_signature.apply_async.assert_not_called()
@@ -1,12 +1,16 @@
 from datetime import datetime, date, timedelta
 import json
 import uuid
+from unittest import mock
 
+from celery import current_app
 from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from rest_framework import status, test
 from rest_framework.reverse import reverse
 
-from reporter import models
+from reporter import models, reports, tasks_reports
 
 
 class ReportListRequestTest(test.APITestCase):
@@ -180,6 +184,8 @@ class ReportListRequestTest(test.APITestCase):
 
 class ReportCreateRequestTest(test.APITestCase):
     def setUp(self):
+        # build the reports in this process
+        current_app.conf.task_always_eager = True
         # create test user
         self.username = 'test'
         self.password = 'test'
@@ -191,9 +197,26 @@ class ReportCreateRequestTest(test.APITestCase):
         models.Customer(name='customer 1', watchman_group_id='g_1111111', repairshopr_id='1111111').save()
         self.customer = models.Customer.objects.first()
 
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
     def test_status_code(self):
         """
-        Tests the response's status code for 201 CREATED.
+        Tests the response's status code for 202 ACCEPTED.
+        """
+        # request
+        request_body = {
+            'customer': self.customer.id,
+            'start_date': '2019-01-01',
+            'end_date': '2019-01-31'
+        }
+        response = self.client.post(reverse(self.view_name), request_body)
+        # test response
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_response(self):
+        """
+        Tests that the response holds the ID of the new report and the job ID of its job.
         """
         # request
         request_body = {
@@ -203,7 +226,9 @@ class ReportCreateRequestTest(test.APITestCase):
         }
         response = self.client.post(reverse(self.view_name), request_body)
         # test response
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        job = models.ReportJob.objects.get()
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'report': models.Report.objects.get().id, 'job': str(job.job_id)})
 
     def test_customer(self):
         """
@@ -367,6 +392,8 @@ class ReportCreateRequestTest(test.APITestCase):
 
 class ReportCreateReportTest(test.APITestCase):
     def setUp(self):
+        # build the reports in this process
+        current_app.conf.task_always_eager = True
         # create test user
         self.username = 'test'
         self.password = 'test'
@@ -378,6 +405,9 @@ class ReportCreateReportTest(test.APITestCase):
         models.Customer(name='customer 1', watchman_group_id='g_1111111', repairshopr_id='1111111').save()
         self.customer = models.Customer.objects.first()
 
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
     def test_create_object(self):
         """
         Tests that a Report object was created.
@@ -505,6 +535,27 @@ class ReportCreateReportTest(test.APITestCase):
         # test database
         self.assertEqual(models.Report.objects.first().num_linux_os, 2)
 
+    def test_num_platforms(self):
+        """
+        Tests that a Report object stores the number of computers of every platform, including other platforms.
+        """
+        # create computers
+        create_watchman_computer(self.customer, os_type='mac', date_reported=date(2018, 12, 1), date_last_reported=date(2019, 1, 15))
+        create_watchman_computer(self.customer, os_type='freebsd', date_reported=date(2018, 12, 1), date_last_reported=date(2019, 1, 15))
+        create_watchman_computer(self.customer, os_type='freebsd', date_reported=date(2019, 1, 10), date_last_reported=date(2019, 1, 15))
+        # request
+        request_body = {
+            'customer': self.customer.id,
+            'start_date': '2019-01-01',
+            'end_date': '2019-01-31'
+        }
+        self.client.post(reverse(self.view_name), request_body)
+        # test database
+        report = models.Report.objects.first()
+        self.assertEqual(report.num_mac_os, 1)
+        self.assertEqual(dict(report.reportplatform_set.values_list('os_type', 'num_computers')),
+                         {'mac': 1, 'freebsd': 2})
+
     def test_num_mac_os_last_reported_before_start_date(self):
         """
         Tests that a Report object assigns the right number of mac os computers when some were last reported before the start date.
@@ -616,6 +667,8 @@ class ReportCreateReportTest(test.APITestCase):
 
 class ReportCreateSubReportTest(test.APITestCase):
     def setUp(self):
+        # build the reports in this process
+        current_app.conf.task_always_eager = True
         # create test user
         self.username = 'test'
         self.password = 'test'
@@ -627,6 +680,9 @@ class ReportCreateSubReportTest(test.APITestCase):
         models.Customer(name='customer 1', watchman_group_id='g_1111111', repairshopr_id='1111111').save()
         self.customer = models.Customer.objects.first()
 
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
     def test_create_object(self):
         """
         Tests that a SubReport object is created.
@@ -1180,6 +1236,8 @@ class ReportCreateSubReportTest(test.APITestCase):
 
 class ReportCreateComputerReportTest(test.APITestCase):
     def setUp(self):
+        # build the reports in this process
+        current_app.conf.task_always_eager = True
         # create test user
         self.username = 'test'
         self.password = 'test'
@@ -1191,6 +1249,9 @@ class ReportCreateComputerReportTest(test.APITestCase):
         models.Customer(name='customer 1', watchman_group_id='g_1111111', repairshopr_id='1111111').save()
         self.customer = models.Customer.objects.first()
 
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
     def test_create_object(self):
         """
         Tests that ComputerReport objects are created.
@@ -1379,8 +1440,221 @@ class ReportCreateComputerReportTest(test.APITestCase):
         self.assertEqual(models.ComputerReport.objects.first().computer, comp)
 
 
+class ReportJobTest(test.APITestCase):
+    def setUp(self):
+        # create test user
+        self.username = 'test'
+        self.password = 'test'
+        self.user = User.objects.create_user(username=self.username, password=self.password)
+        self.client.login(username=self.username, password=self.password)
+        # add customer to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        self.request_body = {
+            'customer': self.customer.id,
+            'start_date': '2018-01-01',
+            'end_date': '2019-03-31'
+        }
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
+    def test_done(self):
+        """
+        Tests that the job of a built report is done with every sub report counted.
+        """
+        current_app.conf.task_always_eager = True
+        job_id = self.client.post(reverse('reporter:report-lc'), self.request_body).data['job']
+        response = self.client.get(reverse('reporter:report-job-r', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['report'], models.Report.objects.get().id)
+        self.assertEqual((response.data['sub_reports_done'], response.data['sub_reports_total']), (15, 15))
+        self.assertIsNotNone(response.data['date_finished'])
+
+    def test_progress(self):
+        """
+        Tests that the progress of a job is saved after every chunk of sub reports.
+        """
+        job = reports.create_report(self.customer, date(2018, 1, 1), date(2019, 3, 31))
+        saved = []
+        sub_report_counts = reports.sub_report_counts
+
+        def counts(customer, periods):
+            # the progress saved before every chunk is counted
+            saved.append(models.ReportJob.objects.get(pk=job.pk).sub_reports_done)
+            return sub_report_counts(customer, periods)
+
+        with override_settings(REPORT_CHUNK_MONTHS=6), mock.patch.object(reports, 'sub_report_counts', counts):
+            tasks_reports.build_report(str(job.job_id))
+        self.assertEqual(saved, [0, 6, 12])
+        self.assertEqual(models.SubReport.objects.filter(report=job.report).count(), 15)
+
+    def test_pending(self):
+        """
+        Tests that a report is not listed until its job is done.
+        """
+        with mock.patch.object(tasks_reports.build_report, 'delay') as delay:
+            response = self.client.post(reverse('reporter:report-lc'), self.request_body)
+        delay.assert_called_once_with(response.data['job'])
+        job = self.client.get(reverse('reporter:report-job-r', args=[response.data['job']]))
+        self.assertEqual((job.data['status'], job.data['sub_reports_done']), ('pending', 0))
+        self.assertEqual(self.client.get(reverse('reporter:report-lc')).data['results'], [])
+        tasks_reports.build_report(response.data['job'])
+        self.assertEqual(len(self.client.get(reverse('reporter:report-lc')).data['results']), 1)
+
+    def test_started_once(self):
+        """
+        Tests that a job is only built by the first task that starts it.
+        """
+        job = reports.create_report(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        self.assertEqual(tasks_reports.build_report(str(job.job_id)), {'report': job.report_id, 'sub_reports': 1})
+        self.assertIsNone(tasks_reports.build_report(str(job.job_id)))
+        self.assertEqual(models.SubReport.objects.count(), 1)
+
+    def test_failed(self):
+        """
+        Tests that a job that fails is marked failed with its error and its report is deleted.
+        """
+        job = reports.create_report(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        with mock.patch.object(reports, 'snapshot_computers', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                tasks_reports.build_report(str(job.job_id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'RuntimeError: disk full'))
+        self.assertIsNone(job.report)
+        self.assertFalse(models.Report.objects.exists())
+
+    def test_failed_before_counting(self):
+        """
+        Tests that a job is marked failed when its task fails before any chunk is counted.
+        """
+        job = reports.create_report(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        with mock.patch.object(reports, 'chunks', side_effect=RuntimeError('bad chunks')):
+            with self.assertRaises(RuntimeError):
+                tasks_reports.build_report(str(job.job_id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'RuntimeError: bad chunks'))
+        self.assertFalse(models.Report.objects.exists())
+
+    def test_expired(self):
+        """
+        Tests that the jobs that are not done by their deadline are marked failed and their reports deleted.
+        """
+        lost = reports.create_report(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        models.ReportJob.objects.filter(pk=lost.pk).update(status='running',
+                                                           date_created=timezone.now() - timedelta(hours=2))
+        recent = reports.create_report(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        done = reports.create_report(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        tasks_reports.build_report(str(done.job_id))
+        models.ReportJob.objects.filter(pk=done.pk).update(date_created=timezone.now() - timedelta(hours=2))
+        self.assertEqual(tasks_reports.expire_report_jobs(timeout=3600), 1)
+        self.assertEqual([job.status for job in models.ReportJob.objects.order_by('pk')], ['failed', 'pending', 'done'])
+        report_id = lost.report_id
+        lost.refresh_from_db()
+        self.assertEqual(lost.error, 'The report was not built within 3600 seconds.')
+        self.assertFalse(models.Report.objects.filter(pk=report_id).exists())
+        self.assertEqual(models.Report.objects.count(), 2)
+        # a task of the expired job that runs late does nothing
+        self.assertIsNone(tasks_reports.build_report(str(lost.job_id)))
+
+    def test_chunks(self):
+        """
+        Tests that the time spent on every chunk of a report is recorded.
+        """
+        job = reports.create_report(self.customer, date(2018, 1, 1), date(2019, 3, 31))
+        with override_settings(REPORT_CHUNK_MONTHS=6):
+            tasks_reports.build_report(str(job.job_id))
+        job.refresh_from_db()
+        self.assertFalse(job.fan_out)
+        self.assertIsNotNone(job.duration_seconds)
+        self.assertEqual([(chunk.index, chunk.start_date, chunk.end_date, chunk.num_sub_reports)
+                          for chunk in job.chunks.all()],
+                         [(0, date(2018, 1, 1), date(2018, 6, 30), 6),
+                          (1, date(2018, 7, 1), date(2018, 12, 31), 6),
+                          (2, date(2019, 1, 1), date(2019, 3, 31), 3)])
+
+    def test_not_found(self):
+        """
+        Tests that an unknown job ID returns 404 NOT FOUND.
+        """
+        response = self.client.get(reverse('reporter:report-job-r', args=[str(uuid.uuid4())]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(REPORT_CHUNK_MONTHS=4, REPORT_FAN_OUT_MIN_CHUNKS=2, PAGE_JOIN='counter')
+class ReportFanOutTest(TestCase):
+    def setUp(self):
+        # add customer, computer and warnings spread over the report to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        computer = create_watchman_computer(self.customer, os_type='mac', date_reported=date(2017, 6, 1),
+                                            date_last_reported=date(2019, 6, 1))
+        for number in range(24):
+            create_watchman_warning(self.customer, computer, date_reported=date(2017, 1 + number % 12, 10),
+                                    date_resolved=date(2018, 1 + number % 12, 20) if number % 2 else None)
+        # run the chunks in this process
+        current_app.conf.task_always_eager = True
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
+    @staticmethod
+    def sub_reports(report):
+        return list(models.SubReport.objects.filter(report=report).order_by('start_date').values(
+            'start_date', 'end_date', 'num_warnings_unresolved_start', 'num_warnings_unresolved_end',
+            'num_warnings_created', 'num_warnings_resolved', 'num_tickets_created', 'num_tickets_resolved'))
+
+    def test_fan_out(self):
+        """
+        Tests that the chunks counted by separate tasks build the same sub reports as a single task.
+        """
+        job = reports.create_report(self.customer, date(2017, 1, 15), date(2018, 12, 31))
+        self.assertEqual(tasks_reports.build_report(str(job.job_id)), {'report': job.report_id, 'chunks': 6})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.fan_out, job.sub_reports_done), ('done', True, 24))
+        self.assertEqual([chunk.num_sub_reports for chunk in job.chunks.all()], [4] * 6)
+        with override_settings(REPORT_FAN_OUT_MIN_CHUNKS=0):
+            single = reports.create_report(self.customer, date(2017, 1, 15), date(2018, 12, 31))
+            tasks_reports.build_report(str(single.job_id))
+        single.refresh_from_db()
+        self.assertFalse(single.fan_out)
+        self.assertEqual(self.sub_reports(job.report), self.sub_reports(single.report))
+        self.assertEqual(len(self.sub_reports(job.report)), 24)
+
+    def test_below_min_chunks(self):
+        """
+        Tests that reports with fewer chunks than REPORT_FAN_OUT_MIN_CHUNKS are counted in a single task.
+        """
+        job = reports.create_report(self.customer, date(2018, 1, 1), date(2018, 3, 31))
+        self.assertEqual(tasks_reports.build_report(str(job.job_id)), {'report': job.report_id, 'sub_reports': 3})
+        job.refresh_from_db()
+        self.assertFalse(job.fan_out)
+
+    def test_failed_chunk(self):
+        """
+        Tests that a chunk that fails marks the job failed, deletes its report and skips the remaining chunks.
+        """
+        job = reports.create_report(self.customer, date(2017, 1, 1), date(2018, 12, 31))
+        sub_report_counts = reports.sub_report_counts
+        calls = []
+
+        def counts(customer, periods):
+            calls.append(periods[0][0])
+            if len(calls) == 2:
+                raise RuntimeError('database is gone')
+            return sub_report_counts(customer, periods)
+
+        with mock.patch.object(reports, 'sub_report_counts', counts):
+            tasks_reports.build_report(str(job.job_id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'RuntimeError: database is gone'))
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(models.Report.objects.exists())
+
+
 class ReportDeleteTest(test.APITestCase):
     def setUp(self):
+        # build the reports in this process
+        current_app.conf.task_always_eager = True
         # create test user
         self.username = 'test'
         self.password = 'test'
@@ -1392,6 +1666,9 @@ class ReportDeleteTest(test.APITestCase):
         models.Customer(name='customer 1', watchman_group_id='g_1111111', repairshopr_id='1111111').save()
         self.customer = models.Customer.objects.first()
 
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
     def test_status_code(self):
         """
         Tests that the request returns status code 204 NO CONTENT.
@@ -0,0 +1,186 @@
+import importlib
+import random
+from datetime import date, timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reporter import models, reports
+from reporter.reports import report_dates
+from reporter.templatetags.report_filters import platform_name
+from reporter.tests.test_report import create_watchman_computer
+
+
+class SubReportCountsTest(TestCase):
+    def setUp(self):
+        # add customer, computers, warnings and tickets with random dates to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111',
+                                                       repairshopr_id='1111')
+        generator = random.Random(0)
+        first = date(2016, 1, 1)
+        for number in range(20):
+            models.WatchmanComputer.objects.create(watchman_group_id=self.customer, computer_id=f'c_{number}',
+                                                   name=f'computer {number}', os_type='mac', os_version='10.14.5',
+                                                   ram_gb=8, hdd_capacity_gb=500, hdd_usage_gb=250)
+        for number in range(300):
+            date_reported = first + timedelta(days=generator.randrange(1200))
+            date_resolved = date_reported + timedelta(days=generator.randrange(200)) if number % 3 else None
+            models.WatchmanWarning.objects.create(watchman_group_id=self.customer,
+                                                  computer_id_id=f'c_{number % 20}',
+                                                  warning_id=f'p_{number}',
+                                                  date_resolved=date_resolved,
+                                                  name='warning',
+                                                  details='details')
+            models.RepairShoprTicket.objects.create(repairshopr_id=self.customer,
+                                                    ticket_id=str(number),
+                                                    number=str(number),
+                                                    subject='ticket',
+                                                    status='Resolved' if date_resolved else 'New',
+                                                    date_created=date_reported,
+                                                    date_updated=timezone.now(),
+                                                    date_resolved=date_resolved)
+        # reported dates are set after creation since they are added automatically
+        for warning in models.WatchmanWarning.objects.all():
+            models.WatchmanWarning.objects.filter(pk=warning.pk).update(
+                date_reported=models.RepairShoprTicket.objects.get(ticket_id=warning.warning_id[2:]).date_created
+            )
+
+    def expected_counts(self, start, end):
+        """
+        Counts a single sub report with one query for every count.
+        """
+        warnings = models.WatchmanWarning.objects.filter(watchman_group_id=self.customer)
+        tickets = models.RepairShoprTicket.objects.filter(repairshopr_id=self.customer)
+        return {
+            'num_warnings_unresolved_start': warnings.exclude(date_resolved__lt=start).filter(
+                date_reported__lt=start).count(),
+            'num_warnings_unresolved_end': warnings.exclude(date_resolved__lte=end).filter(
+                date_reported__lte=end).count(),
+            'num_warnings_created': warnings.filter(date_reported__gte=start, date_reported__lte=end).count(),
+            'num_warnings_resolved': warnings.filter(date_resolved__gte=start, date_resolved__lte=end).count(),
+            'num_tickets_created': tickets.filter(date_created__gte=start, date_created__lte=end).count(),
+            'num_tickets_resolved': tickets.filter(date_resolved__gte=start, date_resolved__lte=end).count(),
+        }
+
+    def test_counts(self):
+        """
+        Tests that the sweep counts every sub report the same as separate count queries.
+        """
+        for start_date, end_date in [(date(2016, 1, 1), date(2019, 6, 30)),
+                                     (date(2017, 3, 15), date(2017, 3, 20)),
+                                     (date(2018, 2, 10), date(2018, 11, 5))]:
+            periods = list(report_dates(start_date, end_date))
+            self.assertEqual(reports.sub_report_counts(self.customer, periods),
+                             [self.expected_counts(start, end) for start, end in periods])
+
+    def test_num_queries(self):
+        """
+        Tests that the warnings and tickets are each read with a single query whatever the length of the report.
+        """
+        periods = list(report_dates(date(2016, 1, 1), date(2019, 6, 30)))
+        with self.assertNumQueries(2):
+            reports.sub_report_counts(self.customer, periods)
+
+
+class BuildReportTest(TestCase):
+    def setUp(self):
+        # add customer and computers to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        models.WatchmanComputer.objects.bulk_create([
+            models.WatchmanComputer(watchman_group_id=self.customer, computer_id=f'c_{number}',
+                                    name=f'computer {number}', os_type='mac', os_version='10.14.5',
+                                    ram_gb=8, hdd_capacity_gb=500, hdd_usage_gb=number)
+            for number in range(1200)
+        ])
+
+    def test_snapshot(self):
+        """
+        Tests that every computer is copied with a single query to read them and bulk inserts.
+        """
+        report = models.Report.objects.create(customer=self.customer, start_date=date.today(), end_date=date.today())
+        with CaptureQueriesContext(connection) as queries:
+            count = reports.snapshot_computers(report, self.customer, date.today())
+        self.assertEqual(count, 1200)
+        self.assertEqual(sum(query['sql'].startswith('SELECT') for query in queries), 1)
+        # the batches may be split further by the database backend
+        self.assertLessEqual(len(queries), 1 + 1200 // 100)
+        computer_report = models.ComputerReport.objects.get(computer__computer_id='c_7')
+        self.assertEqual(computer_report.report, report)
+        self.assertEqual(computer_report.hdd_usage_gb, 7)
+
+    def test_rollback(self):
+        """
+        Tests that a build that fails leaves nothing behind.
+        """
+        report = models.Report.objects.create(customer=self.customer, start_date=date(2019, 1, 1),
+                                              end_date=date(2019, 3, 31))
+        periods = list(report_dates(report.start_date, report.end_date))
+        with mock.patch.object(reports, 'snapshot_computers', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                reports.save_report(report, periods, reports.sub_report_counts(self.customer, periods))
+        self.assertFalse(models.SubReport.objects.exists())
+        self.assertFalse(models.ReportPlatform.objects.exists())
+
+    def test_chunks(self):
+        """
+        Tests that the periods of a report are split into consecutive chunks.
+        """
+        periods = list(report_dates(date(2018, 1, 1), date(2019, 3, 31)))
+        self.assertEqual([len(chunk) for chunk in reports.chunks(periods, 6)], [6, 6, 3])
+        self.assertEqual([period for chunk in reports.chunks(periods, 6) for period in chunk], periods)
+        self.assertEqual(reports.chunks(periods, 0), [periods])
+        self.assertEqual(reports.chunks([], 0), [])
+
+
+class PlatformCountsTest(TestCase):
+    def setUp(self):
+        # add customer and computers of four platforms to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        for os_type, count in (('mac', 3), ('windows', 2), ('linux', 1), ('freebsd', 2)):
+            for _ in range(count):
+                create_watchman_computer(self.customer, os_type=os_type, date_reported=date(2018, 12, 1),
+                                         date_last_reported=date(2019, 1, 15))
+        # a computer that was last reported before the report period
+        create_watchman_computer(self.customer, os_type='mac', date_reported=date(2018, 12, 1),
+                                 date_last_reported=date(2018, 12, 30))
+
+    def test_counts(self):
+        """
+        Tests that the computers of every platform are counted with a single query.
+        """
+        with self.assertNumQueries(1):
+            counts = reports.platform_counts(self.customer, date(2019, 1, 1), date(2019, 1, 31))
+        self.assertEqual(counts, {'mac': 3, 'windows': 2, 'linux': 1, 'freebsd': 2})
+
+    def test_platform_name(self):
+        """
+        Tests that known platforms have display names and other platforms are capitalized.
+        """
+        self.assertEqual(platform_name('mac'), 'MacOS')
+        self.assertEqual(platform_name('freebsd'), 'Freebsd')
+
+    def test_legacy_report(self):
+        """
+        Tests that the reports generated before ReportPlatform existed get platform rows from their legacy columns and
+        render their computer counts.
+        """
+        report = models.Report.objects.create(customer=self.customer, start_date=date(2019, 1, 1),
+                                              end_date=date(2019, 1, 31), num_mac_os=3, num_windows_os=0,
+                                              num_linux_os=1)
+        models.SubReport.objects.create(report=report, start_date=date(2019, 1, 1), end_date=date(2019, 1, 31))
+        backfill = importlib.import_module('reporter.migrations.0009_backfill_reportplatform').backfill_platforms
+        backfill(apps, None)
+        self.assertEqual(list(report.reportplatform_set.values_list('os_type', 'num_computers')),
+                         [('linux', 1), ('mac', 3)])
+        html = render_to_string('report.html', {'report': report})
+        self.assertIn('3 MacOS Computers', html)
+        self.assertIn('1 Linux Computers', html)
+        self.assertNotIn('Windows Computers', html)
+        # reports that already have platform rows are left alone
+        backfill(apps, None)
+        self.assertEqual(report.reportplatform_set.count(), 2)
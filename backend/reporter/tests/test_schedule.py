@@ -379,6 +379,73 @@ class ScheduleCreateTest(test.APITestCase):
         self.assertEqual(task.task, 'reporter.tasks_repairshopr.update_client')
         self.assertEqual(task.args, f'["{self.customer.repairshopr_id}"]')
 
+    def test_schedule_create_periodic_task_fetch_mode(self):
+        """
+        Tests that the fetch mode is passed to the Watchman periodic task.
+        """
+        # request
+        request_body = {
+            'periodic_task': {
+                'minute': '0',
+                'hour': '2',
+                'day_of_week': '*',
+                'day_of_month': '*',
+                'month_of_year': '*',
+            },
+            'customer': self.customer.id,
+            'task_type': 'watchman',
+            'fetch_mode': 'async'
+        }
+        self.client.post(reverse(self.view_name), request_body, format='json')
+        # test database
+        self.assertEqual(models.ServiceSchedule.objects.first().fetch_mode, 'async')
+        self.assertEqual(json.loads(PeriodicTask.objects.first().kwargs), {'fetch_mode': 'async'})
+
+    def test_schedule_create_periodic_task_fetch_mode_default(self):
+        """
+        Tests that the combine fetch mode is used when no fetch mode is given.
+        """
+        # request
+        request_body = {
+            'periodic_task': {
+                'minute': '0',
+                'hour': '2',
+                'day_of_week': '*',
+                'day_of_month': '*',
+                'month_of_year': '*',
+            },
+            'customer': self.customer.id,
+            'task_type': 'watchman'
+        }
+        self.client.post(reverse(self.view_name), request_body, format='json')
+        # test database
+        self.assertEqual(models.ServiceSchedule.objects.first().fetch_mode, 'combine')
+        self.assertEqual(json.loads(PeriodicTask.objects.first().kwargs), {'fetch_mode': 'combine'})
+
+    def test_schedule_create_periodic_task_fetch_mode_invalid(self):
+        """
+        Tests that nothing is created when an invalid fetch mode is given.
+        """
+        # request
+        request_body = {
+            'periodic_task': {
+                'minute': '0',
+                'hour': '2',
+                'day_of_week': '*',
+                'day_of_month': '*',
+                'month_of_year': '*',
+            },
+            'customer': self.customer.id,
+            'task_type': 'watchman',
+            'fetch_mode': 'invalid'
+        }
+        response = self.client.post(reverse(self.view_name), request_body, format='json')
+        # test database
+        self.assertFalse(models.ServiceSchedule.objects.exists())
+        self.assertFalse(PeriodicTask.objects.exists())
+        # test response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_schedule_create_periodic_task_invalid_type(self):
         """
         Tests that nothing is not created when an invalid type is given.
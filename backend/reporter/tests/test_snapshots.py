@@ -0,0 +1,140 @@
+import io
+import shutil
+import tempfile
+from datetime import date, datetime
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from reporter import api_urls, models, snapshots, tasks_watchman, watchman_stub
+from reporter.tests.test_tasks_watchman import watchman_computer
+
+
+class SnapshotArchiveTest(TestCase):
+    def setUp(self):
+        # archive snapshots in a temporary directory
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(WATCHMAN_SNAPSHOT_DIR=self.directory, WATCHMAN_RATE_LIMIT=0)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+
+    def test_archive(self):
+        """
+        Tests that archived pages are read back in page order.
+        """
+        sync_id = snapshots.new_sync_id()
+        snapshots.archive_page('g_1111111', sync_id, 2, [watchman_computer('c_2')])
+        snapshots.archive_page('g_1111111', sync_id, 1, [watchman_computer('c_1')])
+        syncs = snapshots.list_syncs()
+        self.assertEqual([(s[0], s[1]) for s in syncs], [(sync_id, 'g_1111111')])
+        self.assertEqual(list(snapshots.read_sync(syncs[0][2])), [watchman_computer('c_1'), watchman_computer('c_2')])
+
+    def test_new_sync_id(self):
+        """
+        Tests that syncs that start at the same time get different IDs that are still dated by their timestamp.
+        """
+        with mock.patch.object(snapshots, 'dt') as frozen:
+            frozen.datetime.utcnow.return_value = datetime(2019, 3, 1, 12)
+            sync_ids = [snapshots.new_sync_id() for _ in range(2)]
+        self.assertNotEqual(sync_ids[0], sync_ids[1])
+        self.assertTrue(all(sync_id.startswith('20190301T120000000000Z-') for sync_id in sync_ids))
+        self.assertEqual(snapshots.sync_date(sync_ids[0]), date(2019, 3, 1))
+        self.assertEqual(snapshots.sync_date('20190301T120000000000Z'), date(2019, 3, 1))
+
+    def test_archive_disabled(self):
+        """
+        Tests that nothing is archived without a snapshot directory.
+        """
+        with override_settings(WATCHMAN_SNAPSHOT_DIR=''):
+            self.assertIsNone(snapshots.archive_page('g_1111111', snapshots.new_sync_id(), 1, []))
+        self.assertEqual(snapshots.list_syncs(), [])
+
+    def test_list_syncs_order(self):
+        """
+        Tests that the syncs of every group are listed in chronological order.
+        """
+        snapshots.archive_page('g_1111111', '20190302T000000000000Z', 1, [])
+        snapshots.archive_page('g_2222222', '20190301T000000000000Z', 1, [])
+        snapshots.archive_page('g_1111111', '20190301T120000000000Z', 1, [])
+        self.assertEqual([(s[0], s[1]) for s in snapshots.list_syncs()], [
+            ('20190301T000000000000Z', 'g_2222222'),
+            ('20190301T120000000000Z', 'g_1111111'),
+            ('20190302T000000000000Z', 'g_1111111'),
+        ])
+        self.assertEqual([s[1] for s in snapshots.list_syncs(group_ids=['g_2222222'])], ['g_2222222'])
+
+    def test_get_computers(self):
+        """
+        Tests that get_computers() archives the raw page it fetched.
+        """
+        computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(3)]
+        server = watchman_stub.WatchmanStubServer({'g_1111111': computers})
+        original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(server.start())
+        try:
+            tasks_watchman.get_computers(page=2, per_page=2, group_id='g_1111111', sync_id='20190301T000000000000Z')
+        finally:
+            api_urls.set_watchman_base(original_base)
+            server.shutdown()
+            server.server_close()
+        sync_directory = snapshots.list_syncs()[0][2]
+        self.assertEqual(list(snapshots.read_sync(sync_directory)), computers[2:])
+
+
+class ReplaySnapshotsTest(TestCase):
+    def setUp(self):
+        # archive two syncs of one group a day apart
+        self.directory = tempfile.mkdtemp()
+        snapshots.archive_page('g_1111111', '20190301T000000000000Z', 1, [
+            watchman_computer('c_1', plugins=[('p_1', 'warning')]),
+        ], directory=self.directory)
+        snapshots.archive_page('g_1111111', '20190302T000000000000Z', 1, [
+            watchman_computer('c_1', plugins=[('p_1', 'ok'), ('p_2', 'warning')]),
+            watchman_computer('c_2'),
+        ], directory=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay(self):
+        """
+        Tests that the syncs are replayed in order and dated on the day they were archived.
+        """
+        call_command('replay_watchman_snapshots', dir=self.directory, create_customers=True, stdout=io.StringIO())
+        self.assertTrue(models.Customer.objects.filter(watchman_group_id='g_1111111').exists())
+        # test computers
+        c_1 = models.WatchmanComputer.objects.get(computer_id='c_1')
+        self.assertEqual(c_1.date_reported, date(2019, 3, 1))
+        self.assertEqual(c_1.date_last_reported, date(2019, 3, 2))
+        self.assertEqual(models.WatchmanComputer.objects.get(computer_id='c_2').date_reported, date(2019, 3, 2))
+        # test warnings
+        p_1 = models.WatchmanWarning.objects.get(warning_id='p_1')
+        self.assertEqual(p_1.date_reported, date(2019, 3, 1))
+        self.assertEqual(p_1.date_resolved, date(2019, 3, 2))
+        p_2 = models.WatchmanWarning.objects.get(warning_id='p_2')
+        self.assertEqual(p_2.date_reported, date(2019, 3, 2))
+        self.assertIsNone(p_2.date_resolved)
+
+    def test_replay_unseen(self):
+        """
+        Tests that the open warnings of a computer that left the group are resolved on the day of the sync that no
+        longer reports it.
+        """
+        snapshots.archive_page('g_1111111', '20190303T000000000000Z', 1, [
+            watchman_computer('c_2'),
+        ], directory=self.directory)
+        call_command('replay_watchman_snapshots', dir=self.directory, create_customers=True, stdout=io.StringIO())
+        self.assertEqual(models.WatchmanWarning.objects.get(warning_id='p_2').date_resolved, date(2019, 3, 3))
+
+    def test_replay_since(self):
+        """
+        Tests that syncs before the since date are not replayed.
+        """
+        call_command('replay_watchman_snapshots', dir=self.directory, since='2019-03-02', create_customers=True,
+                     stdout=io.StringIO())
+        self.assertEqual(models.WatchmanComputer.objects.count(), 2)
+        self.assertFalse(models.WatchmanWarning.objects.filter(warning_id='p_1').exists())
@@ -0,0 +1,107 @@
+from celery import current_app
+from django.test import TestCase, override_settings
+
+from reporter import api_urls, metrics, models, sync_checkpoint, sync_lease, tasks_watchman, watchman_stub
+from reporter.redis_connection import get_redis
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, WATCHMAN_MAX_RETRIES=0, WATCHMAN_BACKOFF_BASE=0,
+                   PAGE_JOIN='counter', CLAIM_CHECK_THRESHOLD=10 ** 9)
+class ResumeSyncTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        # start the stub server with three pages of computers
+        computers = [watchman_stub.generate_computer('g_1111111', number, 1) for number in range(250)]
+        self.server = watchman_stub.WatchmanStubServer({'g_1111111': computers})
+        self.original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(self.server.start())
+        # run the tasks in this process
+        current_app.conf.task_always_eager = True
+        self.clear_redis()
+
+    def tearDown(self):
+        self.clear_redis()
+        current_app.conf.task_always_eager = False
+        api_urls.set_watchman_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def clear_redis():
+        get_redis().delete(sync_checkpoint.key('g_1111111'), *sync_lease.keys('g_1111111'))
+
+    def requested_pages(self):
+        return [int(query['page']) for path, query in self.server.requests if path.endswith('/computers')]
+
+    def resume(self, fetch_mode):
+        """
+        Fails the second page of a sync, then syncs again.
+        """
+        failed = metrics.get_metrics().get('watchman_sync.failed', 0)
+        self.server.failing_pages = {2}
+        tasks_watchman.update_client('g_1111111', fetch_mode=fetch_mode)
+        self.assertEqual(sync_checkpoint.progress('g_1111111'), (2, 3))
+        self.assertIsNone(sync_lease.holder('g_1111111'))
+        self.assertEqual(metrics.get_metrics()['watchman_sync.failed'], failed + 1)
+        # only the failed page is fetched again
+        self.server.failing_pages = set()
+        self.server.requests = []
+        tasks_watchman.update_client('g_1111111', fetch_mode=fetch_mode)
+        self.assertEqual(self.requested_pages(), [2])
+        self.assertEqual(models.WatchmanComputer.objects.count(), 250)
+        self.assertIsNone(sync_checkpoint.load('g_1111111'))
+
+    def test_resume_stream(self):
+        """
+        Tests that a failed sync in the 'stream' fetch mode only fetches the failed page when it is resumed.
+        """
+        self.resume('stream')
+
+    def test_resume_combine(self):
+        """
+        Tests that a failed sync in the 'combine' fetch mode only fetches the failed page when it is resumed.
+        """
+        self.resume('combine')
+        self.assertTrue(models.WatchmanWarning.objects.exists())
+
+    def test_stale_failure(self):
+        """
+        Tests that a late failure of the earlier attempt of a resumed sync does not release the lease of the resumed
+        attempt or mark its SyncRun failed.
+        """
+        self.server.failing_pages = {2}
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        checkpoint = sync_checkpoint.load('g_1111111')
+        # the resumed attempt holds the lease with a new token
+        self.server.failing_pages = set()
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        sync_run = models.SyncRun.objects.get(sync_id=checkpoint['sync_id'])
+        self.assertEqual(sync_run.status, 'completed')
+        sync_lease.acquire('g_1111111', 'next lease')
+        self.assertFalse(tasks_watchman.sync_failed('g_1111111', checkpoint['sync_id'], checkpoint['lease']))
+        self.assertEqual(sync_lease.holder('g_1111111'), 'next lease')
+        sync_run.refresh_from_db()
+        self.assertEqual(sync_run.status, 'completed')
+
+    def test_no_checkpoint(self):
+        """
+        Tests that a finished sync leaves no checkpoint and the next sync fetches every page.
+        """
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        self.assertIsNone(sync_checkpoint.load('g_1111111'))
+        self.server.requests = []
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        self.assertEqual(sorted(self.requested_pages()), [1, 2, 3])
+
+    def test_other_fetch_mode(self):
+        """
+        Tests that the checkpoint of a sync is not resumed by a sync with another fetch mode.
+        """
+        self.server.failing_pages = {2}
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        self.server.failing_pages = set()
+        self.server.requests = []
+        tasks_watchman.update_client('g_1111111', fetch_mode='combine')
+        self.assertEqual(sorted(self.requested_pages()), [1, 2, 3])
+        self.assertIsNone(sync_checkpoint.load('g_1111111'))
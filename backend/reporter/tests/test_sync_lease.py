@@ -0,0 +1,109 @@
+from celery import current_app
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from reporter import api_urls, metrics, models, sync_lease, tasks_watchman, watchman_stub
+from reporter.redis_connection import get_redis
+
+
+class SyncLeaseTest(SimpleTestCase):
+    def tearDown(self):
+        get_redis().delete(*sync_lease.keys('g_lease'))
+
+    def test_acquire(self):
+        """
+        Tests that a held lease cannot be taken by another sync.
+        """
+        self.assertTrue(sync_lease.acquire('g_lease', 'sync 1'))
+        self.assertFalse(sync_lease.acquire('g_lease', 'sync 2'))
+        self.assertEqual(sync_lease.holder('g_lease'), 'sync 1')
+
+    def test_release(self):
+        """
+        Tests that a lease is only released by the sync holding it.
+        """
+        sync_lease.acquire('g_lease', 'sync 1')
+        self.assertEqual(sync_lease.release('g_lease', 'sync 2'), (False, None))
+        self.assertEqual(sync_lease.release('g_lease', 'sync 1'), (True, None))
+        self.assertIsNone(sync_lease.holder('g_lease'))
+
+    def test_coalesce(self):
+        """
+        Tests that the latest pending request is returned when the lease is released.
+        """
+        self.assertFalse(sync_lease.coalesce('g_lease', {'fetch_mode': 'combine'}))
+        sync_lease.acquire('g_lease', 'sync 1')
+        self.assertTrue(sync_lease.coalesce('g_lease', {'fetch_mode': 'combine'}))
+        self.assertTrue(sync_lease.coalesce('g_lease', {'fetch_mode': 'stream'}))
+        self.assertEqual(sync_lease.release('g_lease', 'sync 1'), (True, {'fetch_mode': 'stream'}))
+        self.assertEqual(sync_lease.release('g_lease', 'sync 1'), (False, None))
+
+    @override_settings(WATCHMAN_SYNC_LEASE_TTL=1)
+    def test_expire(self):
+        """
+        Tests that the lease expires on its own.
+        """
+        sync_lease.acquire('g_lease', 'sync 1')
+        self.assertGreater(get_redis().pttl(sync_lease.keys('g_lease')[0]), 0)
+        self.assertLessEqual(get_redis().pttl(sync_lease.keys('g_lease')[0]), 1000)
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, PAGE_JOIN='counter', CLAIM_CHECK_THRESHOLD=10 ** 9)
+class UpdateClientLeaseTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        # start the stub server
+        computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(3)]
+        self.server = watchman_stub.WatchmanStubServer({'g_1111111': computers})
+        self.original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(self.server.start())
+        # run the tasks in this process
+        current_app.conf.task_always_eager = True
+        get_redis().delete(*sync_lease.keys('g_1111111'))
+
+    def tearDown(self):
+        get_redis().delete(*sync_lease.keys('g_1111111'))
+        current_app.conf.task_always_eager = False
+        api_urls.set_watchman_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_release(self):
+        """
+        Tests that the lease is released once a sync is done.
+        """
+        completed = metrics.get_metrics().get('watchman_sync.completed', 0)
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        self.assertEqual(models.WatchmanComputer.objects.count(), 3)
+        self.assertIsNone(sync_lease.holder('g_1111111'))
+        self.assertEqual(metrics.get_metrics()['watchman_sync.completed'], completed + 1)
+
+    @override_settings(WATCHMAN_SYNC_OVERLAP='skip')
+    def test_skip(self):
+        """
+        Tests that a sync exits immediately while another sync of the group is running.
+        """
+        skipped = metrics.get_metrics().get('watchman_sync.skipped', 0)
+        sync_lease.acquire('g_1111111', 'other lease')
+        self.assertIsNone(tasks_watchman.update_client('g_1111111'))
+        self.assertEqual(models.WatchmanComputer.objects.count(), 0)
+        self.assertEqual(metrics.get_metrics()['watchman_sync.skipped'], skipped + 1)
+        # the running sync does not start another one
+        self.assertTrue(tasks_watchman.release_sync('g_1111111', 'other sync', 'other lease'))
+        self.assertEqual(models.WatchmanComputer.objects.count(), 0)
+
+    @override_settings(WATCHMAN_SYNC_OVERLAP='coalesce')
+    def test_coalesce(self):
+        """
+        Tests that overlapping syncs run once after the running sync is done.
+        """
+        coalesced = metrics.get_metrics().get('watchman_sync.coalesced', 0)
+        sync_lease.acquire('g_1111111', 'other lease')
+        self.assertIsNone(tasks_watchman.update_client('g_1111111'))
+        self.assertIsNone(tasks_watchman.update_client('g_1111111', fetch_mode='stream'))
+        self.assertEqual(metrics.get_metrics()['watchman_sync.coalesced'], coalesced + 2)
+        self.assertEqual(models.WatchmanComputer.objects.count(), 0)
+        # the running sync starts the coalesced sync once it is done
+        tasks_watchman.release_sync('g_1111111', 'other sync', 'other lease')
+        self.assertEqual(models.WatchmanComputer.objects.count(), 3)
+        self.assertIsNone(sync_lease.holder('g_1111111'))
@@ -0,0 +1,179 @@
+import json
+import time
+
+from celery import current_app
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status, test
+from rest_framework.reverse import reverse
+
+from reporter import api_urls, models, sync_checkpoint, sync_lease, sync_runs, tasks_watchman, watchman_stub
+from reporter.redis_connection import get_redis
+
+
+class SyncRunTimerTest(SimpleTestCase):
+    def test_nested(self):
+        """
+        Tests that time spent in a nested timer is only counted towards the nested timer.
+        """
+        with sync_runs.collect() as stats:
+            with sync_runs.timer('parse'):
+                with sync_runs.timer('write'):
+                    time.sleep(0.05)
+            sync_runs.add('bytes_downloaded', 10)
+        self.assertGreaterEqual(stats['write_seconds'], 0.05)
+        self.assertLess(stats['parse_seconds'], 0.05)
+        self.assertEqual(stats['bytes_downloaded'], 10)
+
+    def test_not_collecting(self):
+        """
+        Tests that timers and counters do nothing outside of collect().
+        """
+        with sync_runs.timer('fetch'):
+            sync_runs.add('bytes_downloaded', 10)
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, WATCHMAN_MAX_RETRIES=0, WATCHMAN_BACKOFF_BASE=0,
+                   PAGE_JOIN='counter', CLAIM_CHECK_THRESHOLD=10 ** 9)
+class SyncRunRecordTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        # start the stub server with three pages of computers
+        computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(250)]
+        self.server = watchman_stub.WatchmanStubServer({'g_1111111': computers})
+        self.original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(self.server.start())
+        # run the tasks in this process
+        current_app.conf.task_always_eager = True
+        get_redis().delete(sync_checkpoint.key('g_1111111'), *sync_lease.keys('g_1111111'))
+
+    def tearDown(self):
+        get_redis().delete(sync_checkpoint.key('g_1111111'), *sync_lease.keys('g_1111111'))
+        current_app.conf.task_always_eager = False
+        api_urls.set_watchman_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sync(self, fetch_mode):
+        """
+        Syncs the group and tests the recorded SyncRun.
+        """
+        tasks_watchman.update_client('g_1111111', fetch_mode=fetch_mode)
+        sync_run = models.SyncRun.objects.get()
+        self.assertEqual(sync_run.customer, self.customer)
+        self.assertEqual(sync_run.fetch_mode, fetch_mode)
+        self.assertEqual(sync_run.status, 'completed')
+        self.assertIsNotNone(sync_run.date_finished)
+        self.assertGreaterEqual(sync_run.duration_seconds, 0)
+        self.assertEqual(sync_run.page_count, 3)
+        self.assertGreater(sync_run.bytes_downloaded, 0)
+        self.assertGreater(sync_run.fetch_seconds, 0)
+        self.assertGreater(sync_run.parse_seconds, 0)
+        self.assertGreater(sync_run.write_seconds, 0)
+        self.assertEqual(sync_run.computers_inserted, 250)
+        self.assertEqual(sync_run.warnings_created, models.WatchmanWarning.objects.count())
+
+    def test_stream(self):
+        """
+        Tests that a sync in the 'stream' fetch mode is recorded.
+        """
+        self.sync('stream')
+
+    def test_combine(self):
+        """
+        Tests that a sync in the 'combine' fetch mode is recorded.
+        """
+        self.sync('combine')
+
+    def test_async(self):
+        """
+        Tests that a sync in the 'async' fetch mode is recorded.
+        """
+        self.sync('async')
+
+    def test_failed(self):
+        """
+        Tests that a failed sync is recorded.
+        """
+        self.server.failing_pages = {2}
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        sync_run = models.SyncRun.objects.get()
+        self.assertEqual(sync_run.status, 'failed')
+        self.assertEqual(sync_run.page_count, 2)
+        # the resumed sync completes the same run
+        self.server.failing_pages = set()
+        tasks_watchman.update_client('g_1111111', fetch_mode='stream')
+        sync_run = models.SyncRun.objects.get()
+        self.assertEqual(sync_run.status, 'completed')
+        self.assertEqual(sync_run.page_count, 3)
+        self.assertEqual(sync_run.computers_inserted, 250)
+
+
+class SyncRunListTest(test.APITestCase):
+    def setUp(self):
+        # create test user
+        self.username = 'test'
+        self.password = 'test'
+        self.user = User.objects.create_user(username=self.username, password=self.password)
+        self.client.login(username=self.username, password=self.password)
+        # retrieve the view
+        self.view_name = 'reporter:sync-l'
+        # add customers and sync runs to database
+        self.customer_1 = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        self.customer_2 = models.Customer.objects.create(name='customer 2', watchman_group_id='g_2222222')
+        models.SyncRun.objects.create(customer=self.customer_1, sync_id='sync 1', fetch_mode='combine',
+                                      status='completed', duration_seconds=10)
+        models.SyncRun.objects.create(customer=self.customer_1, sync_id='sync 2', fetch_mode='combine',
+                                      status='completed', duration_seconds=30)
+        models.SyncRun.objects.create(customer=self.customer_2, sync_id='sync 3', fetch_mode='stream',
+                                      status='running')
+
+    def test_sync_run_list(self):
+        """
+        Tests that sync runs are listed if they exist in the database.
+        """
+        response = self.client.get(reverse(self.view_name))
+        response_body = json.loads(response.content.decode('utf-8'))
+        # test response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response_body['results']), 3)
+
+    def test_sync_run_list_filter_customer(self):
+        """
+        Tests that sync runs are filtered by customer.
+        """
+        response = self.client.get(reverse(self.view_name), {'customer': self.customer_1.id})
+        response_body = json.loads(response.content.decode('utf-8'))
+        # test response
+        self.assertEqual(sorted(result['sync_id'] for result in response_body['results']), ['sync 1', 'sync 2'])
+
+    def test_sync_run_list_ordering(self):
+        """
+        Tests that sync runs can be ordered by duration to find the slowest syncs.
+        """
+        response = self.client.get(reverse(self.view_name),
+                                   {'customer': self.customer_1.id, 'ordering': '-duration_seconds'})
+        response_body = json.loads(response.content.decode('utf-8'))
+        # test response
+        self.assertEqual([result['sync_id'] for result in response_body['results']], ['sync 2', 'sync 1'])
+
+    def test_sync_run_read(self):
+        """
+        Tests that a single sync run is read.
+        """
+        sync_run = models.SyncRun.objects.get(sync_id='sync 3')
+        response = self.client.get(reverse('reporter:sync-r', args=[sync_run.pk]))
+        response_body = json.loads(response.content.decode('utf-8'))
+        # test response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_body['status'], 'running')
+        self.assertEqual(response_body['customer'], self.customer_2.id)
+
+    def test_sync_run_list_unauthenticated(self):
+        """
+        Tests that sync runs are not listed without logging in.
+        """
+        self.client.logout()
+        response = self.client.get(reverse(self.view_name))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
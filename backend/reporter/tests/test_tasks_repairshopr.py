@@ -0,0 +1,149 @@
+import datetime as dt
+
+from celery import current_app
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status, test
+from rest_framework.reverse import reverse
+
+from reporter import api_urls, ingest_repairshopr, models, repairshopr_stub, tasks_repairshopr
+
+
+class UpsertTicketsTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        models.Customer.objects.create(name='customer 1', repairshopr_id='1111')
+        self.created_at = timezone.now() - dt.timedelta(days=3)
+
+    def test_insert_update(self):
+        """
+        Tests that new tickets are inserted and only changed tickets are updated.
+        """
+        tickets = [repairshopr_stub.generate_ticket('1111', number, self.created_at) for number in range(3)]
+        counts = ingest_repairshopr.upsert_tickets('1111', tickets)
+        self.assertEqual(counts, {'inserted': 3, 'updated': 0, 'unchanged': 0})
+        repairshopr_stub.update_ticket(tickets[0], timezone.now(), 'In Progress')
+        counts = ingest_repairshopr.upsert_tickets('1111', tickets)
+        self.assertEqual(counts, {'inserted': 0, 'updated': 1, 'unchanged': 2})
+        self.assertEqual(models.RepairShoprTicket.objects.get(ticket_id='0').status, 'In Progress')
+
+    def test_resolved(self):
+        """
+        Tests that the resolved date is kept while a ticket stays resolved and cleared when it is reopened.
+        """
+        ticket = repairshopr_stub.generate_ticket('1111', 1, self.created_at)
+        repairshopr_stub.update_ticket(ticket, self.created_at + dt.timedelta(days=1), 'Resolved')
+        ingest_repairshopr.upsert_tickets('1111', [ticket])
+        resolved = (self.created_at + dt.timedelta(days=1)).date()
+        self.assertEqual(models.RepairShoprTicket.objects.get().date_resolved, resolved)
+        # a later update of the resolved ticket does not move its resolved date
+        ticket['subject'] = 'changed subject'
+        ticket['updated_at'] = timezone.now().isoformat()
+        ingest_repairshopr.upsert_tickets('1111', [ticket])
+        self.assertEqual(models.RepairShoprTicket.objects.get().date_resolved, resolved)
+        # reopening the ticket clears its resolved date
+        repairshopr_stub.update_ticket(ticket, timezone.now(), 'In Progress')
+        ingest_repairshopr.upsert_tickets('1111', [ticket])
+        self.assertIsNone(models.RepairShoprTicket.objects.get().date_resolved)
+
+
+@override_settings(REPAIRSHOPR_RATE_LIMIT=0, REPAIRSHOPR_MAX_RETRIES=0, REPAIRSHOPR_CURSOR_OVERLAP=60)
+class UpdateClientTest(TestCase):
+    def setUp(self):
+        # add customers to database
+        models.Customer.objects.create(name='customer 1', repairshopr_id='1111')
+        models.Customer.objects.create(name='customer 2', repairshopr_id='2222')
+        # start the stub server with three pages of tickets for the first customer, created an hour apart
+        created_at = timezone.now() - dt.timedelta(days=3)
+        self.tickets = [repairshopr_stub.generate_ticket('1111', number, created_at + dt.timedelta(hours=number))
+                        for number in range(60)]
+        self.tickets.append(repairshopr_stub.generate_ticket('2222', 60, created_at))
+        self.server = repairshopr_stub.RepairShoprStubServer(self.tickets)
+        self.original_base = api_urls.repairshopr['base']
+        api_urls.set_repairshopr_base(self.server.start())
+
+    def tearDown(self):
+        api_urls.set_repairshopr_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def requested_pages(self):
+        return sorted(int(query['page']) for path, query in self.server.requests)
+
+    def test_full_sync(self):
+        """
+        Tests that the first sync of a customer fetches every page of its tickets.
+        """
+        results = tasks_repairshopr.update_client('1111')
+        self.assertEqual(results, {'inserted': 60, 'updated': 0, 'unchanged': 0, 'pages': 3})
+        self.assertEqual(self.requested_pages(), [1, 2, 3])
+        self.assertNotIn('since_updated_at', self.server.requests[0][1])
+        self.assertEqual(models.RepairShoprTicket.objects.filter(repairshopr_id='1111').count(), 60)
+
+    def test_incremental_sync(self):
+        """
+        Tests that later syncs only fetch the tickets updated since the previous sync.
+        """
+        tasks_repairshopr.update_client('1111')
+        repairshopr_stub.update_ticket(self.tickets[5], timezone.now(), 'Resolved')
+        self.server.requests = []
+        results = tasks_repairshopr.update_client('1111')
+        self.assertEqual(self.requested_pages(), [1])
+        self.assertIn('since_updated_at', self.server.requests[0][1])
+        # the latest ticket of the previous sync is fetched again since it is within the cursor overlap
+        self.assertEqual(results, {'inserted': 0, 'updated': 1, 'unchanged': 1, 'pages': 1})
+        ticket = models.RepairShoprTicket.objects.get(ticket_id='5')
+        self.assertEqual(ticket.date_resolved, timezone.now().date())
+
+    def test_failure(self):
+        """
+        Tests that a failed request fails the sync without saving any tickets.
+        """
+        self.server.failures = [(500, {})]
+        with self.assertRaises(Exception):
+            tasks_repairshopr.update_client('1111')
+        self.assertFalse(models.RepairShoprTicket.objects.exists())
+
+
+class ReportTicketsTest(test.APITestCase):
+    def setUp(self):
+        # build the reports in this process
+        current_app.conf.task_always_eager = True
+        # create test user
+        self.username = 'test'
+        self.password = 'test'
+        self.user = User.objects.create_user(username=self.username, password=self.password)
+        self.client.login(username=self.username, password=self.password)
+        # add customer and tickets to database
+        self.customer = models.Customer.objects.create(name='customer 1', repairshopr_id='1111')
+        for number, (created, resolved) in enumerate([
+            (dt.date(2019, 1, 5), dt.date(2019, 1, 20)),
+            (dt.date(2019, 1, 10), dt.date(2019, 2, 3)),
+            (dt.date(2019, 2, 14), None),
+        ]):
+            models.RepairShoprTicket.objects.create(repairshopr_id=self.customer,
+                                                    ticket_id=str(number),
+                                                    number=str(number),
+                                                    subject=f'ticket {number}',
+                                                    status='Resolved' if resolved else 'New',
+                                                    date_created=created,
+                                                    date_updated=timezone.now(),
+                                                    date_resolved=resolved)
+
+    def tearDown(self):
+        current_app.conf.task_always_eager = False
+
+    def test_sub_report_tickets(self):
+        """
+        Tests that every sub report counts the tickets created and resolved during its month.
+        """
+        response = self.client.post(reverse('reporter:report-lc'), {
+            'customer': self.customer.id,
+            'start_date': '2019-01-01',
+            'end_date': '2019-02-28',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        sub_reports = models.SubReport.objects.order_by('start_date')
+        self.assertEqual([(sub_report.num_tickets_created, sub_report.num_tickets_resolved)
+                          for sub_report in sub_reports], [(2, 1), (1, 1)])
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+from reporter import tasks_results, tasks_watchman
+
+
+class CompactTaskResultsTest(TestCase):
+    def setUp(self):
+        # add five expired results and one recent result
+        for i in range(6):
+            TaskResult.objects.create(task_id=f'task {i}', status='SUCCESS', result='null')
+        TaskResult.objects.exclude(task_id='task 5').update(date_done=timezone.now() - timedelta(days=30))
+
+    def test_compact(self):
+        """
+        Tests that expired results are deleted in batches and recent results are kept.
+        """
+        deleted = tasks_results.compact_task_results(retention=7 * 86400, batch_size=2)
+        self.assertEqual(deleted, 5)
+        self.assertEqual(list(TaskResult.objects.values_list('task_id', flat=True)), ['task 5'])
+
+    def test_compact_query_count(self):
+        """
+        Tests that each batch is selected and deleted with one query each.
+        """
+        # three batches and the final empty select
+        with self.assertNumQueries(7):
+            tasks_results.compact_task_results(retention=7 * 86400, batch_size=2)
+
+
+class ResultPolicyTest(TestCase):
+    def test_ignored(self):
+        """
+        Tests that intermediate results are not stored and the counts of a sync are.
+        """
+        self.assertTrue(tasks_watchman.get_group.ignore_result)
+        self.assertTrue(tasks_watchman.combine_computer_results.ignore_result)
+        self.assertFalse(tasks_watchman.parse_computers.ignore_result)
+        self.assertFalse(tasks_watchman.parse_warnings.ignore_result)
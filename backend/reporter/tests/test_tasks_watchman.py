@@ -0,0 +1,305 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from celery import current_app
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from reporter import api_urls, ingest_watchman, models, sync_checkpoint, sync_lease, tasks_watchman, watchman_stub
+from reporter.redis_connection import get_redis
+
+
+def watchman_computer(uid, group='g_1111111', name=None, platform='mac', plugins=()):
+    """
+    Builds a computer dictionary in the format returned by the Watchman '/computers' endpoint.
+    """
+    return {
+        'uid': uid,
+        'group': group,
+        'computer_name': name or f'computer {uid}',
+        'platform': platform,
+        'os_version': '10.14.5',
+        'ram_installed_in_bytes': str(8 * 1024 ** 3),
+        'boot_volume_capacity': '500.0 GB',
+        'boot_volume_usage': '250.0 GB',
+        'plugin_results': [
+            {'uid': plugin_uid, 'status': plugin_status, 'name': plugin_uid, 'details': 'details'}
+            for plugin_uid, plugin_status in plugins
+        ],
+    }
+
+
+class ParseComputersTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+
+    def test_insert(self):
+        """
+        Tests that new computers are inserted.
+        """
+        # parse
+        result = tasks_watchman.parse_computers([watchman_computer('c_1'), watchman_computer('c_2')])
+        # test database
+        self.assertEqual(result, {'inserted': 2, 'updated': 0, 'unchanged': 0})
+        computer = models.WatchmanComputer.objects.get(computer_id='c_1')
+        self.assertEqual(computer.watchman_group_id, self.customer)
+        self.assertEqual(computer.name, 'computer c_1')
+        self.assertEqual(computer.os_type, 'mac')
+        self.assertEqual(computer.ram_gb, 8.0)
+        self.assertEqual(computer.hdd_capacity_gb, 500.0)
+        self.assertEqual(computer.hdd_usage_gb, 250.0)
+
+    def test_update(self):
+        """
+        Tests that changed computers are updated and unchanged computers are counted.
+        """
+        # parse twice
+        tasks_watchman.parse_computers([watchman_computer('c_1'), watchman_computer('c_2')])
+        result = tasks_watchman.parse_computers([watchman_computer('c_1', name='renamed'), watchman_computer('c_2')])
+        # test database
+        self.assertEqual(result, {'inserted': 0, 'updated': 1, 'unchanged': 1})
+        self.assertEqual(models.WatchmanComputer.objects.get(computer_id='c_1').name, 'renamed')
+        self.assertEqual(models.WatchmanComputer.objects.count(), 2)
+
+    def test_date_last_reported(self):
+        """
+        Tests that unchanged computers have their last reported date updated.
+        """
+        # parse and age the computer
+        tasks_watchman.parse_computers([watchman_computer('c_1')])
+        models.WatchmanComputer.objects.update(date_last_reported=date.today() - timedelta(days=7))
+        result = tasks_watchman.parse_computers([watchman_computer('c_1')])
+        # test database
+        self.assertEqual(result, {'inserted': 0, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(models.WatchmanComputer.objects.get().date_last_reported, date.today())
+
+    def test_query_count(self):
+        """
+        Tests that the number of queries does not grow with the number of computers.
+        """
+        # parse
+        tasks_watchman.parse_computers([watchman_computer(f'c_{i}') for i in range(50)])
+        json = [watchman_computer(f'c_{i}', name='renamed' if i % 2 else None) for i in range(100)]
+        # test queries: customers, computers, savepoint, insert, update, release
+        with self.assertNumQueries(6):
+            tasks_watchman.parse_computers(json)
+
+    def test_customer_missing(self):
+        """
+        Tests that computers for an unknown group raise an error.
+        """
+        with self.assertRaises(models.Customer.DoesNotExist):
+            tasks_watchman.parse_computers([watchman_computer('c_1', group='g_2222222')])
+        self.assertFalse(models.WatchmanComputer.objects.exists())
+
+
+class ParseWarningsTest(TestCase):
+    def setUp(self):
+        # add customer and computers to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        tasks_watchman.parse_computers([watchman_computer('c_1'), watchman_computer('c_2')])
+
+    def test_create(self):
+        """
+        Tests that a warning is created for every plugin with a warning status.
+        """
+        # parse
+        result = tasks_watchman.parse_warnings([
+            watchman_computer('c_1', plugins=[('p_1', 'warning'), ('p_2', 'ok')]),
+            watchman_computer('c_2', plugins=[('p_1', 'warning')]),
+        ])
+        # test database
+        self.assertEqual(result, {'created': 2, 'resolved': 0, 'checked': 0, 'skipped': 0})
+        self.assertTrue(models.WatchmanWarning.objects.filter(computer_id='c_1', warning_id='p_1').exists())
+        self.assertTrue(models.WatchmanWarning.objects.filter(computer_id='c_2', warning_id='p_1').exists())
+        self.assertFalse(models.WatchmanWarning.objects.filter(warning_id='p_2').exists())
+
+    def test_resolve(self):
+        """
+        Tests that an open warning is resolved once its plugin reports an OK status.
+        """
+        # parse twice
+        tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'warning')])])
+        result = tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'ok')])])
+        # test database
+        self.assertEqual(result, {'created': 0, 'resolved': 1, 'checked': 0, 'skipped': 0})
+        self.assertEqual(models.WatchmanWarning.objects.get().date_resolved, date.today())
+
+    def test_check(self):
+        """
+        Tests that an open warning is marked as checked without creating a duplicate.
+        """
+        # parse and age the warning, then parse again with another plugin so the computer is not skipped
+        tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'warning')])])
+        models.WatchmanWarning.objects.update(date_last_checked=date.today() - timedelta(days=7))
+        result = tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'warning'), ('p_2', 'ok')])])
+        # test database
+        self.assertEqual(result, {'created': 0, 'resolved': 0, 'checked': 1, 'skipped': 0})
+        warning = models.WatchmanWarning.objects.get()
+        self.assertEqual(warning.date_last_checked, date.today())
+        self.assertIsNone(warning.date_resolved)
+
+    def test_skip(self):
+        """
+        Tests that computers that have not changed since the last sync are skipped.
+        """
+        # parse twice
+        json = [watchman_computer('c_1', plugins=[('p_1', 'warning')]), watchman_computer('c_2')]
+        tasks_watchman.parse_warnings(json)
+        json[1] = watchman_computer('c_2', plugins=[('p_1', 'warning')])
+        result = tasks_watchman.parse_warnings(json)
+        # test database
+        self.assertEqual(result, {'created': 1, 'resolved': 0, 'checked': 0, 'skipped': 1})
+        self.assertEqual(models.WatchmanWarning.objects.count(), 2)
+
+    def test_skip_query_count(self):
+        """
+        Tests that a sync without changes only reads from the database.
+        """
+        # parse
+        json = [watchman_computer('c_1', plugins=[('p_1', 'warning')]), watchman_computer('c_2')]
+        tasks_watchman.parse_computers(json)
+        tasks_watchman.parse_warnings(json)
+        # test queries: customers and computers for each task
+        with self.assertNumQueries(4):
+            tasks_watchman.parse_computers(json)
+            tasks_watchman.parse_warnings(json)
+
+    def test_reopen(self):
+        """
+        Tests that a new warning is created when a resolved warning reports a warning status again.
+        """
+        # parse three times
+        tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'warning')])])
+        tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'ok')])])
+        tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[('p_1', 'warning')])])
+        # test database
+        self.assertEqual(models.WatchmanWarning.objects.count(), 2)
+        self.assertEqual(models.WatchmanWarning.objects.filter(date_resolved=None).count(), 1)
+
+    def test_query_count(self):
+        """
+        Tests that the number of queries does not grow with the number of plugin results.
+        """
+        # parse
+        tasks_watchman.parse_warnings([watchman_computer('c_1', plugins=[(f'p_{i}', 'warning') for i in range(20)])])
+        json = [
+            watchman_computer('c_1', plugins=[(f'p_{i}', 'ok' if i % 2 else 'warning') for i in range(20)]),
+            watchman_computer('c_2', plugins=[(f'p_{i}', 'warning') for i in range(20)]),
+        ]
+        # test queries: customers, fingerprints, warnings, savepoint, insert, resolve, check, fingerprints, release
+        with self.assertNumQueries(9):
+            tasks_watchman.parse_warnings(json)
+
+
+class StreamComputersTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        self.customer = models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+
+    def test_pages(self):
+        """
+        Tests that pages are saved independently and their counts are totaled.
+        """
+        # ingest pages
+        results = [
+            ingest_watchman.ingest_page([watchman_computer('c_1', plugins=[('p_1', 'warning')])]),
+            ingest_watchman.ingest_page([watchman_computer('c_2', plugins=[('p_1', 'warning'), ('p_2', 'ok')])]),
+        ]
+        totals = tasks_watchman.finish_computers_stream(results, self.customer.watchman_group_id)
+        # test results
+        self.assertEqual(totals['computers'], {'inserted': 2, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(totals['warnings'], {'created': 2, 'resolved': 0, 'checked': 0, 'skipped': 0})
+        self.assertEqual(models.WatchmanComputer.objects.count(), 2)
+        self.assertEqual(models.WatchmanWarning.objects.filter(date_resolved=None).count(), 2)
+
+    def test_resolve_unseen(self):
+        """
+        Tests that open warnings that no page reported are resolved by the finalizer.
+        """
+        # ingest a sync with two warnings, then a sync where one computer is gone
+        ingest_watchman.ingest_page([watchman_computer('c_1', plugins=[('p_1', 'warning')]),
+                          watchman_computer('c_2', plugins=[('p_1', 'warning')])])
+        results = [ingest_watchman.ingest_page([watchman_computer('c_1', plugins=[('p_1', 'warning')])])]
+        totals = tasks_watchman.finish_computers_stream(results, self.customer.watchman_group_id)
+        # test database
+        self.assertEqual(totals['warnings']['resolved'], 1)
+        self.assertIsNone(models.WatchmanWarning.objects.get(computer_id='c_1').date_resolved)
+        self.assertEqual(models.WatchmanWarning.objects.get(computer_id='c_2').date_resolved, date.today())
+
+
+class ShardTest(SimpleTestCase):
+    def test_shard_of(self):
+        """
+        Tests that every computer belongs to exactly one shard and always the same one.
+        """
+        computer_ids = [f'c_{number}' for number in range(1000)]
+        shards = [ingest_watchman.shard_of(computer_id, 4) for computer_id in computer_ids]
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertEqual(shards, [ingest_watchman.shard_of(computer_id, 4) for computer_id in computer_ids])
+
+    @override_settings(WATCHMAN_INGEST_SHARDS=4, WATCHMAN_INGEST_SHARD_MIN_SIZE=100)
+    def test_shard_count(self):
+        """
+        Tests that only large syncs are split and never into more than WATCHMAN_INGEST_SHARDS shards.
+        """
+        self.assertEqual(ingest_watchman.shard_count(150), 1)
+        self.assertEqual(ingest_watchman.shard_count(250), 2)
+        self.assertEqual(ingest_watchman.shard_count(5000), 4)
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, WATCHMAN_MAX_RETRIES=0, WATCHMAN_BACKOFF_BASE=0,
+                   PAGE_JOIN='counter', WATCHMAN_INGEST_SHARDS=4, WATCHMAN_INGEST_SHARD_MIN_SIZE=50,
+                   CLAIM_CHECK_THRESHOLD=10 ** 9)
+class ShardedSyncTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        # start the stub server with three pages of computers
+        self.computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(250)]
+        self.server = watchman_stub.WatchmanStubServer({'g_1111111': self.computers})
+        self.original_base = api_urls.watchman['base']
+        api_urls.set_watchman_base(self.server.start())
+        # run the tasks in this process
+        current_app.conf.task_always_eager = True
+        get_redis().delete(sync_checkpoint.key('g_1111111'), *sync_lease.keys('g_1111111'))
+
+    def tearDown(self):
+        get_redis().delete(sync_checkpoint.key('g_1111111'), *sync_lease.keys('g_1111111'))
+        current_app.conf.task_always_eager = False
+        api_urls.set_watchman_base(self.original_base)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sync(self):
+        """
+        Tests that a sharded sync saves the same computers and warnings as a single task would.
+        """
+        with mock.patch.object(ingest_watchman, 'ingest_page', wraps=ingest_watchman.ingest_page) as ingest_page:
+            tasks_watchman.update_client('g_1111111', fetch_mode='combine')
+        # every shard was ingested by its own task
+        self.assertEqual(ingest_page.call_count, 4)
+        sync_run = models.SyncRun.objects.get()
+        self.assertEqual(sync_run.status, 'completed')
+        self.assertEqual(sync_run.computers_inserted, 250)
+        self.assertEqual(models.WatchmanComputer.objects.count(), 250)
+        expected = sum(plugin['status'] == 'warning' for computer in self.computers
+                       for plugin in computer['plugin_results'])
+        self.assertEqual(sync_run.warnings_created, expected)
+        self.assertEqual(models.WatchmanWarning.objects.filter(date_resolved=None).count(), expected)
+
+    def test_merge(self):
+        """
+        Tests that the warnings of computers that no longer report are resolved by sharded and unsharded syncs alike.
+        """
+        for shards in (4, 1):
+            with self.subTest(shards=shards), override_settings(WATCHMAN_INGEST_SHARDS=shards):
+                tasks_watchman.update_client('g_1111111', fetch_mode='combine')
+                open_warnings = models.WatchmanWarning.objects.filter(date_resolved=None).count()
+                gone = self.computers.pop(next(index for index, computer in enumerate(self.computers)
+                                               if computer['plugin_results'][0]['status'] == 'warning'))
+                tasks_watchman.update_client('g_1111111', fetch_mode='combine')
+                self.assertEqual(models.WatchmanWarning.objects.get(computer_id=gone['uid']).date_resolved,
+                                 date.today())
+                self.assertEqual(models.WatchmanWarning.objects.filter(date_resolved=None).count(),
+                                 open_warnings - 1)
@@ -0,0 +1,99 @@
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from reporter import http_client, repairshopr_client, watchman_client, watchman_stub
+
+
+@override_settings(WATCHMAN_RATE_LIMIT=0, WATCHMAN_BACKOFF_BASE=0, WATCHMAN_MAX_RETRIES=2)
+class WatchmanClientTest(SimpleTestCase):
+    def setUp(self):
+        # start the stub server
+        self.computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(3)]
+        self.server = watchman_stub.WatchmanStubServer({'g_1111111': self.computers})
+        self.url = self.server.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get(self):
+        """
+        Tests that the decoded response body is returned.
+        """
+        query_params = {'group_id': 'g_1111111', 'per_page': 2, 'page': 2, 'expand[]': 'plugin_results'}
+        json = watchman_client.get(self.url.format('computers'), query_params)
+        self.assertEqual(json, self.computers[2:])
+
+    def test_get_error(self):
+        """
+        Tests that a response without a 200 OK status code raises an exception.
+        """
+        with self.assertRaises(Exception):
+            watchman_client.get(self.url.format('groups/g_2222222'))
+
+    def test_session(self):
+        """
+        Tests that the same session is used by every request of a process.
+        """
+        self.assertIs(watchman_client.get_session(), watchman_client.get_session())
+
+    def test_get_many(self):
+        """
+        Tests that concurrent requests return their results in order.
+        """
+        url = self.url.format('computers')
+        query_params_list = [{'group_id': 'g_1111111', 'per_page': 1, 'page': page, 'expand[]': 'plugin_results'}
+                             for page in range(1, 4)]
+        pages = watchman_client.get_many(url, query_params_list, concurrency=2)
+        self.assertEqual(pages, [[computer] for computer in self.computers])
+
+    def test_get_retry(self):
+        """
+        Tests that rate limited and unavailable responses are retried.
+        """
+        self.server.failures = [(429, {'Retry-After': '0'}), (503, {})]
+        json = watchman_client.get(self.url.format('groups/g_1111111'))
+        self.assertEqual(json['visible_computer_count'], 3)
+        self.assertEqual(self.server.failures, [])
+
+    def test_get_retry_exhausted(self):
+        """
+        Tests that an exception is raised once every retry has failed.
+        """
+        self.server.failures = [(503, {})] * 3
+        with self.assertRaises(Exception):
+            watchman_client.get(self.url.format('groups/g_1111111'))
+        self.assertEqual(self.server.failures, [])
+
+    def test_get_no_retry(self):
+        """
+        Tests that client errors are not retried.
+        """
+        self.server.failures = [(403, {}), (403, {})]
+        with self.assertRaises(Exception):
+            watchman_client.get(self.url.format('groups/g_1111111'))
+        self.assertEqual(len(self.server.failures), 1)
+
+    def test_retry_after(self):
+        """
+        Tests that both formats of the Retry-After header are parsed.
+        """
+        req = requests.Response()
+        self.assertIsNone(http_client.retry_after(req))
+        req.headers['Retry-After'] = '120'
+        self.assertEqual(http_client.retry_after(req), 120)
+        req.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(http_client.retry_after(req), 0)
+        req.headers['Retry-After'] = 'invalid'
+        self.assertIsNone(http_client.retry_after(req))
+
+    @override_settings(WATCHMAN_POOL_SIZE=7, REPAIRSHOPR_POOL_SIZE=3)
+    def test_settings_prefix(self):
+        """
+        Tests that every API client has its own session configured by the settings of its API.
+        """
+        watchman_session = watchman_client.create_session()
+        repairshopr_session = repairshopr_client.create_session()
+        self.assertEqual(watchman_session.get_adapter('https://').poolmanager.connection_pool_kw['maxsize'], 7)
+        self.assertEqual(repairshopr_session.get_adapter('https://').poolmanager.connection_pool_kw['maxsize'], 3)
+        self.assertIsNot(watchman_client.get_session(), repairshopr_client.get_session())
@@ -0,0 +1,58 @@
+import json
+
+from django.test import SimpleTestCase, TestCase
+
+from reporter import models, tasks_watchman, watchman_records, watchman_stub
+from reporter.tests.test_tasks_watchman import watchman_computer
+
+
+class WatchmanRecordsTest(SimpleTestCase):
+    def test_from_json(self):
+        """
+        Tests that a computer dictionary is projected into a record.
+        """
+        record = watchman_records.ComputerRecord.from_json(watchman_computer('c_1', plugins=[('p_1', 'warning')]))
+        self.assertEqual(record.uid, 'c_1')
+        self.assertEqual(record.group, 'g_1111111')
+        self.assertEqual(record.values(), {
+            'name': 'computer c_1',
+            'os_type': 'mac',
+            'os_version': '10.14.5',
+            'ram_gb': 8.0,
+            'hdd_capacity_gb': 500.0,
+            'hdd_usage_gb': 250.0,
+        })
+        self.assertEqual(record.plugins[0].status, 'WARNING')
+
+    def test_compact_round_trip(self):
+        """
+        Tests that compact rows survive JSON serialization and load into equal records.
+        """
+        computer = watchman_computer('c_1', plugins=[('p_1', 'warning'), ('p_2', 'ok')])
+        rows = json.loads(json.dumps(watchman_records.compact([computer])))
+        record = watchman_records.load(rows)[0]
+        self.assertEqual(record.to_row(), watchman_records.ComputerRecord.from_json(computer).to_row())
+        self.assertEqual(record.fingerprint(), watchman_records.ComputerRecord.from_json(computer).fingerprint())
+
+    def test_compact_size(self):
+        """
+        Tests that the compact form is smaller than the Watchman results.
+        """
+        page = [watchman_stub.generate_computer('g_1111111', number, 40) for number in range(100)]
+        self.assertLess(len(json.dumps(watchman_records.compact(page))), len(json.dumps(page)))
+
+
+class ParseRecordsTest(TestCase):
+    def setUp(self):
+        # add customer to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+
+    def test_parse(self):
+        """
+        Tests that the parse tasks accept compact rows.
+        """
+        rows = watchman_records.compact([watchman_computer('c_1', plugins=[('p_1', 'warning')])])
+        tasks_watchman.parse_computers(rows)
+        tasks_watchman.parse_warnings(rows)
+        self.assertTrue(models.WatchmanComputer.objects.filter(computer_id='c_1').exists())
+        self.assertTrue(models.WatchmanWarning.objects.filter(computer_id='c_1', warning_id='p_1').exists())
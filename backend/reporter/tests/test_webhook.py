@@ -0,0 +1,191 @@
+import json
+from unittest import mock
+
+from celery import current_app
+from django.test import TestCase, override_settings
+from rest_framework import status, test
+from rest_framework.reverse import reverse
+
+from reporter import ingest_watchman, models, sync_lease, tasks_watchman, watchman_stub, webhook_events
+from reporter.redis_connection import get_redis
+
+
+def clear_queue():
+    get_redis().delete(webhook_events.QUEUE_KEY, webhook_events.SCHEDULED_KEY)
+
+
+class ApplyPluginEventsTest(TestCase):
+    def setUp(self):
+        # add customer and two synced computers to database, the first has a warning on plugin 0
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        computers = [watchman_stub.generate_computer('g_1111111', number, 2) for number in range(2)]
+        ingest_watchman.upsert_computers(computers)
+        ingest_watchman.reconcile_warnings(computers)
+
+    def test_created(self):
+        """
+        Tests that a plugin changing to a warning status creates a warning.
+        """
+        result = ingest_watchman.apply_plugin_events([watchman_stub.generate_event('g_1111111', 1, 1, 'warning')])
+        self.assertEqual(result, {'created': 1, 'resolved': 0, 'checked': 0, 'skipped': 0})
+        warning = models.WatchmanWarning.objects.get(computer_id='g_1111111_c1')
+        self.assertEqual(warning.warning_id, 'p1')
+        self.assertIsNone(warning.date_resolved)
+
+    def test_resolved(self):
+        """
+        Tests that a plugin changing back to OK resolves its open warning.
+        """
+        result = ingest_watchman.apply_plugin_events([watchman_stub.generate_event('g_1111111', 0, 0, 'ok')])
+        self.assertEqual(result, {'created': 0, 'resolved': 1, 'checked': 0, 'skipped': 0})
+        self.assertIsNotNone(models.WatchmanWarning.objects.get(computer_id='g_1111111_c0').date_resolved)
+
+    def test_latest_event(self):
+        """
+        Tests that only the latest event of a plugin is applied and other warnings are checked.
+        """
+        result = ingest_watchman.apply_plugin_events([
+            watchman_stub.generate_event('g_1111111', 0, 0, 'ok'),
+            watchman_stub.generate_event('g_1111111', 0, 0, 'warning'),
+        ])
+        self.assertEqual(result, {'created': 0, 'resolved': 0, 'checked': 1, 'skipped': 0})
+        self.assertIsNone(models.WatchmanWarning.objects.get(computer_id='g_1111111_c0').date_resolved)
+
+    def test_unknown_computer(self):
+        """
+        Tests that the events of computers that have not been synced are skipped.
+        """
+        result = ingest_watchman.apply_plugin_events([watchman_stub.generate_event('g_1111111', 5, 0, 'warning')])
+        self.assertEqual(result, {'created': 0, 'resolved': 0, 'checked': 0, 'skipped': 1})
+
+    def test_fingerprint(self):
+        """
+        Tests that the fingerprints of the affected computers are cleared so the next sync reconciles them.
+        """
+        ingest_watchman.apply_plugin_events([watchman_stub.generate_event('g_1111111', 0, 0, 'ok')])
+        self.assertEqual(models.WatchmanComputer.objects.get(computer_id='g_1111111_c0').fingerprint, '')
+        self.assertNotEqual(models.WatchmanComputer.objects.get(computer_id='g_1111111_c1').fingerprint, '')
+
+
+@override_settings(WATCHMAN_WEBHOOK_BATCH_SIZE=2)
+class ApplyWebhookEventsTest(TestCase):
+    def setUp(self):
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        ingest_watchman.upsert_computers([watchman_stub.generate_computer('g_1111111', number, 2)
+                                          for number in range(3)])
+        models.Customer.objects.create(name='customer 2', watchman_group_id='g_2222222')
+        ingest_watchman.upsert_computers([watchman_stub.generate_computer('g_2222222', 0, 2)])
+        clear_queue()
+        get_redis().delete(*sync_lease.keys('g_1111111'), *sync_lease.keys('g_2222222'))
+
+    def tearDown(self):
+        clear_queue()
+        get_redis().delete(*sync_lease.keys('g_1111111'), *sync_lease.keys('g_2222222'))
+
+    def test_batch(self):
+        """
+        Tests that queued events schedule a single batch and are applied in batches of WATCHMAN_WEBHOOK_BATCH_SIZE.
+        """
+        self.assertTrue(webhook_events.push([watchman_stub.generate_event('g_1111111', 0, 1, 'warning')]))
+        self.assertFalse(webhook_events.push([watchman_stub.generate_event('g_1111111', 1, 1, 'warning'),
+                                              watchman_stub.generate_event('g_1111111', 2, 1, 'warning')]))
+        self.assertEqual(webhook_events.pending(), 3)
+        current_app.conf.task_always_eager = True
+        try:
+            result = tasks_watchman.apply_webhook_events()
+        finally:
+            current_app.conf.task_always_eager = False
+        self.assertEqual(result['events'], 2)
+        # the remaining event was applied by another batch
+        self.assertEqual(webhook_events.pending(), 0)
+        self.assertEqual(models.WatchmanWarning.objects.filter(warning_id='p1').count(), 3)
+
+    @override_settings(WATCHMAN_WEBHOOK_BATCH_DELAY=5)
+    def test_syncing(self):
+        """
+        Tests that the events of a group that is being synced are put back in the queue and tried again later, while
+        the events of other groups are applied.
+        """
+        sync_lease.acquire('g_1111111', 'sync lease')
+        webhook_events.push([watchman_stub.generate_event('g_1111111', 0, 1, 'warning'),
+                             watchman_stub.generate_event('g_2222222', 0, 1, 'warning')])
+        with mock.patch.object(tasks_watchman.apply_webhook_events, 'apply_async') as apply_async:
+            result = tasks_watchman.apply_webhook_events()
+        self.assertEqual((result['events'], result['deferred']), (1, 1))
+        apply_async.assert_called_once_with(countdown=5)
+        self.assertEqual(webhook_events.pending(), 1)
+        self.assertFalse(models.WatchmanWarning.objects.filter(watchman_group_id='g_1111111').exists())
+        self.assertTrue(models.WatchmanWarning.objects.filter(watchman_group_id='g_2222222').exists())
+        # the batch leaves the lease of the sync alone and releases its own
+        self.assertEqual(sync_lease.holder('g_1111111'), 'sync lease')
+        self.assertIsNone(sync_lease.holder('g_2222222'))
+        # the deferred event is applied once the sync is done
+        sync_lease.release('g_1111111', 'sync lease')
+        result = tasks_watchman.apply_webhook_events()
+        self.assertEqual((result['events'], result['deferred']), (1, 0))
+        self.assertTrue(models.WatchmanWarning.objects.filter(watchman_group_id='g_1111111').exists())
+
+
+@override_settings(WATCHMAN_WEBHOOK_SECRET='secret')
+class WatchmanWebhookTest(test.APITestCase):
+    def setUp(self):
+        # add customer and a synced computer to database
+        models.Customer.objects.create(name='customer 1', watchman_group_id='g_1111111')
+        ingest_watchman.upsert_computers([watchman_stub.generate_computer('g_1111111', 1, 2)])
+        # retrieve the view
+        self.view_name = 'reporter:webhook-watchman'
+        # run the batch task in this process
+        current_app.conf.task_always_eager = True
+        clear_queue()
+
+    def tearDown(self):
+        clear_queue()
+        current_app.conf.task_always_eager = False
+
+    def post(self, events, signature=None):
+        body = json.dumps(events).encode('utf-8')
+        signature = signature if signature is not None else webhook_events.sign(body)
+        return self.client.generic('POST', reverse(self.view_name), body, content_type='application/json',
+                                   HTTP_X_WATCHMAN_SIGNATURE=signature)
+
+    def test_event(self):
+        """
+        Tests that a signed event is queued and applied.
+        """
+        response = self.post(watchman_stub.generate_event('g_1111111', 1, 0, 'warning'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'queued': 1})
+        self.assertTrue(models.WatchmanWarning.objects.filter(computer_id='g_1111111_c1', warning_id='p0').exists())
+
+    def test_event_list(self):
+        """
+        Tests that a list of events is queued and applied.
+        """
+        response = self.post([watchman_stub.generate_event('g_1111111', 1, plugin, 'warning') for plugin in range(2)])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(models.WatchmanWarning.objects.count(), 2)
+
+    def test_bad_signature(self):
+        """
+        Tests that requests with a missing or wrong signature are rejected.
+        """
+        event = watchman_stub.generate_event('g_1111111', 1, 0, 'warning')
+        self.assertEqual(self.post(event, signature='').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.post(event, signature='sha256=0').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(models.WatchmanWarning.objects.exists())
+
+    @override_settings(WATCHMAN_WEBHOOK_SECRET='')
+    def test_disabled(self):
+        """
+        Tests that every request is rejected while no secret is set.
+        """
+        response = self.post(watchman_stub.generate_event('g_1111111', 1, 0, 'warning'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bad_event(self):
+        """
+        Tests that events without a plugin are rejected.
+        """
+        response = self.post({'computer': 'g_1111111_c1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(webhook_events.pending(), 0)
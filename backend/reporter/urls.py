@@ -14,5 +14,9 @@ urlpatterns = [
     url(r'^schedule/(?P<pk>\d+)$', views.ScheduleRDView.as_view(), name='schedule-rd'),
     url(r'^report$', views.ReportLCView.as_view(), name='report-lc'),
     url(r'^report/(?P<pk>\d+)$', views.ReportDeleteView.as_view(), name='report-d'),
-    url(r'^report/detail/(?P<uuid>.+).pdf$', views.ReportPDFView.as_view(), name='report-pdf')
+    url(r'^report/job/(?P<job_id>[0-9a-f-]+)$', views.ReportJobRetrieveView.as_view(), name='report-job-r'),
+    url(r'^report/detail/(?P<uuid>.+).pdf$', views.ReportPDFView.as_view(), name='report-pdf'),
+    url(r'^sync$', views.SyncRunListView.as_view(), name='sync-l'),
+    url(r'^sync/(?P<pk>\d+)$', views.SyncRunRetrieveView.as_view(), name='sync-r'),
+    url(r'^webhook/watchman$', views.WatchmanWebhookView.as_view(), name='webhook-watchman')
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -1,3 +1,5 @@
 from .view_customer import *
 from .view_schedule import *
 from .view_report import *
+from .view_sync_run import *
+from .view_webhook import *
@@ -1,5 +1,4 @@
-import calendar
-from datetime import datetime, date
+from datetime import datetime
 
 from django.http import HttpResponse, HttpResponseNotFound
 from django.template.loader import render_to_string
@@ -10,20 +9,22 @@ from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import IsAuthenticated
 from weasyprint import HTML
 
-from reporter import models, serializers
+from reporter import models, reports, serializers, tasks_reports
 
 
 class ReportLCView(generics.ListCreateAPIView):
     lookup_field = 'pk'
     serializer_class = serializers.ReportSerializer
-    queryset = models.Report.objects.all()
+    # reports are listed once their job is done
+    queryset = models.Report.objects.exclude(job__status__in=('pending', 'running'))
     authentication_classes = (TokenAuthentication, SessionAuthentication)
     permission_classes = (IsAuthenticated,)
     filterset_fields = ('id', 'customer')
 
     def post(self, request):
         """
-        Create a new report for given customer and time period.
+        Create a new report for given customer and time period. The report is built by a Celery task, its progress can
+        be followed with ReportJobRetrieveView.
         """
         # parse the request data and build the bad request response
         bad_response = {}
@@ -55,92 +56,20 @@ class ReportLCView(generics.ListCreateAPIView):
         if bad_response:
             return response.Response(bad_response, status=status.HTTP_400_BAD_REQUEST)
 
-        # generate report statistics
-        num_mac_os = models.WatchmanComputer.objects.filter(
-            os_type='mac',
-            watchman_group_id=customer,
-            date_reported__lt=end_date,
-            date_last_reported__gt=start_date
-        ).count()
-        num_windows_os = models.WatchmanComputer.objects.filter(
-            os_type='windows',
-            watchman_group_id=customer,
-            date_reported__lt=end_date,
-            date_last_reported__gt=start_date
-        ).count()
-        num_linux_os = models.WatchmanComputer.objects.filter(
-            os_type='linux',
-            watchman_group_id=customer,
-            date_reported__lt=end_date,
-            date_last_reported__gt=start_date
-        ).count()
-        # create the report
-        report = models.Report.objects.create(
-            customer=customer,
-            start_date=start_date,
-            end_date=end_date,
-            num_mac_os=num_mac_os,
-            num_windows_os=num_windows_os,
-            num_linux_os=num_linux_os
-        )
+        # create the report and queue the task that builds its sub reports and the snapshot of its computers
+        job = reports.create_report(customer, start_date, end_date)
+        tasks_reports.build_report.delay(str(job.job_id))
 
-        # create all sub reports
-        for start, end in report_dates(start_date, end_date):
-            # count the number of warnings unresolved at the beginning of the sub report period
-            num_warnings_unresolved_start = models.WatchmanWarning.objects.exclude(
-                date_resolved__lt=start
-            ).filter(
-                watchman_group_id=customer,
-                date_reported__lt=start
-            ).count()
-            # count the number of warnings unresolved at the end of the sub report period
-            num_warnings_unresolved_end = models.WatchmanWarning.objects.exclude(
-                date_resolved__lte=end
-            ).filter(
-                watchman_group_id=customer,
-                date_reported__lte=end
-            ).count()
-            # count the number of warnings created during the sub report period
-            num_warnings_created = models.WatchmanWarning.objects.filter(
-                watchman_group_id=customer,
-                date_reported__gte=start,
-                date_reported__lte=end
-            ).count()
-            # cound the number of warnings resolved during the sub report period
-            num_warnings_resolved = models.WatchmanWarning.objects.filter(
-                watchman_group_id=customer,
-                date_resolved__gte=start,
-                date_resolved__lte=end
-            ).count()
-            # create the subreport
-            models.SubReport.objects.create(
-                report=report,
-                start_date=start,
-                end_date=end,
-                num_warnings_unresolved_start=num_warnings_unresolved_start,
-                num_warnings_unresolved_end=num_warnings_unresolved_end,
-                num_warnings_created=num_warnings_created,
-                num_warnings_resolved=num_warnings_resolved
-            )
+        # return the accepted response
+        return response.Response({'report': job.report_id, 'job': str(job.job_id)}, status=status.HTTP_202_ACCEPTED)
 
-        # created the computer reports
-        for computer in models.WatchmanComputer.objects.filter(
-            watchman_group_id=customer,
-            date_last_reported__gte=start_date
-        ).all():
-            models.ComputerReport.objects.create(
-                name=computer.name,
-                os_type=computer.os_type,
-                os_version=computer.os_version,
-                ram_gb=computer.ram_gb,
-                hdd_capacity_gb=computer.hdd_capacity_gb,
-                hdd_usage_gb=computer.hdd_usage_gb,
-                report=report,
-                computer=computer
-            )
 
-        # return the success response
-        return response.Response(status=status.HTTP_201_CREATED)
+class ReportJobRetrieveView(generics.RetrieveAPIView):
+    lookup_field = 'job_id'
+    serializer_class = serializers.ReportJobSerializer
+    queryset = models.ReportJob.objects.prefetch_related('chunks')
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    permission_classes = (IsAuthenticated,)
 
 
 class ReportDeleteView(generics.DestroyAPIView):
@@ -165,41 +94,3 @@ class ReportPDFView(views.APIView):
         HTML(string=html).write_pdf(pdf_response)
         # return the PDF response
         return pdf_response
-
-
-def days_in_month(year, month):
-    """
-    A helper function that takes in month and year numbers and returns the number of day in the month.
-    """
-    return calendar.monthrange(year, month)[1]
-
-def report_dates(start_date, end_date):
-    """
-    Generator function to create a range of report dates given a start and end date.
-    """
-    # iterate over every year within date range
-    for year in range(start_date.year, end_date.year + 1):
-        # find the month range for the year
-        month_range = range(1, 13)
-        # start and end year cases
-        if year == start_date.year:
-            month_range = range(start_date.month, 13)
-        elif year == end_date.year:
-            month_range = range(1, end_date.month + 1)
-        # single year case
-        if start_date.year == end_date.year:
-            month_range = range(start_date.month, end_date.month + 1)
-        # iterate over every month in the year
-        for month in month_range:
-            # find the day range for the year
-            day_range = (1, days_in_month(year, month))
-            # start and end month cases
-            if year == start_date.year and month == start_date.month:
-                day_range = (start_date.day, days_in_month(year, month))
-            elif year == end_date.year and month == end_date.month:
-                day_range = (1, end_date.day)
-            # single month case
-            if start_date.year == end_date.year and start_date.month == end_date.month:
-                day_range = (start_date.day, end_date.day)
-            # create the sub reports
-            yield (date(year, month, day_range[0]), date(year, month, day_range[1]))
@@ -0,0 +1,27 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from knox.auth import TokenAuthentication
+from rest_framework import filters, generics
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAuthenticated
+
+from reporter import models, serializers
+
+
+class SyncRunListView(generics.ListAPIView):
+    lookup_field = 'pk'
+    serializer_class = serializers.SyncRunSerializer
+    queryset = models.SyncRun.objects.all()
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    permission_classes = (IsAuthenticated,)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
+    filterset_fields = ('id', 'customer', 'status', 'fetch_mode')
+    ordering_fields = ('date_started', 'duration_seconds', 'fetch_seconds', 'parse_seconds', 'write_seconds',
+                       'bytes_downloaded')
+
+
+class SyncRunRetrieveView(generics.RetrieveAPIView):
+    lookup_field = 'pk'
+    serializer_class = serializers.SyncRunSerializer
+    queryset = models.SyncRun.objects.all()
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    permission_classes = (IsAuthenticated,)
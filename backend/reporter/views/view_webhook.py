@@ -0,0 +1,31 @@
+from rest_framework import permissions, response, status, views
+
+from reporter import serializers, tasks_watchman, webhook_events
+
+
+class WatchmanSignature(permissions.BasePermission):
+    """
+    Allows requests signed with the WATCHMAN_WEBHOOK_SECRET setting in the X-Watchman-Signature header.
+    """
+
+    def has_permission(self, request, view):
+        return webhook_events.verify(request.body, request.META.get('HTTP_X_WATCHMAN_SIGNATURE'))
+
+
+class WatchmanWebhookView(views.APIView):
+    authentication_classes = ()
+    permission_classes = (WatchmanSignature,)
+
+    def post(self, request):
+        """
+        Queues the plugin status changes pushed by Watchman, either a single event or a list of events. The events are
+        applied in batches by the apply_webhook_events task.
+        """
+        many = isinstance(request.data, list)
+        serializer = serializers.WatchmanEventSerializer(data=request.data, many=many)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        events = serializer.validated_data if many else [serializer.validated_data]
+        tasks_watchman.queue_webhook_events([{'computer': event['computer'], 'plugin': dict(event['plugin'])}
+                                             for event in events])
+        return response.Response({'queued': len(events)}, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,15 @@
+"""
+Pooled HTTP client for the Watchman Monitoring API, see http_client. Requests are throttled by the Watchman token
+bucket and configured by the WATCHMAN_ settings.
+"""
+
+from reporter import ratelimit
+from reporter.http_client import PooledClient
+
+client = PooledClient('WATCHMAN', ratelimit.watchman_bucket)
+
+create_session = client.create_session
+get_session = client.get_session
+backoff = client.backoff
+get = client.get
+get_many = client.get_many
@@ -0,0 +1,121 @@
+"""
+Compact records for the results of the Watchman '/computers' endpoint. Watchman returns dozens of fields for every
+computer but only a handful are ever saved, so each page is projected into slotted records right after it is fetched
+and only those fields are serialized between tasks, as one list per computer instead of a dictionary.
+"""
+
+import hashlib
+import json
+
+# the WatchmanComputer fields that are saved from the Watchman results
+COMPUTER_FIELDS = ('name', 'os_type', 'os_version', 'ram_gb', 'hdd_capacity_gb', 'hdd_usage_gb')
+
+
+class PluginRecord:
+    __slots__ = ('uid', 'status', 'name', 'details')
+
+    def __init__(self, uid, status, name, details):
+        self.uid = uid
+        self.status = status
+        self.name = name
+        self.details = details
+
+    @classmethod
+    def from_json(cls, plugin):
+        """
+        Projects a plugin result dictionary from the Watchman '/computers' endpoint into a record.
+        """
+        return cls(plugin['uid'], plugin['status'].upper(), plugin['name'], plugin['details'])
+
+    def to_row(self):
+        return [self.uid, self.status, self.name, self.details]
+
+
+class ComputerRecord:
+    __slots__ = ('uid', 'group') + COMPUTER_FIELDS + ('plugins',)
+
+    def __init__(self, uid, group, name, os_type, os_version, ram_gb, hdd_capacity_gb, hdd_usage_gb, plugins):
+        self.uid = uid
+        self.group = group
+        self.name = name
+        self.os_type = os_type
+        self.os_version = os_version
+        self.ram_gb = ram_gb
+        self.hdd_capacity_gb = hdd_capacity_gb
+        self.hdd_usage_gb = hdd_usage_gb
+        self.plugins = plugins
+
+    @classmethod
+    def from_json(cls, computer):
+        """
+        Projects a computer dictionary from the Watchman '/computers' endpoint into a record.
+        """
+        return cls(computer['uid'],
+                   computer['group'],
+                   computer['computer_name'],
+                   computer['platform'],
+                   computer['os_version'],
+                   round(int(computer['ram_installed_in_bytes']) / (1024 ** 3), 2),
+                   float(computer['boot_volume_capacity'][:-3]),
+                   float(computer['boot_volume_usage'][:-3]),
+                   [PluginRecord.from_json(plugin) for plugin in computer['plugin_results']])
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Creates a record from the list produced by to_row().
+        """
+        return cls(*row[:-1], [PluginRecord(*plugin) for plugin in row[-1]])
+
+    def to_row(self):
+        """
+        Serializes the record into a JSON formatted list.
+        """
+        return [self.uid, self.group] + [getattr(self, field) for field in COMPUTER_FIELDS] + \
+            [[plugin.to_row() for plugin in self.plugins]]
+
+    def values(self):
+        """
+        :return: Returns a dictionary of WatchmanComputer field values keyed by field name.
+        """
+        return {field: getattr(self, field) for field in COMPUTER_FIELDS}
+
+    def fingerprint(self):
+        """
+        Hashes every field that is saved to the database along with the status of each plugin. Computers with the same
+        fingerprint as their last sync can be skipped.
+
+        :return: Returns the fingerprint as a hexadecimal string.
+        """
+        plugins = sorted([plugin.uid, plugin.status] for plugin in self.plugins)
+        content = json.dumps([self.group, [getattr(self, field) for field in COMPUTER_FIELDS], plugins])
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def compact(json_results):
+    """
+    Projects the results of the Watchman '/computers' endpoint into their compact serialized form.
+
+    :param json_results: A list of JSON formatted computer dictionaries, compact rows or records.
+    :return: Returns a list of compact rows, one for each computer.
+    """
+    return [record.to_row() for record in load(json_results)]
+
+
+def load(json_results):
+    """
+    Converts the results of the Watchman '/computers' endpoint into records, whether they are the raw JSON formatted
+    dictionaries, the compact rows from compact() or records already.
+
+    :param json_results: A list of JSON formatted computer dictionaries, compact rows or records.
+    :return: Returns a list of ComputerRecord objects.
+    """
+    records = []
+    for computer in json_results:
+        if isinstance(computer, ComputerRecord):
+            records.append(computer)
+        elif isinstance(computer, dict):
+            records.append(ComputerRecord.from_json(computer))
+        else:
+            records.append(ComputerRecord.from_row(computer))
+    return records
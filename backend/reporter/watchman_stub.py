@@ -0,0 +1,196 @@
+"""
+A local stand-in for the Watchman Monitoring API. It serves generated data for the '/groups/<group_id>' and
+'/computers' endpoints, with paging and the 'plugin_results' expansion, and is used by the benchmark management
+commands and tests.
+"""
+
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def generate_computer(group_id, number, plugins):
+    """
+    Generates a computer dictionary in the format returned by the Watchman '/computers' endpoint.
+
+    :param group_id: The group ID of the computer.
+    :param number: The number of the computer within its group.
+    :param plugins: The number of plugin results to include.
+    :return: Returns a JSON formatted computer dictionary.
+    """
+    return {
+        'uid': f'{group_id}_c{number}',
+        'group': group_id,
+        'computer_name': f'computer {number}',
+        'platform': ('mac', 'windows', 'linux')[number % 3],
+        'os_version': '10.14.5',
+        'ram_installed_in_bytes': str(8 * 1024 ** 3),
+        'boot_volume_capacity': '500.0 GB',
+        'boot_volume_usage': '250.0 GB',
+        'plugin_results': [
+            {
+                'uid': f'p{plugin}',
+                'status': 'warning' if (number + plugin) % 10 == 0 else 'ok',
+                'name': f'plugin {plugin}',
+                'details': f'details for plugin {plugin}',
+            }
+            for plugin in range(plugins)
+        ],
+    }
+
+
+def generate_event(group_id, number, plugin, status):
+    """
+    Generates a plugin status change in the format pushed by the Watchman webhook, for a computer and plugin from
+    generate_computer().
+
+    :param group_id: The group ID of the computer.
+    :param number: The number of the computer within its group.
+    :param plugin: The number of the plugin.
+    :param status: The new status of the plugin, either 'ok' or 'warning'.
+    :return: Returns a JSON formatted event dictionary.
+    """
+    return {
+        'computer': f'{group_id}_c{number}',
+        'plugin': {
+            'uid': f'p{plugin}',
+            'status': status,
+            'name': f'plugin {plugin}',
+            'details': f'details for plugin {plugin}',
+        },
+    }
+
+
+def generate_groups(groups, computers, plugins):
+    """
+    Generates the computers of several Watchman groups.
+
+    :param groups: The number of groups.
+    :param computers: The number of computers in each group.
+    :param plugins: The number of plugin results of each computer.
+    :return: Returns a dictionary of computer lists keyed by group ID.
+    """
+    group_ids = [f'g_stub{group}' for group in range(groups)]
+    return {group_id: [generate_computer(group_id, number, plugins) for number in range(computers)]
+            for group_id in group_ids}
+
+
+def churn(groups, fraction, seed=None):
+    """
+    Changes a fraction of the generated computers in place to simulate the differences between two syncs. Each
+    changed computer flips the status of one plugin and half of them also report a different disk usage.
+
+    :param groups: A dictionary of computer lists keyed by group ID from generate_groups().
+    :param fraction: The fraction of computers to change, between 0 and 1.
+    :param seed: An optional seed for reproducible changes.
+    :return: Returns the number of computers changed.
+    """
+    generator = random.Random(seed)
+    changed = 0
+    for computers in groups.values():
+        for computer in generator.sample(computers, round(len(computers) * fraction)):
+            if computer['plugin_results']:
+                plugin = generator.choice(computer['plugin_results'])
+                plugin['status'] = 'ok' if plugin['status'] == 'warning' else 'warning'
+            if generator.random() < 0.5:
+                computer['boot_volume_usage'] = f'{generator.uniform(1, 500):.1f} GB'
+            changed += 1
+    return changed
+
+
+class WatchmanStubHandler(BaseHTTPRequestHandler):
+    # keep connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # simulate the cost of the TCP and TLS handshake of a new connection
+        time.sleep(self.server.handshake_delay)
+        super().setup()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        # respond with a queued failure
+        if self.server.failures:
+            status_code, headers = self.server.failures.pop(0)
+            return self.send_json({'error': 'failure'}, status_code, headers)
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, query))
+        groups = self.server.groups
+        # groups endpoint
+        match = re.search(r'/groups/([^/]+)$', url.path)
+        if match:
+            if match.group(1) not in groups:
+                return self.send_json({'error': 'not found'}, 404)
+            return self.send_json({'id': match.group(1), 'visible_computer_count': len(groups[match.group(1)])})
+        # computers endpoint
+        if url.path.endswith('/computers'):
+            computers = groups.get(query.get('group_id'), [])
+            per_page = int(query.get('per_page', 100))
+            page = int(query.get('page', 1))
+            if page in self.server.failing_pages:
+                return self.send_json({'error': 'failure'}, 500)
+            computers = computers[(page - 1) * per_page:page * per_page]
+            # plugin results are only included when they are expanded
+            if query.get('expand[]') != 'plugin_results':
+                computers = [{key: value for key, value in computer.items() if key != 'plugin_results'}
+                             for computer in computers]
+            return self.send_json(computers)
+        return self.send_json({'error': 'not found'}, 404)
+
+    def send_json(self, body, status_code=200, headers=None):
+        """
+        Sends a JSON response, compressed with gzip if the client accepts it.
+        """
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class WatchmanStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, groups, address=('127.0.0.1', 0), handshake_delay=0):
+        """
+        :param groups: A dictionary of computer lists keyed by group ID.
+        :param address: The address to listen on, a random port is used by default.
+        :param handshake_delay: The number of seconds every new connection is delayed by.
+        """
+        super().__init__(address, WatchmanStubHandler)
+        self.groups = groups
+        self.handshake_delay = handshake_delay
+        # a list of (status code, headers) tuples to respond with before serving data
+        self.failures = []
+        # the '/computers' pages that always respond with an error
+        self.failing_pages = set()
+        # a list of (path, query parameters) tuples of every request served
+        self.requests = []
+
+    @property
+    def base_url(self):
+        return 'http://{}:{}/v2.5/{{}}'.format(*self.server_address)
+
+    def start(self):
+        """
+        Serves requests from a daemon thread.
+
+        :return: Returns the base URL of the server.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
@@ -0,0 +1,99 @@
+"""
+Queue of the plugin status changes pushed by the Watchman webhook. The webhook only appends events to a Redis list
+and schedules a batch task if none is scheduled yet, so a burst of events is applied by a few tasks with bulk queries
+instead of one task per event.
+"""
+
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+
+from reporter.redis_connection import get_redis
+
+QUEUE_KEY = 'mrgen:webhook:watchman:events'
+SCHEDULED_KEY = 'mrgen:webhook:watchman:scheduled'
+
+
+def sign(body, secret=None):
+    """
+    Signs a webhook request body.
+
+    :param body: The raw request body as bytes.
+    :param secret: The shared secret, defaults to the WATCHMAN_WEBHOOK_SECRET setting.
+    :return: Returns the value of the X-Watchman-Signature header for the body.
+    """
+    secret = secret if secret is not None else settings.WATCHMAN_WEBHOOK_SECRET
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify(body, signature):
+    """
+    Checks the signature of a webhook request. Every request is rejected while the WATCHMAN_WEBHOOK_SECRET setting is
+    empty.
+
+    :param body: The raw request body as bytes.
+    :param signature: The value of the X-Watchman-Signature header, or None if it is missing.
+    :return: Returns True if the signature is valid.
+    """
+    if not settings.WATCHMAN_WEBHOOK_SECRET or not signature:
+        return False
+    return hmac.compare_digest(sign(body), signature)
+
+
+def push(events):
+    """
+    Appends events to the queue.
+
+    :param events: A list of JSON serializable event dictionaries.
+    :return: Returns True if no batch is scheduled yet and the caller has to schedule one.
+    """
+    if not events:
+        return False
+    get_redis().rpush(QUEUE_KEY, *(json.dumps(event) for event in events))
+    return schedule()
+
+
+def schedule():
+    """
+    Flags that a batch is scheduled. The flag expires in case the scheduled batch is lost.
+
+    :return: Returns True if no batch was scheduled yet and the caller has to schedule one.
+    """
+    return bool(get_redis().set(SCHEDULED_KEY, 1, nx=True, ex=settings.WATCHMAN_WEBHOOK_BATCH_DELAY + 300))
+
+
+def pop(count):
+    """
+    Removes the oldest events from the queue. The flag of the scheduled batch is cleared first, so events pushed from
+    here on schedule another batch.
+
+    :param count: The maximum number of events to remove.
+    :return: Returns a list of event dictionaries in the order they were pushed.
+    """
+    get_redis().delete(SCHEDULED_KEY)
+    pipeline = get_redis().pipeline()
+    pipeline.lrange(QUEUE_KEY, 0, count - 1)
+    pipeline.ltrim(QUEUE_KEY, count, -1)
+    events, _ = pipeline.execute()
+    return [json.loads(event) for event in events]
+
+
+def requeue(events):
+    """
+    Puts events back at the front of the queue in their original order, so they are applied before any event that was
+    pushed after them.
+
+    :param events: A list of event dictionaries in the order they were pushed.
+    :return: None
+    """
+    if events:
+        get_redis().lpush(QUEUE_KEY, *(json.dumps(event) for event in reversed(events)))
+
+
+def pending():
+    """
+    :return: Returns the number of events waiting in the queue.
+    """
+    return get_redis().llen(QUEUE_KEY)
@@ -26,10 +26,15 @@ export default new Vuex.Store({
       results: []
     },
     newReportModalOpen: false,
+    reportJobs: [],
     // defaults
     DEFAULT_CUSTOMERS_PER_PAGE: 10,
     DEFAULT_SCHEDULES_PER_PAGE: 10,
     DEFAULT_REPORTS_PER_PAGE: 10,
+    DEFAULT_REPORT_JOB_POLL_INTERVAL: 1000,
+    DEFAULT_REPORT_JOB_POLL_RETRIES: 5,
+    // a little longer than the server takes to mark a job failed
+    DEFAULT_REPORT_JOB_POLL_TIMEOUT: 65 * 60 * 1000,
     DEFAULT_SERVICES: ["watchman", "repairshopr"],
     DEFAULT_PERIODIC_TASK: {
       minute: "0",
@@ -60,6 +65,14 @@ export default new Vuex.Store({
     },
     SET_NEW_REPORT_MODAL_OPEN(state, open) {
       state.newReportModalOpen = open;
+    },
+    SET_REPORT_JOB(state, job) {
+      state.reportJobs = state.reportJobs
+        .filter(x => x.job_id !== job.job_id)
+        .concat([job]);
+    },
+    REMOVE_REPORT_JOB(state, jobId) {
+      state.reportJobs = state.reportJobs.filter(x => x.job_id !== jobId);
     }
   },
   actions: {
@@ -289,11 +302,75 @@ export default new Vuex.Store({
       return axios
         .post(`${process.env.VUE_APP_BACKEND_URL}/api/report`, body)
         .then(r => r.data)
-        .then(() => {
-          // load in reports
-          dispatch("loadReports", [customerId]);
+        .then(created => {
+          // follow the job building the report
+          dispatch("pollReportJob", [customerId, created.job]);
+        });
+    },
+    pollReportJob(
+      { commit, dispatch, state },
+      [customerId, jobId, failedPolls = 0, startedAt = Date.now()]
+    ) {
+      // request the status of the job from the server
+      axios
+        .get(`${process.env.VUE_APP_BACKEND_URL}/api/report/job/${jobId}`)
+        .then(r => r.data)
+        .then(job => {
+          // keep failed jobs so their error is shown until it is dismissed
+          if (job.status !== "done") {
+            commit("SET_REPORT_JOB", { ...job, customer: customerId });
+          }
+          // poll again until the job is done, failed or has taken too long
+          if (job.status === "pending" || job.status === "running") {
+            if (Date.now() - startedAt >= state.DEFAULT_REPORT_JOB_POLL_TIMEOUT) {
+              commit("SET_REPORT_JOB", {
+                ...job,
+                customer: customerId,
+                status: "failed",
+                error: "The report is taking too long to build."
+              });
+              return;
+            }
+            setTimeout(() => {
+              dispatch("pollReportJob", [customerId, jobId, 0, startedAt]);
+            }, state.DEFAULT_REPORT_JOB_POLL_INTERVAL);
+            return;
+          }
+          if (job.status === "done") {
+            commit("REMOVE_REPORT_JOB", jobId);
+            // load in reports
+            dispatch("loadReports", [customerId]);
+          }
+        })
+        .catch(error => {
+          // stop following a job the server does not know about
+          if (error.response && error.response.status === 404) {
+            commit("REMOVE_REPORT_JOB", jobId);
+            return;
+          }
+          // retry with a growing delay before giving up on the job
+          if (failedPolls + 1 < state.DEFAULT_REPORT_JOB_POLL_RETRIES) {
+            setTimeout(() => {
+              dispatch("pollReportJob", [
+                customerId,
+                jobId,
+                failedPolls + 1,
+                startedAt
+              ]);
+            }, state.DEFAULT_REPORT_JOB_POLL_INTERVAL * 2 ** (failedPolls + 1));
+            return;
+          }
+          commit("SET_REPORT_JOB", {
+            job_id: jobId,
+            customer: customerId,
+            status: "failed",
+            error: "The status of the report could not be retrieved."
+          });
         });
     },
+    dismissReportJob({ commit }, jobId) {
+      commit("REMOVE_REPORT_JOB", jobId);
+    },
     deleteReport({ dispatch, state }, [reportId, startingPage = null]) {
       // keep the current page number if no page is given
       if (startingPage === null) {